@@ -95,6 +95,9 @@ VNOJ_INTERACT_MIN_PROBLEM_COUNT = 5
 VNOJ_BLOG_MIN_PROBLEM_COUNT = 10
 
 VNOJ_TESTCASE_VISIBLE_LENGTH = 60
+# Whether to build the cached test case previews right after the problem data is saved,
+# rather than on the first submission status page view
+VNOJ_TESTCASE_PREVIEW_PREWARM = True
 
 # Some problems have a lot of testcases, and each testcase
 # has about 5~6 fields, so we need to raise this
@@ -200,6 +203,16 @@ DMOJ_SELECT2_THEME = 'dmoj'
 
 MARKDOWN_STYLES = {}
 MARKDOWN_DEFAULT_STYLE = {}
+# Number of rendered markdown texts kept in the memory of each process, 0 to disable
+MARKDOWN_CACHE_SIZE = 1000
+# Seconds for which rendered markdown is kept in the cache, 0 to disable
+MARKDOWN_CACHE_TIMEOUT = 86400
+# Bump to discard all cached markdown, e.g. after changing how it is rendered
+MARKDOWN_CACHE_VERSION = 1
+# Number of highlighted sources kept in the memory of each process, 0 to disable
+HIGHLIGHT_CACHE_SIZE = 100
+# Seconds for which highlighted sources are kept in the cache, 0 to disable
+HIGHLIGHT_CACHE_TIMEOUT = 86400
 
 MATHOID_URL = False
 MATHOID_GZIP = False
@@ -589,6 +602,14 @@ BRIDGED_JUDGE_ADDRESS = [('localhost', 9999)]
 BRIDGED_JUDGE_PROXIES = None
 BRIDGED_DJANGO_ADDRESS = [('localhost', 9998)]
 BRIDGED_DJANGO_CONNECT = None
+# Keep one connection to the bridge open per process, instead of connecting for every request.
+BRIDGED_DJANGO_PERSISTENT = True
+# User, problem and contest statistics are recomputed after grading by this many background workers in the bridge,
+# and repeated updates within BRIDGED_STATS_UPDATE_DELAY seconds are merged. Set to 0 to update them synchronously.
+BRIDGED_STATS_UPDATE_WORKERS = 1
+BRIDGED_STATS_UPDATE_DELAY = 2
+# Test case progress of a submission is posted to the event daemon at most once per this many seconds.
+BRIDGED_TEST_CASE_UPDATE_INTERVAL = 0.5
 
 # Event Server configuration
 EVENT_DAEMON_USE = False
@@ -596,6 +617,11 @@ EVENT_DAEMON_POST = 'ws://localhost:9997/'
 EVENT_DAEMON_GET = 'ws://localhost:9996/'
 EVENT_DAEMON_POLL = '/channels/'
 EVENT_DAEMON_KEY = None
+# Events are posted from a background thread, through a queue of up to EVENT_DAEMON_QUEUE_SIZE events.
+# When the queue is full, EVENT_DAEMON_DROP_POLICY is one of 'oldest', 'newest' or 'block'.
+EVENT_DAEMON_QUEUE_SIZE = 10000
+EVENT_DAEMON_BATCH_SIZE = 100
+EVENT_DAEMON_DROP_POLICY = 'oldest'
 EVENT_DAEMON_AMQP_EXCHANGE = 'dmoj-events'
 EVENT_DAEMON_SUBMISSION_KEY = '6Sdmkx^%pk@GsifDfXcwX*Y7LRF%RGT8vmFpSxFBT$fwS7trc8raWfN#CSfQuKApx&$B#Gh2L7p%W!Ww'
 EVENT_DAEMON_CONTEST_KEY = '&w7hB-.9WnY2Jj^Qm+|?o6a<!}_2Wiw+?(_Yccqq{uR;:kWQP+3R<r(ICc|4^dDeEuJE{*D;Gg@K(4K>'
@@ -660,6 +686,8 @@ SOCIAL_AUTH_SLUGIFY_USERNAMES = True
 SOCIAL_AUTH_SLUGIFY_FUNCTION = 'judge.social_auth.slugify_username'
 
 MOSS_API_KEY = None
+# Maximum number of (problem, language) pairs that are sent to MOSS at the same time
+MOSS_CONCURRENCY = 4
 
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 
@@ -5,7 +5,8 @@ from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _, ngettext
 from reversion.admin import VersionAdmin
 
-from judge.models import Comment
+from judge.caching import bump_fragment_versions
+from judge.models import Comment, Profile
 from judge.widgets import AdminHeavySelect2Widget, AdminMartorWidget
 
 
@@ -37,16 +38,22 @@ class CommentAdmin(VersionAdmin):
         return Comment.objects.order_by('-time')
 
     def hide_comment(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
         count = queryset.update(hidden=True)
-        queryset.author.calculate_contribution_points()
+        bump_fragment_versions('home_comments')
+        for author in Profile.objects.filter(id__in=author_ids):
+            author.calculate_contribution_points()
         self.message_user(request, ngettext('%d comment successfully hidden.',
                                             '%d comments successfully hidden.',
                                             count) % count)
     hide_comment.short_description = _('Hide comments')
 
     def unhide_comment(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
         count = queryset.update(hidden=False)
-        queryset.author.calculate_contribution_points()
+        bump_fragment_versions('home_comments')
+        for author in Profile.objects.filter(id__in=author_ids):
+            author.calculate_contribution_points()
         self.message_user(request, ngettext('%d comment successfully unhidden.',
                                             '%d comments successfully unhidden.',
                                             count) % count)
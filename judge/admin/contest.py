@@ -14,7 +14,8 @@ from reversion.admin import VersionAdmin
 
 from django_ace import AceWidget
 from judge.models import Contest, ContestAnnouncement, ContestProblem, ContestSubmission, Profile, Rating, Submission
-from judge.ratings import rate_contest
+from judge.ratings import RatingStore, rate_contest
+from judge.utils.celery import redirect_to_task_status
 from judge.utils.views import NoBatchDeleteMixin
 from judge.widgets import AdminHeavySelect2MultipleWidget, AdminHeavySelect2Widget, AdminMartorWidget, \
     AdminSelect2MultipleWidget, AdminSelect2Widget
@@ -337,8 +338,10 @@ class ContestAdmin(NoBatchDeleteMixin, VersionAdmin):
             with connection.cursor() as cursor:
                 cursor.execute('TRUNCATE TABLE `%s`' % Rating._meta.db_table)
             Profile.objects.update(rating=None)
-            for contest in Contest.objects.filter(is_rated=True, end_time__lte=timezone.now()).order_by('end_time'):
-                rate_contest(contest)
+            store = RatingStore()
+            for contest in Contest.objects.filter(is_rated=True, end_time__lte=timezone.now()) \
+                                          .order_by('end_time', 'id'):
+                rate_contest(contest, store)
         return HttpResponseRedirect(reverse('admin:judge_contest_changelist'))
 
     def rate_view(self, request, id):
@@ -347,9 +350,12 @@ class ContestAdmin(NoBatchDeleteMixin, VersionAdmin):
         contest = get_object_or_404(Contest, id=id)
         if not contest.is_rated or not contest.ended:
             raise Http404()
-        with transaction.atomic():
-            contest.rate()
-        return HttpResponseRedirect(request.META.get('HTTP_REFERER', reverse('admin:judge_contest_changelist')))
+        from judge.tasks import rerate_contests
+        status = rerate_contests.delay(contest.id)
+        return redirect_to_task_status(
+            status, message=_('Rating %s and the contests after it...') % (contest.name,),
+            redirect=request.META.get('HTTP_REFERER', reverse('admin:judge_contest_changelist')),
+        )
 
     def get_form(self, request, obj=None, **kwargs):
         form = super(ContestAdmin, self).get_form(request, obj, **kwargs)
@@ -6,7 +6,7 @@ from django.utils.translation import gettext, gettext_lazy as _, ngettext
 from reversion.admin import VersionAdmin
 
 from django_ace import AceWidget
-from judge.models import Profile, WebAuthnCredential
+from judge.models import ProblemUserStats, Profile, WebAuthnCredential
 from judge.utils.views import NoBatchDeleteMixin
 from judge.widgets import AdminMartorWidget, AdminSelect2MultipleWidget, AdminSelect2Widget
 
@@ -119,6 +119,7 @@ class ProfileAdmin(NoBatchDeleteMixin, VersionAdmin):
     def recalculate_points(self, request, queryset):
         count = 0
         for profile in queryset:
+            ProblemUserStats.refresh_user(profile.id)
             profile.calculate_points()
             count += 1
         self.message_user(request, ngettext('%d user had scores recalculated.',
@@ -14,8 +14,9 @@ from django.utils.translation import gettext, gettext_lazy as _, ngettext, pgett
 from reversion.admin import VersionAdmin
 
 from django_ace import AceWidget
-from judge.models import ContestParticipation, ContestProblem, ContestSubmission, Profile, Submission, \
-    SubmissionSource, SubmissionTestCase
+from judge.judgeapi import judge_submissions
+from judge.models import ContestParticipation, ContestProblem, ContestSubmission, ProblemUserStats, Profile, \
+    Submission, SubmissionSource, SubmissionTestCase
 from judge.utils.raw_sql import use_straight_join
 
 
@@ -172,9 +173,7 @@ class SubmissionAdmin(VersionAdmin):
         if not request.user.has_perm('judge.edit_all_problem'):
             id = request.profile.id
             queryset = queryset.filter(Q(problem__authors__id=id) | Q(problem__curators__id=id))
-        judged = len(queryset)
-        for model in queryset:
-            model.judge(rejudge=True, batch_rejudge=True, rejudge_user=request.user)
+        judged = judge_submissions(queryset, rejudge=True, batch_rejudge=True, rejudge_user=request.user)
         self.message_user(request, ngettext('%d submission was successfully scheduled for rejudging.',
                                             '%d submissions were successfully scheduled for rejudging.',
                                             judged) % judged)
@@ -195,6 +194,9 @@ class SubmissionAdmin(VersionAdmin):
             submission.save()
             submission.update_contest()
 
+        for problem_id, user_id in queryset.values_list('problem_id', 'user_id').order_by().distinct():
+            ProblemUserStats.refresh(problem_id, user_id)
+
         for profile in Profile.objects.filter(id__in=queryset.values_list('user_id', flat=True).distinct()):
             profile.calculate_points()
             cache.delete('user_complete:%d' % profile.id)
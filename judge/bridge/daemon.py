@@ -9,6 +9,7 @@ from judge.bridge.django_handler import DjangoHandler
 from judge.bridge.judge_handler import JudgeHandler
 from judge.bridge.judge_list import JudgeList
 from judge.bridge.server import Server
+from judge.bridge.stats_updater import StatsUpdater
 from judge.models import Judge, Submission
 
 logger = logging.getLogger('judge.bridge')
@@ -24,7 +25,14 @@ def judge_daemon():
         .update(status='IE', result='IE', error=None)
     judges = JudgeList()
 
-    judge_server = Server(settings.BRIDGED_JUDGE_ADDRESS, partial(JudgeHandler, judges=judges))
+    stats_updater = None
+    if settings.BRIDGED_STATS_UPDATE_WORKERS:
+        stats_updater = StatsUpdater(delay=settings.BRIDGED_STATS_UPDATE_DELAY,
+                                     workers=settings.BRIDGED_STATS_UPDATE_WORKERS)
+        stats_updater.start()
+
+    judge_server = Server(settings.BRIDGED_JUDGE_ADDRESS,
+                          partial(JudgeHandler, judges=judges, stats_updater=stats_updater))
     django_server = Server(settings.BRIDGED_DJANGO_ADDRESS, partial(DjangoHandler, judges=judges))
 
     threading.Thread(target=django_server.serve_forever).start()
@@ -45,3 +53,5 @@ def judge_daemon():
     finally:
         django_server.shutdown()
         judge_server.shutdown()
+        if stats_updater is not None:
+            stats_updater.stop()
@@ -16,6 +16,7 @@ class DjangoHandler(ZlibPacketHandler):
 
         self.handlers = {
             'submission-request': self.on_submission,
+            'submission-batch-request': self.on_submission_batch,
             'terminate-submission': self.on_termination,
             'disconnect-judge': self.on_disconnect_request,
             'disable-judge': self.on_disable_judge,
@@ -32,8 +33,14 @@ class DjangoHandler(ZlibPacketHandler):
         except Exception:
             logger.exception('Error in packet handling (Django-facing)')
             result = {'name': 'bad-request'}
-        self.send(result)
-        raise Disconnect()
+
+        # Packets with a request ID come from a persistent connection: the reply is wrapped with the same ID and the
+        # connection is kept open for further requests. Otherwise, this is a one-shot connection.
+        if 'request-id' in packet:
+            self.send({'request-id': packet['request-id'], 'response': result})
+        else:
+            self.send(result)
+            raise Disconnect()
 
     def on_submission(self, data):
         id = data['submission-id']
@@ -48,6 +55,17 @@ class DjangoHandler(ZlibPacketHandler):
         self.judges.judge(id, problem, language, source, judge_id, priority, banned_judges)
         return {'name': 'submission-received', 'submission-id': id}
 
+    def on_submission_batch(self, data):
+        batch = []
+        for submission in data['submissions']:
+            if not self.judges.check_priority(submission['priority']):
+                continue
+            batch.append((submission['submission-id'], submission['problem-id'], submission['language'],
+                          submission['source'], submission['judge-id'], submission['priority'],
+                          submission['banned-judges']))
+        self.judges.judge_batch(batch)
+        return {'name': 'submission-batch-received', 'submission-ids': [submission[0] for submission in batch]}
+
     def on_termination(self, data):
         return {'name': 'submission-received', 'judge-aborted': self.judges.abort(data['submission-id'])}
 
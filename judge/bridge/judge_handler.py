@@ -12,22 +12,64 @@ from django.utils import timezone
 
 from judge import event_poster as event
 from judge.bridge.base_handler import ZlibPacketHandler, proxy_list
+from judge.bridge.submission_updates import SubmissionUpdateCoalescer
 from judge.caching import finished_submission
-from judge.models import Judge, Language, LanguageLimit, Problem, Profile, \
+from judge.models import Judge, Language, LanguageLimit, Problem, ProblemUserStats, Profile, \
     RuntimeVersion, Submission, SubmissionTestCase
 from judge.utils.url import get_absolute_url
 
 logger = logging.getLogger('judge.bridge')
 json_log = logging.getLogger('judge.json.bridge')
 
-UPDATE_RATE_LIMIT = 5
-UPDATE_RATE_TIME = 0.5
 SubmissionData = namedtuple(
     'SubmissionData',
     'time memory short_circuit pretests_only contest_no attempt_no user_id file_only file_size_limit',
 )
 
 
+class GradingAggregate(object):
+    """Running aggregate of the test case results of a submission, as needed to finalize it at grading end."""
+
+    STATUS_CODES = ['SC', 'AC', 'WA', 'MLE', 'TLE', 'IR', 'RTE', 'OLE']
+
+    def __init__(self):
+        self.time = 0
+        self.memory = 0
+        self.points = 0.0
+        self.total = 0
+        self.status = 0
+        self.batches = {}  # batch number: [min points, max total]
+
+    def add(self, status, time, memory, points, total, batch):
+        self.time += time
+        if not batch:
+            self.points += points
+            self.total += total
+        elif batch in self.batches:
+            self.batches[batch][0] = min(self.batches[batch][0], points)
+            self.batches[batch][1] = max(self.batches[batch][1], total)
+        else:
+            self.batches[batch] = [points, total]
+        self.memory = max(self.memory, memory)
+        self.status = max(self.status, self.STATUS_CODES.index(status))
+
+    @classmethod
+    def from_test_cases(cls, test_cases):
+        aggregate = cls()
+        for case in test_cases:
+            aggregate.add(case.status, case.time, case.memory, case.points, case.total, case.batch)
+        return aggregate
+
+    def finalize(self):
+        """Returns (time, memory, case points, case total, result) for the submission."""
+        points = self.points
+        total = self.total
+        for batch_points, batch_total in self.batches.values():
+            points += batch_points
+            total += batch_total
+        return self.time, self.memory, round(points, 1), round(total, 1), self.STATUS_CODES[self.status]
+
+
 def _ensure_connection():
     db.connection.close_if_unusable_or_obsolete()
 
@@ -39,10 +81,11 @@ def get_absolute_submission_file_url(source):
 class JudgeHandler(ZlibPacketHandler):
     proxies = proxy_list(settings.BRIDGED_JUDGE_PROXIES or [])
 
-    def __init__(self, request, client_address, server, judges):
+    def __init__(self, request, client_address, server, judges, stats_updater=None):
         super().__init__(request, client_address, server)
 
         self.judges = judges
+        self.stats_updater = stats_updater
         self.handlers = {
             'grading-begin': self.on_grading_begin,
             'grading-end': self.on_grading_end,
@@ -74,14 +117,17 @@ class JudgeHandler(ZlibPacketHandler):
         self._ping_average = deque(maxlen=6)  # 1 minute average, just like load
         self._time_delta = deque(maxlen=6)
 
-        # each value is (updates, last reset)
-        self.update_counter = {}
+        self.test_case_updates = SubmissionUpdateCoalescer(self._post_test_case,
+                                                           settings.BRIDGED_TEST_CASE_UPDATE_INTERVAL)
         self.judge = None
         self.judge_address = None
 
         self._submission_cache_id = None
         self._submission_cache = {}
 
+        # (submission id, GradingAggregate) for the submission being graded
+        self._grading_aggregate = (None, None)
+
     def on_connect(self):
         self.timeout = 15
         logger.info('Judge connected from: %s', self.client_address)
@@ -89,6 +135,7 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_disconnect(self):
         self._stop_ping.set()
+        self.test_case_updates.close()
         if self._working:
             logger.error('Judge %s disconnected while handling submission %s', self.name, self._working)
         self.judges.remove(self)
@@ -346,6 +393,7 @@ class JudgeHandler(ZlibPacketHandler):
                 status='G', is_pretested=packet['pretested'], current_testcase=1,
                 batch=False, judged_date=timezone.now()):
             SubmissionTestCase.objects.filter(submission_id=packet['submission-id']).delete()
+            self._grading_aggregate = (packet['submission-id'], GradingAggregate())
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {'type': 'grading-begin'})
             self._post_update_submission(packet['submission-id'], 'grading-begin')
             json_log.info(self._make_json_log(packet, action='grading-begin'))
@@ -365,36 +413,13 @@ class JudgeHandler(ZlibPacketHandler):
             json_log.error(self._make_json_log(packet, action='grading-end', info='unknown submission'))
             return
 
-        time = 0
-        memory = 0
-        points = 0.0
-        total = 0
-        status = 0
-        status_codes = ['SC', 'AC', 'WA', 'MLE', 'TLE', 'IR', 'RTE', 'OLE']
-        batches = {}  # batch number: (points, total)
-
-        for case in SubmissionTestCase.objects.filter(submission=submission):
-            time += case.time
-            if not case.batch:
-                points += case.points
-                total += case.total
-            else:
-                if case.batch in batches:
-                    batches[case.batch][0] = min(batches[case.batch][0], case.points)
-                    batches[case.batch][1] = max(batches[case.batch][1], case.total)
-                else:
-                    batches[case.batch] = [case.points, case.total]
-            memory = max(memory, case.memory)
-            i = status_codes.index(case.status)
-            if i > status:
-                status = i
-
-        for i in batches:
-            points += batches[i][0]
-            total += batches[i][1]
-
-        points = round(points, 1)
-        total = round(total, 1)
+        aggregate_id, aggregate = self._grading_aggregate
+        self._grading_aggregate = (None, None)
+        if aggregate_id != submission.id:
+            # We did not see grading begin on this connection, so the test cases have to be read back.
+            aggregate = GradingAggregate.from_test_cases(SubmissionTestCase.objects.filter(submission=submission))
+        time, memory, points, total, result = aggregate.finalize()
+
         submission.case_points = points
         submission.case_total = total
 
@@ -407,7 +432,7 @@ class JudgeHandler(ZlibPacketHandler):
         submission.time = time
         submission.memory = memory
         submission.points = sub_points
-        submission.result = status_codes[status]
+        submission.result = result
         submission.save()
 
         json_log.info(self._make_json_log(
@@ -417,16 +442,24 @@ class JudgeHandler(ZlibPacketHandler):
             problem=problem.code, finish=True,
         ))
 
-        if problem.is_public and not problem.is_organization_private:
-            submission.user._updating_stats_only = True
-            submission.user.calculate_points()
+        if self.stats_updater is None:
+            if ProblemUserStats.refresh(problem.id, submission.user_id) and \
+                    problem.is_public and not problem.is_organization_private:
+                submission.user._updating_stats_only = True
+                submission.user.calculate_points()
 
-        problem._updating_stats_only = True
-        problem.update_stats()
-        submission.update_contest()
+            submission.update_contest()
+        else:
+            # The expensive recomputes are coalesced and run in the background, so that this judge can move on to the
+            # next submission. The user's points are recomputed after their problem statistics, and the contest update
+            # event is posted once the participation has been recomputed.
+            self.stats_updater.update_problem(problem.id, submission.user_id)
+            if submission.update_contest(recompute_participation=False):
+                self.stats_updater.update_participation(submission.contest.participation_id)
 
         finished_submission(submission)
 
+        self.test_case_updates.flush(submission.id)
         event.post('sub_%s' % submission.id_secret, {
             'type': 'grading-end',
             'time': time,
@@ -435,7 +468,7 @@ class JudgeHandler(ZlibPacketHandler):
             'total': float(problem.points),
             'result': submission.result,
         })
-        if hasattr(submission, 'contest'):
+        if self.stats_updater is None and hasattr(submission, 'contest'):
             participation = submission.contest.participation
             event.post('contest_%d' % participation.contest_id, {'type': 'update'})
         self._post_update_submission(submission.id, 'grading-end', done=True)
@@ -445,6 +478,8 @@ class JudgeHandler(ZlibPacketHandler):
         self._free_self(packet)
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='CE', result='CE', error=packet['log']):
+            self.test_case_updates.flush(packet['submission-id'])
+            self._update_stats(packet['submission-id'])
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {
                 'type': 'compile-error',
                 'log': packet['log'],
@@ -477,6 +512,8 @@ class JudgeHandler(ZlibPacketHandler):
 
         id = packet['submission-id']
         if Submission.objects.filter(id=id).update(status='IE', result='IE', error=packet['message']):
+            self.test_case_updates.flush(id)
+            self._update_stats(id)
             event.post('sub_%s' % Submission.get_id_secret(id), {'type': 'internal-error'})
             self._post_update_submission(id, 'internal-error', done=True)
             json_log.info(self._make_json_log(packet, action='internal-error', message=packet['message'],
@@ -491,6 +528,8 @@ class JudgeHandler(ZlibPacketHandler):
         self._free_self(packet)
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='AB', result='AB', points=0):
+            self.test_case_updates.flush(packet['submission-id'])
+            self._update_stats(packet['submission-id'])
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {'type': 'aborted-submission'})
             self._post_update_submission(packet['submission-id'], 'terminated', done=True)
             json_log.info(self._make_json_log(packet, action='aborted', finish=True, result='AB'))
@@ -566,28 +605,20 @@ class JudgeHandler(ZlibPacketHandler):
                 runtime_version=result.get('runtime-version', ''),
             ))
 
-        do_post = True
+        self.test_case_updates.add(id, max_position)
 
-        if id in self.update_counter:
-            cnt, reset = self.update_counter[id]
-            cnt += 1
-            if time.monotonic() - reset > UPDATE_RATE_TIME:
-                del self.update_counter[id]
-            else:
-                self.update_counter[id] = (cnt, reset)
-                if cnt > UPDATE_RATE_LIMIT:
-                    do_post = False
-        if id not in self.update_counter:
-            self.update_counter[id] = (1, time.monotonic())
-
-        if do_post:
-            event.post('sub_%s' % Submission.get_id_secret(id), {
-                'type': 'test-case',
-                'id': max_position,
-            })
-            self._post_update_submission(id, state='test-case')
+        try:
+            SubmissionTestCase.objects.bulk_create(bulk_test_case_updates)
+        except Exception:
+            # The running aggregate no longer matches what is stored, so let grading end read the test cases back.
+            self._grading_aggregate = (None, None)
+            raise
 
-        SubmissionTestCase.objects.bulk_create(bulk_test_case_updates)
+        aggregate_id, aggregate = self._grading_aggregate
+        if aggregate_id == id:
+            for test_case in bulk_test_case_updates:
+                aggregate.add(test_case.status, test_case.time, test_case.memory, test_case.points, test_case.total,
+                              test_case.batch)
 
     def on_malformed(self, packet):
         logger.error('%s: Malformed packet: %s', self.name, packet)
@@ -602,6 +633,15 @@ class JudgeHandler(ZlibPacketHandler):
         self.load = packet['load']
         self._update_ping()
 
+    def _update_stats(self, id):
+        # A rejudged submission may end without being graded, and its old result must no longer be counted.
+        if self.stats_updater is None:
+            ProblemUserStats.refresh_submissions([id])
+            return
+        ids = Submission.objects.filter(id=id).values_list('problem_id', 'user_id').first()
+        if ids is not None:
+            self.stats_updater.update_problem(*ids)
+
     def _free_self(self, packet):
         self.judges.on_judge_free(self, packet['submission-id'])
 
@@ -628,6 +668,13 @@ class JudgeHandler(ZlibPacketHandler):
         data.update(kwargs)
         return json.dumps(data)
 
+    def _post_test_case(self, id, position):
+        event.post('sub_%s' % Submission.get_id_secret(id), {
+            'type': 'test-case',
+            'id': position,
+        })
+        self._post_update_submission(id, state='test-case')
+
     def _post_update_submission(self, id, state, done=False):
         if self._submission_cache_id == id:
             data = self._submission_cache
@@ -639,14 +686,17 @@ class JudgeHandler(ZlibPacketHandler):
             self._submission_cache_id = id
 
         if data['problem__is_public']:
+            # The organizations are only looked up once per submission.
+            if 'organizations' not in data:
+                data['organizations'] = list(Profile.objects.get(id=data['user_id']).organizations
+                                             .values_list('id', flat=True))
             event.post('submissions', {
                 'type': 'done-submission' if done else 'update-submission',
                 'state': state, 'id': id,
                 'contest': data['contest_object_id'],
                 'user': data['user_id'], 'problem': data['problem_id'],
                 'status': data['status'], 'language': data['language__key'],
-                'organizations':
-                [x[0] for x in Profile.objects.get(id=data['user_id']).organizations.values_list('id')],
+                'organizations': data['organizations'],
             })
 
     def on_cleanup(self):
@@ -1,60 +1,119 @@
+import heapq
 import logging
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from itertools import count
 from random import random
 from threading import RLock
 
 from judge.judge_priority import REJUDGE_PRIORITY
 
-try:
-    from llist import dllist
-except ImportError:
-    from pyllist import dllist
-
 logger = logging.getLogger('judge.bridge')
 
-PriorityMarker = namedtuple('PriorityMarker', 'priority')
+QueuedSubmission = namedtuple('QueuedSubmission', 'seq id problem language source judge_id banned_judges priority')
 
 
 class JudgeList(object):
     priorities = 4
 
     def __init__(self):
-        self.queue = dllist()
-        self.priority = [self.queue.append(PriorityMarker(i)) for i in range(self.priorities)]
+        # For each priority, queued submissions are bucketed by (problem, language, judge_id). Each bucket maps
+        # submission ID to QueuedSubmission in queue order, and the sequence number gives the queue order across
+        # buckets. The heads of the buckets are kept in a heap per priority, so that a free judge only looks at the
+        # buckets before the first submission it can judge, instead of walking the whole queue.
+        self.queue = [{} for _ in range(self.priorities)]
+        self.heads = [[] for _ in range(self.priorities)]
         self.judges = set()
         self.node_map = {}
         self.submission_map = {}
         self.lock = RLock()
+        self._sequence = count()
+
+    def _enqueue(self, id, problem, language, source, judge_id, priority, banned_judges):
+        entry = QueuedSubmission(next(self._sequence), id, problem, language, source, judge_id,
+                                 frozenset(banned_judges), priority)
+        key = (problem, language, judge_id)
+        bucket = self.queue[priority].get(key)
+        if bucket is None:
+            bucket = self.queue[priority][key] = OrderedDict()
+            heapq.heappush(self.heads[priority], (entry.seq, key))
+        bucket[id] = entry
+        self.node_map[id] = entry
+
+    def _dequeue(self, entry):
+        buckets = self.queue[entry.priority]
+        key = (entry.problem, entry.language, entry.judge_id)
+        bucket = buckets[key]
+        was_head = next(iter(bucket)) == entry.id
+        del bucket[entry.id]
+        del self.node_map[entry.id]
+        if not bucket:
+            del buckets[key]
+        elif was_head:
+            # The old heap entry for this bucket is now stale, and will be discarded when it is popped.
+            heapq.heappush(self.heads[entry.priority], (next(iter(bucket.values())).seq, key))
+
+    def _next_for_judge(self, judge, priority):
+        buckets = self.queue[priority]
+        heads = self.heads[priority]
+        best = None
+        popped = []
+        while heads and (best is None or heads[0][0] < best.seq):
+            seq, key = heapq.heappop(heads)
+            bucket = buckets.get(key)
+            if bucket is None or next(iter(bucket.values())).seq != seq:
+                continue
+            popped.append((seq, key))
+
+            # The capability check is done once per (problem, language, judge_id) bucket instead of once per queued
+            # submission. Only banned judges need to be checked per submission.
+            if not judge.can_judge(*key):
+                continue
+            for entry in bucket.values():
+                if best is not None and entry.seq > best.seq:
+                    break
+                if judge.name not in entry.banned_judges:
+                    best = entry
+                    break
+
+        for item in popped:
+            heapq.heappush(heads, item)
+        return best
+
+    def _should_reserve_judge(self):
+        # We reserve a free judge for high priority submissions when there is more than one judge.
+        return self.count_not_disabled() > 1 and sum(
+            not judge.working and not judge.is_disabled for judge in self.judges) <= 1
 
     def _handle_free_judge(self, judge):
         with self.lock:
-            node = self.queue.first
-            priority = 0
-            while node:
-                if isinstance(node.value, PriorityMarker):
-                    priority = node.value.priority + 1
-                elif priority >= REJUDGE_PRIORITY and self.count_not_disabled() > 1 and sum(
-                        not judge.working and not judge.is_disabled for judge in self.judges) <= 1:
+            for priority in range(self.priorities):
+                if not self.queue[priority]:
+                    continue
+                if priority >= REJUDGE_PRIORITY and self._should_reserve_judge():
                     return
-                else:
-                    id, problem, language, source, judge_id, banned_judges = node.value
-                    if judge.name not in banned_judges and judge.can_judge(problem, language, judge_id):
-                        self.submission_map[id] = judge
-                        try:
-                            judge.submit(id, problem, language, source)
-                        except Exception:
-                            logger.exception('Failed to dispatch %d (%s, %s) to %s', id, problem, language, judge.name)
-                            self.judges.remove(judge)
-                            return
-                        logger.info('Dispatched queued submission %d: %s', id, judge.name)
-                        self.queue.remove(node)
-                        del self.node_map[id]
-                        break
-                node = node.next
+
+                entry = self._next_for_judge(judge, priority)
+                if entry is None:
+                    continue
+
+                id, problem, language, source = entry.id, entry.problem, entry.language, entry.source
+                self.submission_map[id] = judge
+                try:
+                    judge.submit(id, problem, language, source)
+                except Exception:
+                    logger.exception('Failed to dispatch %d (%s, %s) to %s', id, problem, language, judge.name)
+                    self.judges.remove(judge)
+                    return
+                logger.info('Dispatched queued submission %d: %s', id, judge.name)
+                self._dequeue(entry)
+                return
 
     def count_not_disabled(self):
         return sum(not judge.is_disabled for judge in self.judges)
 
+    def count_queued(self):
+        return len(self.node_map)
+
     def register(self, judge):
         with self.lock:
             # Disconnect all judges with the same name, see <https://github.com/DMOJ/online-judge/issues/828>
@@ -113,12 +172,11 @@ class JudgeList(object):
                 return True
             except KeyError:
                 try:
-                    node = self.node_map[submission]
+                    entry = self.node_map[submission]
                 except KeyError:
                     pass
                 else:
-                    self.queue.remove(node)
-                    del self.node_map[submission]
+                    self._dequeue(entry)
                 return False
 
     def check_priority(self, priority):
@@ -157,8 +215,10 @@ class JudgeList(object):
                     self.judges.discard(judge)
                     return self.judge(id, problem, language, source, judge_id, priority, banned_judges)
             else:
-                self.node_map[id] = self.queue.insert(
-                    (id, problem, language, source, judge_id, banned_judges),
-                    self.priority[priority],
-                )
+                self._enqueue(id, problem, language, source, judge_id, priority, banned_judges)
                 logger.info('Queued submission: %d', id)
+
+    def judge_batch(self, submissions):
+        with self.lock:
+            for id, problem, language, source, judge_id, priority, banned_judges in submissions:
+                self.judge(id, problem, language, source, judge_id, priority, banned_judges)
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django import db
+
+from judge import event_poster as event
+from judge.models import ContestParticipation, Problem, ProblemUserStats, Profile
+
+logger = logging.getLogger('judge.bridge')
+
+
+class StatsUpdater(object):
+    """Recomputes user, problem and contest participation statistics after grading, off the judge handler threads.
+
+    Updates are keyed by (kind, id). An update waits `delay` seconds before running, and scheduling the same update
+    again while it is still waiting has no effect, so a burst of submissions by the same user, by the same user to the
+    same problem or in the same participation collapses into a single recompute.
+    """
+
+    def __init__(self, delay=2, workers=1, report_interval=60):
+        self.delay = delay
+        self.report_interval = report_interval
+        self._pending = OrderedDict()  # (kind, id): time first scheduled
+        self._running = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+
+        self.scheduled = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_lag = 0
+        self._total_lag = 0
+
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        self._reporter = threading.Thread(target=self._report, daemon=True)
+
+        self.handlers = {
+            'profile': self._update_profile,
+            'problem': self._update_problem,
+            'participation': self._update_participation,
+        }
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+        self._reporter.start()
+
+    def stop(self):
+        """Stops the workers, after running everything still pending."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def schedule(self, kind, id):
+        with self._cond:
+            self.scheduled += 1
+            if (kind, id) in self._pending:
+                self.coalesced += 1
+                return
+            self._pending[kind, id] = time.monotonic()
+            self._cond.notify()
+
+    def update_profile(self, profile_id):
+        self.schedule('profile', profile_id)
+
+    def update_problem(self, problem_id, user_id):
+        self.schedule('problem', (problem_id, user_id))
+
+    def update_participation(self, participation_id):
+        self.schedule('participation', participation_id)
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending),
+                'running': len(self._running),
+                'scheduled': self.scheduled,
+                'coalesced': self.coalesced,
+                'processed': self.processed,
+                'failed': self.failed,
+                'average_lag': self._total_lag / self.processed if self.processed else 0,
+                'max_lag': self.max_lag,
+            }
+
+    def _next(self):
+        # Returns the next update that is due, waiting for it if needed, or None when stopping with nothing left.
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = None
+                for key, scheduled in self._pending.items():
+                    if key in self._running:
+                        continue
+                    due = scheduled if self._stopping else scheduled + self.delay
+                    if due <= now:
+                        del self._pending[key]
+                        self._running.add(key)
+                        return key, scheduled
+                    # Updates are ordered by the time they were scheduled, so nothing after this is due.
+                    wait = due - now
+                    break
+                if self._stopping and not self._pending:
+                    return None
+                self._cond.wait(wait)
+
+    def _work(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            (kind, id), scheduled = item
+            lag = time.monotonic() - scheduled
+            try:
+                db.connection.close_if_unusable_or_obsolete()
+                self.handlers[kind](id)
+            except Exception:
+                logger.exception('Failed to update %s %s', kind, id)
+                with self._cond:
+                    self.failed += 1
+            finally:
+                with self._cond:
+                    self._running.discard((kind, id))
+                    self.processed += 1
+                    self._total_lag += lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self._cond.notify_all()
+
+    def _report(self):
+        while not self._stopping:
+            time.sleep(self.report_interval)
+            logger.info('Stats updater: %s', ', '.join('%s=%s' % item for item in self.metrics().items()))
+
+    def _update_profile(self, id):
+        try:
+            profile = Profile.objects.get(id=id)
+        except Profile.DoesNotExist:
+            return
+        profile._updating_stats_only = True
+        profile.calculate_points()
+
+    def _update_problem(self, id):
+        problem_id, user_id = id
+        if ProblemUserStats.refresh(problem_id, user_id) and \
+                Problem.get_public_problems().filter(id=problem_id).exists():
+            self.update_profile(user_id)
+
+    def _update_participation(self, id):
+        try:
+            participation = ContestParticipation.objects.get(id=id)
+        except ContestParticipation.DoesNotExist:
+            return
+        participation.recompute_results()
+        event.post('contest_%d' % participation.contest_id, {'type': 'update'})
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger('judge.bridge')
+
+
+class SubmissionUpdateCoalescer(object):
+    """Merges the test case progress of submissions into at most one update per `interval` seconds.
+
+    `post(id, position)` is called with the highest test case position reached by a submission. Progress that arrives
+    less than `interval` seconds after the last update is held back, and posted once the interval is over, or right
+    away by `flush` when the submission changes state.
+    """
+
+    def __init__(self, post, interval=0.5):
+        self.post = post
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = {}  # id: time of the last update
+        self._pending = {}  # id: position held back
+        self._timers = {}
+
+    def add(self, id, position):
+        with self._lock:
+            now = time.monotonic()
+            last = self._last.get(id)
+            if last is not None and now - last < self.interval:
+                self._pending[id] = max(position, self._pending.get(id, position))
+                if id not in self._timers:
+                    timer = threading.Timer(self.interval - (now - last), self._expire, (id,))
+                    timer.daemon = True
+                    self._timers[id] = timer
+                    timer.start()
+                return
+
+            self._last[id] = now
+            self._pending.pop(id, None)
+            self._post(id, position)
+
+    def flush(self, id):
+        """Posts the progress held back for a submission, if any, and forgets about it."""
+        with self._lock:
+            timer = self._timers.pop(id, None)
+            if timer is not None:
+                timer.cancel()
+            self._last.pop(id, None)
+            position = self._pending.pop(id, None)
+            if position is not None:
+                self._post(id, position)
+
+    def close(self):
+        """Drops all the progress held back."""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._last.clear()
+            self._pending.clear()
+
+    def _expire(self, id):
+        with self._lock:
+            if self._timers.pop(id, None) is None:
+                return
+            position = self._pending.pop(id, None)
+            if position is not None:
+                self._last[id] = time.monotonic()
+                self._post(id, position)
+
+    def _post(self, id, position):
+        # Updates are posted while holding the lock, so that they are never posted out of order.
+        try:
+            self.post(id, position)
+        except Exception:
+            logger.exception('Failed to post test case update for submission %s', id)
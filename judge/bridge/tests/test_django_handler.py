@@ -0,0 +1,119 @@
+import threading
+from functools import partial
+
+from django.test import SimpleTestCase, override_settings
+
+from judge import judgeapi
+from judge.bridge.django_handler import DjangoHandler
+from judge.bridge.server import Server
+
+
+class FakeJudgeList:
+    def __init__(self):
+        self.judged = []
+        self.aborted = []
+
+    def check_priority(self, priority):
+        return 0 <= priority < 4
+
+    def judge(self, id, problem, language, source, judge_id, priority, banned_judges):
+        self.judged.append(id)
+
+    def judge_batch(self, submissions):
+        for submission in submissions:
+            self.judge(*submission)
+
+    def abort(self, submission):
+        self.aborted.append(submission)
+        return False
+
+    def update_disable_judge(self, judge_id, is_disabled):
+        pass
+
+
+class DjangoHandlerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.judges = FakeJudgeList()
+        self.server = Server([('127.0.0.1', 0)], partial(DjangoHandler, judges=self.judges))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.address = self.server.servers[0].server_address
+
+    def tearDown(self):
+        if judgeapi._connection is not None:
+            judgeapi._connection.close()
+        self.server.shutdown()
+        self.thread.join()
+        for server in self.server.servers:
+            server.server_close()
+
+    def submission_request(self, id):
+        return {
+            'name': 'submission-request',
+            'submission-id': id,
+            'problem-id': 'aplusb',
+            'language': 'PY3',
+            'source': '',
+            'judge-id': None,
+            'banned-judges': [],
+            'priority': 1,
+        }
+
+    def test_one_shot(self):
+        with override_settings(BRIDGED_DJANGO_CONNECT=self.address, BRIDGED_DJANGO_PERSISTENT=False):
+            for id in range(1, 4):
+                response = judgeapi.judge_request(self.submission_request(id))
+                self.assertEqual(response, {'name': 'submission-received', 'submission-id': id})
+        self.assertEqual(self.judges.judged, [1, 2, 3])
+
+    def test_persistent(self):
+        with override_settings(BRIDGED_DJANGO_CONNECT=self.address, BRIDGED_DJANGO_PERSISTENT=True):
+            connection = judgeapi._get_connection()
+            for id in range(1, 4):
+                response = judgeapi.judge_request(self.submission_request(id))
+                self.assertEqual(response, {'name': 'submission-received', 'submission-id': id})
+            self.assertIs(judgeapi._get_connection(), connection)
+
+            response = judgeapi.judge_request({'name': 'terminate-submission', 'submission-id': 2})
+            self.assertEqual(response, {'name': 'submission-received', 'judge-aborted': False})
+            self.assertIsNone(judgeapi.judge_request({'name': 'disable-judge', 'judge-id': 'a', 'is-disabled': True}))
+
+        self.assertEqual(self.judges.judged, [1, 2, 3])
+        self.assertEqual(self.judges.aborted, [2])
+
+    def test_batch(self):
+        requests = [self.submission_request(id) for id in range(1, 4)]
+        requests[1]['priority'] = 100
+        with override_settings(BRIDGED_DJANGO_CONNECT=self.address, BRIDGED_DJANGO_PERSISTENT=True):
+            response = judgeapi.judge_request({'name': 'submission-batch-request', 'submissions': requests})
+        self.assertEqual(response, {'name': 'submission-batch-received', 'submission-ids': [1, 3]})
+        self.assertEqual(self.judges.judged, [1, 3])
+
+    def test_persistent_concurrent(self):
+        errors = []
+
+        def submit(ids):
+            try:
+                for id in ids:
+                    response = judgeapi.judge_request(self.submission_request(id))
+                    if response.get('submission-id') != id:
+                        errors.append((id, response))
+            except Exception as e:
+                errors.append(e)
+
+        with override_settings(BRIDGED_DJANGO_CONNECT=self.address, BRIDGED_DJANGO_PERSISTENT=True):
+            threads = [threading.Thread(target=submit, args=(range(i * 50, (i + 1) * 50),)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(self.judges.judged), list(range(400)))
+
+    def test_persistent_reconnect(self):
+        with override_settings(BRIDGED_DJANGO_CONNECT=self.address, BRIDGED_DJANGO_PERSISTENT=True):
+            judgeapi.judge_request(self.submission_request(1))
+            judgeapi._get_connection().close()
+            judgeapi.judge_request(self.submission_request(2))
+        self.assertEqual(self.judges.judged, [1, 2])
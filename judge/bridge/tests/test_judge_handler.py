@@ -0,0 +1,121 @@
+import random
+from unittest import mock
+
+from django.test import TestCase
+
+from judge.bridge.judge_handler import GradingAggregate, JudgeHandler
+from judge.models import Language, Problem, ProblemUserStats, Profile, Submission, SubmissionSource, \
+    SubmissionTestCase
+from judge.models.tests.util import create_problem, create_user
+
+
+class GradingAggregateTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.submission = Submission.objects.create(
+            user=create_user(username='aggregate').profile,
+            problem=create_problem(code='aggregate'),
+            language=Language.get_python3(),
+        )
+
+    def random_cases(self, rng):
+        cases = []
+        batch = None
+        for position in range(1, rng.randint(1, 250)):
+            if rng.random() < 0.1:
+                batch = None if batch is not None and rng.random() < 0.5 else (batch or 0) + 1
+            total = rng.choice([0, 1, 2.5, 10])
+            cases.append(SubmissionTestCase(
+                submission=self.submission,
+                case=position,
+                status=rng.choice(GradingAggregate.STATUS_CODES),
+                time=rng.random() * 2,
+                memory=rng.randint(0, 262144),
+                points=rng.choice([0, total, total * rng.random()]),
+                total=total,
+                batch=batch,
+            ))
+        return cases
+
+    def test_matches_database(self):
+        rng = random.Random(1)
+        for i in range(25):
+            with self.subTest(run=i):
+                SubmissionTestCase.objects.filter(submission=self.submission).delete()
+                cases = self.random_cases(rng)
+
+                running = GradingAggregate()
+                for start in range(0, len(cases), 7):
+                    packet = cases[start:start + 7]
+                    SubmissionTestCase.objects.bulk_create(packet)
+                    for case in packet:
+                        running.add(case.status, case.time, case.memory, case.points, case.total, case.batch)
+
+                stored = GradingAggregate.from_test_cases(SubmissionTestCase.objects.filter(submission=self.submission))
+                self.assertEqual(running.finalize(), stored.finalize())
+
+    def test_empty(self):
+        self.assertEqual(GradingAggregate().finalize(), (0, 0, 0.0, 0, 'SC'))
+
+    def test_batches(self):
+        aggregate = GradingAggregate()
+        aggregate.add('AC', 0.5, 100, 1, 1, None)
+        aggregate.add('AC', 0.5, 300, 5, 5, 1)
+        aggregate.add('WA', 0.25, 200, 0, 5, 1)
+        aggregate.add('AC', 0.25, 50, 3, 3, 2)
+        aggregate.add('TLE', 2, 50, 0, 0, None)
+        self.assertEqual(aggregate.finalize(), (3.5, 300, 4.0, 9.0, 'TLE'))
+
+
+class JudgeHandlerStatsTestCase(TestCase):
+    fixtures = ['language_all.json']
+
+    @classmethod
+    def setUpTestData(self):
+        self.problem = create_problem(code='handler_stats', points=10, is_public=True)
+        self.submission = Submission.objects.create(
+            user=create_user(username='handler_stats').profile,
+            problem=self.problem,
+            language=Language.get_python3(),
+            result='AC', points=10, case_points=1, case_total=1, status='D',
+        )
+        SubmissionSource.objects.create(submission=self.submission, source='')
+        self.submission.user.calculate_points()
+
+    def make_handler(self):
+        return JudgeHandler(mock.Mock(), ('127.0.0.1', 0), mock.Mock(), judges=mock.Mock())
+
+    def rejudge(self):
+        response = {'name': 'submission-received', 'submission-id': self.submission.id}
+        with mock.patch('judge.judgeapi.judge_request', return_value=response):
+            self.submission.judge(rejudge=True)
+
+    def assertStats(self, solved):
+        stats = ProblemUserStats.objects.get(problem=self.problem, user_id=self.submission.user_id)
+        self.assertEqual((stats.is_solved, stats.ac_submission_count), (solved, int(solved)))
+        self.assertEqual(stats.points or 0, 10 if solved else 0)
+        problem = Problem.objects.get(id=self.problem.id)
+        self.assertEqual((problem.user_count, problem.ac_submission_count), (int(solved), int(solved)))
+        profile = Profile.objects.get(id=self.submission.user_id)
+        self.assertEqual((profile.problem_count, profile.points), (int(solved), 10 if solved else 0))
+
+    def test_rejudge_terminal_states(self):
+        self.assertStats(True)
+        handler = self.make_handler()
+        packets = [
+            ('CE', handler.on_compile_error, {'log': 'error'}),
+            ('IE', handler.on_internal_error, {'message': 'error'}),
+            ('AB', handler.on_submission_terminated, {}),
+        ]
+        for result, on_packet, packet in packets:
+            with self.subTest(result=result):
+                Submission.objects.filter(id=self.submission.id).update(result='AC', points=10, status='D')
+                ProblemUserStats.refresh_submissions([self.submission.id])
+                self.assertStats(True)
+
+                self.rejudge()
+                on_packet(dict(packet, **{'submission-id': self.submission.id}))
+                self.assertEqual(Submission.objects.get(id=self.submission.id).result, result)
+                self.assertStats(False)
@@ -0,0 +1,170 @@
+import unittest
+
+from judge.bridge.judge_list import JudgeList
+from judge.judge_priority import BATCH_REJUDGE_PRIORITY, CONTEST_SUBMISSION_PRIORITY, DEFAULT_PRIORITY, \
+    REJUDGE_PRIORITY
+
+
+class FakeJudge:
+    def __init__(self, name, problems=('a', 'b'), executors=('PY3', 'CPP17'), load=0):
+        self.name = name
+        self.problems = dict.fromkeys(problems)
+        self.executors = dict.fromkeys(executors)
+        self.is_disabled = False
+        self.load = load
+        self._working = False
+        self.submitted = []
+
+    def can_judge(self, problem, executor, judge_id=None):
+        return problem in self.problems and executor in self.executors and  \
+            ((not judge_id and not self.is_disabled) or self.name == judge_id)
+
+    @property
+    def working(self):
+        return bool(self._working)
+
+    def submit(self, id, problem, language, source):
+        self._working = id
+        self.submitted.append(id)
+
+    def get_current_submission(self):
+        return self._working or None
+
+    def disconnect(self, force=False):
+        pass
+
+
+class JudgeListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.judges = JudgeList()
+
+    def add_judge(self, *args, working=None, **kwargs):
+        judge = FakeJudge(*args, **kwargs)
+        self.judges.judges.add(judge)
+        if working is not None:
+            judge._working = working
+            self.judges.submission_map[working] = judge
+        return judge
+
+    def free(self, judge):
+        self.judges.on_judge_free(judge, judge._working)
+
+    def test_dispatch_to_free_judge(self):
+        judge = self.add_judge('judge')
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.assertEqual(judge.submitted, [1])
+        self.assertEqual(self.judges.count_queued(), 0)
+
+    def test_queue_is_idempotent(self):
+        self.add_judge('judge', working=100)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.assertEqual(self.judges.count_queued(), 1)
+
+    def test_priority_order(self):
+        judge = self.add_judge('judge', working=100)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(2, 'b', 'CPP17', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(3, 'a', 'PY3', '', None, CONTEST_SUBMISSION_PRIORITY)
+        self.judges.judge(4, 'b', 'PY3', '', None, BATCH_REJUDGE_PRIORITY)
+        self.judges.judge(5, 'a', 'CPP17', '', None, CONTEST_SUBMISSION_PRIORITY)
+        self.judges.judge(6, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        for _ in range(6):
+            self.free(judge)
+        self.assertEqual(judge.submitted, [3, 5, 1, 2, 6, 4])
+        self.assertEqual(self.judges.count_queued(), 0)
+
+    def test_unsupported_problem_is_skipped(self):
+        judge = self.add_judge('judge', problems=('a',), working=100)
+        self.judges.judge(1, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(3, 'a', 'JAVA', '', None, DEFAULT_PRIORITY)
+        self.free(judge)
+        self.free(judge)
+        self.assertEqual(judge.submitted, [2])
+        self.assertEqual(sorted(self.judges.node_map), [1, 3])
+
+    def test_banned_judges(self):
+        banned = self.add_judge('banned', working=100)
+        other = self.add_judge('other', working=101)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY, ['banned'])
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.free(banned)
+        self.assertEqual(banned.submitted, [2])
+        self.free(other)
+        self.assertEqual(other.submitted, [1])
+
+    def test_judge_id_pinning(self):
+        pinned = self.add_judge('pinned', working=100)
+        other = self.add_judge('other', working=101)
+        self.judges.judge(1, 'a', 'PY3', '', 'pinned', DEFAULT_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.free(other)
+        self.assertEqual(other.submitted, [2])
+        self.free(other)
+        self.assertEqual(other.submitted, [2])
+
+        pinned.is_disabled = True
+        self.free(pinned)
+        self.assertEqual(pinned.submitted, [1])
+
+    def test_disabled_judge_gets_nothing_unpinned(self):
+        judge = self.add_judge('judge', working=100)
+        judge.is_disabled = True
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.free(judge)
+        self.assertEqual(judge.submitted, [])
+        self.assertEqual(self.judges.count_queued(), 1)
+
+    def test_reserve_judge_for_rejudges(self):
+        first = self.add_judge('first', working=100)
+        second = self.add_judge('second', working=101)
+        self.judges.judge(1, 'a', 'PY3', '', None, REJUDGE_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY)
+
+        # The only free judge is kept in reserve.
+        self.free(first)
+        self.assertEqual(first.submitted, [])
+
+        # With two free judges, one of them can take a rejudge.
+        self.free(second)
+        self.assertEqual(second.submitted, [1])
+        self.assertEqual(self.judges.count_queued(), 1)
+
+    def test_reserve_judge_does_not_block_normal_submissions(self):
+        first = self.add_judge('first', working=100)
+        self.add_judge('second', working=101)
+        self.judges.judge(1, 'a', 'PY3', '', None, REJUDGE_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.free(first)
+        self.assertEqual(first.submitted, [2])
+
+    def test_single_judge_takes_rejudges(self):
+        judge = self.add_judge('judge', working=100)
+        self.judges.judge(1, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY)
+        self.free(judge)
+        self.assertEqual(judge.submitted, [1])
+
+    def test_abort_queued(self):
+        judge = self.add_judge('judge', working=100)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(3, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.assertFalse(self.judges.abort(1))
+        self.assertFalse(self.judges.abort(3))
+        self.free(judge)
+        self.free(judge)
+        self.assertEqual(judge.submitted, [2])
+        self.assertEqual(self.judges.count_queued(), 0)
+
+    def test_judge_batch(self):
+        judge = self.add_judge('judge', working=100)
+        self.judges.judge_batch([
+            (1, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY, []),
+            (2, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY, []),
+            (1, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY, []),
+        ])
+        self.assertEqual(self.judges.count_queued(), 2)
+        self.free(judge)
+        self.free(judge)
+        self.assertEqual(judge.submitted, [1, 2])
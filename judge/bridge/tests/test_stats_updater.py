@@ -0,0 +1,68 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from judge.bridge.stats_updater import StatsUpdater
+
+
+class StatsUpdaterTestCase(SimpleTestCase):
+    def make_updater(self, **kwargs):
+        updater = StatsUpdater(**kwargs)
+        calls = []
+        lock = threading.Lock()
+
+        def record(kind):
+            def handler(id):
+                with lock:
+                    calls.append((kind, id))
+            return handler
+
+        updater.handlers = {kind: record(kind) for kind in updater.handlers}
+        return updater, calls
+
+    def test_coalesce(self):
+        updater, calls = self.make_updater(delay=60, workers=2)
+        updater.start()
+        for _ in range(5):
+            updater.update_profile(1)
+            updater.update_problem(1, 2)
+            updater.update_participation(3)
+        updater.update_profile(2)
+
+        metrics = updater.metrics()
+        self.assertEqual(metrics['queue_depth'], 4)
+        self.assertEqual(metrics['scheduled'], 16)
+        self.assertEqual(metrics['coalesced'], 12)
+
+        # Stopping runs everything still pending without waiting for the delay.
+        updater.stop()
+        self.assertEqual(sorted(calls), [('participation', 3), ('problem', (1, 2)), ('profile', 1), ('profile', 2)])
+        self.assertEqual(updater.metrics()['processed'], 4)
+        self.assertEqual(updater.queue_depth, 0)
+
+    def test_delay(self):
+        updater, calls = self.make_updater(delay=0)
+        updater.start()
+        done = threading.Event()
+        updater.handlers['problem'] = lambda id: done.set()
+        updater.update_problem(1, 2)
+        self.assertTrue(done.wait(5))
+        updater.update_problem(1, 2)
+        updater.stop()
+        self.assertEqual(updater.metrics()['processed'], 2)
+        self.assertEqual(updater.metrics()['coalesced'], 0)
+
+    def test_failure(self):
+        updater, calls = self.make_updater(delay=60)
+
+        def fail(id):
+            raise ValueError()
+
+        updater.handlers['profile'] = fail
+        updater.start()
+        updater.update_profile(1)
+        updater.update_problem(1, 2)
+        with self.assertLogs('judge.bridge', 'ERROR'):
+            updater.stop()
+        self.assertEqual(calls, [('problem', (1, 2))])
+        self.assertEqual(updater.metrics()['failed'], 1)
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from judge.bridge.submission_updates import SubmissionUpdateCoalescer
+
+
+class SubmissionUpdateCoalescerTestCase(SimpleTestCase):
+    def make_coalescer(self, interval):
+        posted = []
+        done = threading.Event()
+
+        def post(id, position):
+            posted.append((id, position))
+            done.set()
+
+        return SubmissionUpdateCoalescer(post, interval), posted, done
+
+    def test_coalesce(self):
+        coalescer, posted, _ = self.make_coalescer(60)
+        for position in range(1, 101):
+            coalescer.add(1, position)
+        coalescer.add(2, 1)
+        self.assertEqual(posted, [(1, 1), (2, 1)])
+
+        # A state change posts the latest progress held back, and only once.
+        coalescer.flush(1)
+        coalescer.flush(1)
+        coalescer.flush(2)
+        self.assertEqual(posted, [(1, 1), (2, 1), (1, 100)])
+
+        # The next update after a flush is posted right away.
+        coalescer.add(1, 101)
+        self.assertEqual(posted[-1], (1, 101))
+        coalescer.close()
+
+    def test_interval_expiry(self):
+        coalescer, posted, done = self.make_coalescer(0.05)
+        coalescer.add(1, 1)
+        done.clear()
+        coalescer.add(1, 2)
+        coalescer.add(1, 3)
+        self.assertEqual(posted, [(1, 1)])
+
+        # Progress held back is posted once the interval is over, without waiting for another update.
+        self.assertTrue(done.wait(5))
+        self.assertEqual(posted, [(1, 1), (1, 3)])
+
+        time.sleep(0.06)
+        coalescer.add(1, 4)
+        self.assertEqual(posted[-1], (1, 4))
+        coalescer.close()
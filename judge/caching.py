@@ -1,3 +1,5 @@
+import time
+
 from django.core.cache import cache
 
 
@@ -8,3 +10,23 @@ def finished_submission(sub):
         keys += ['contest_complete:%d' % participation.id]
         keys += ['contest_attempted:%d' % participation.id]
     cache.delete_many(keys)
+
+
+def get_fragment_versions(*names):
+    """Returns the current version of each named group of cached fragments, to be used in their cache keys."""
+    keys = {name: 'fragment_version:%s' % name for name in names}
+    versions = cache.get_many(keys.values())
+    result = {}
+    for name, key in keys.items():
+        version = versions.get(key)
+        if version is None:
+            # A timestamp never repeats a version that was evicted, so fragments cached under it cannot come back.
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        result[name] = version
+    return result
+
+
+def bump_fragment_versions(*names):
+    cache.delete_many(['fragment_version:%s' % name for name in names])
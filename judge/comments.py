@@ -1,8 +1,8 @@
 from django import forms
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import FilteredRelation, Q
 from django.db.models.expressions import F, Value
 from django.db.models.functions import Coalesce
@@ -16,9 +16,7 @@ from django.views.generic import View
 from django.views.generic.base import TemplateResponseMixin
 from django.views.generic.detail import SingleObjectMixin
 from reversion import revisions
-from reversion.models import Revision, Version
 
-from judge.dblock import LockModel
 from judge.models import Comment, CommentLock
 from judge.widgets import HeavyPreviewPageDownWidget
 
@@ -93,7 +91,7 @@ class CommentedDetailView(TemplateResponseMixin, SingleObjectMixin, View):
             comment = form.save(commit=False)
             comment.author = request.profile
             comment.page = page
-            with LockModel(write=(Comment, Revision, Version), read=(ContentType,)), revisions.create_revision():
+            with transaction.atomic(), revisions.create_revision():
                 revisions.set_user(request.user)
                 revisions.set_comment(_('Posted comment'))
                 comment.save()
@@ -115,6 +113,8 @@ class CommentedDetailView(TemplateResponseMixin, SingleObjectMixin, View):
         context['has_comments'] = queryset.exists()
         context['comment_lock'] = self.is_comment_locked()
         queryset = queryset.select_related('author__user', 'author__display_badge').defer('author__about')
+        # Threads are numbered by their root comments, so the newest threads come first.
+        queryset = queryset.order_by('-tree_id', 'lft')
 
         if self.request.user.is_authenticated:
             profile = self.request.profile
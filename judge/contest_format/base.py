@@ -47,6 +47,22 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    def bulk_update_participations(self, progress=None):
+        """
+        Updates every ContestParticipation object of the contest, like update_participation does for one.
+        Formats that can compute results from a list of submissions should override this to do it set-wise.
+
+        :param progress: An optional judge.utils.celery.Progress to report the number of updated participations to.
+        :return: The number of updated participations.
+        """
+        updated = 0
+        for participation in self.contest.users.iterator():
+            participation.recompute_results()
+            updated += 1
+            if progress is not None:
+                progress.did(1)
+        return updated
+
     @abstractmethod
     def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
         """
@@ -61,6 +77,18 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_participation_solves(self, problems, participation, frozen=False):
+        """
+        Returns the problems fully solved by a participation, and when they were solved.
+
+        :param problems: A list of ContestProblem objects.
+        :param participation: A ContestParticipation object.
+        :param frozen: Whether the ranking is frozen or not. Only useful for ICPC/VNOJ format.
+        :return: A dictionary mapping the ContestProblem's ID, as a string, to the time it was solved in seconds.
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         """
@@ -1,7 +1,10 @@
+from collections import defaultdict
 from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
 
 from django.core.exceptions import ValidationError
-from django.db.models import Max
+from django.db import transaction
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -10,6 +13,7 @@ from django.utils.translation import gettext as _, gettext_lazy
 
 from judge.contest_format.base import BaseContestFormat
 from judge.contest_format.registry import register_contest_format
+from judge.utils.iterator import chunk
 from judge.utils.timedelta import nice_repr
 
 
@@ -25,52 +29,110 @@ class DefaultContestFormat(BaseContestFormat):
     def __init__(self, contest, config):
         super(DefaultContestFormat, self).__init__(contest, config)
 
+    # The fields of each ContestSubmission passed to `compute_participation`, in order.
+    participation_submission_fields = ('problem_id', 'points', 'submission__date')
+    participation_result_fields = ('cumtime', 'score', 'tiebreaker', 'format_data')
+
     def update_participation(self, participation):
+        self.compute_participation(
+            participation, participation.submissions.values_list(*self.participation_submission_fields),
+        )
+        # Only the results are saved, so that a concurrent change to the submission count is not overwritten.
+        participation.save(update_fields=self.participation_result_fields)
+
+    def compute_participation(self, participation, submissions):
+        """
+        Sets a participation's results from its submissions, without saving it.
+
+        :param participation: A ContestParticipation object.
+        :param submissions: A list of tuples of the participation_submission_fields of each of its submissions.
+        """
         cumtime = 0
         points = 0
         format_data = {}
 
-        for result in participation.submissions.values('problem_id').annotate(
-                time=Max('submission__date'), points=Max('points'),
-        ):
-            dt = (result['time'] - participation.start).total_seconds()
-            if result['points']:
+        problems = defaultdict(list)
+        for problem_id, sub_points, date in submissions:
+            problems[problem_id].append((sub_points, date))
+
+        for problem_id, subs in problems.items():
+            time = max(date for _, date in subs)
+            problem_points = max(sub_points for sub_points, _ in subs)
+            dt = (time - participation.start).total_seconds()
+            if problem_points:
                 cumtime += dt
-            format_data[str(result['problem_id'])] = {'time': dt, 'points': result['points']}
-            points += result['points']
+            format_data[str(problem_id)] = {'time': dt, 'points': problem_points}
+            points += problem_points
 
         participation.cumtime = max(cumtime, 0)
         participation.score = round(points, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
-        participation.save()
 
-    def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
-        first_solves = {}
-        total_ac = {}
+    def bulk_update_participations(self, progress=None, chunk_size=1000):
+        from judge.models import ContestParticipation, ContestSubmission
 
-        for problem in problems:
-            problem_id = str(problem.id)
-            min_time = None
-            first_solves[problem_id] = None
-            total_ac[problem_id] = 0
+        # Submissions are streamed in the same order as the participations, and consumed alongside them.
+        submissions = ContestSubmission.objects.filter(participation__contest=self.contest) \
+            .order_by('participation_id').values_list('participation_id', *self.participation_submission_fields)
+        submissions = groupby(submissions.iterator(chunk_size=chunk_size), key=itemgetter(0))
+        next_group = next(submissions, None)
 
+        updated = 0
+        queryset = self.contest.users.order_by('id').defer('format_data')
+        for participations in chunk(queryset.iterator(chunk_size=chunk_size), chunk_size):
             for participation in participations:
-                format_data = (participation.format_data or {}).get(problem_id)
-                if format_data:
-                    points = format_data['points']
-                    time = format_data['time']
+                while next_group is not None and next_group[0] < participation.id:
+                    next_group = next(submissions, None)
+                if next_group is not None and next_group[0] == participation.id:
+                    rows = [row[1:] for row in next_group[1]]
+                    next_group = next(submissions, None)
+                else:
+                    rows = []
+
+                participation.contest = self.contest
+                self.compute_participation(participation, rows)
+                if participation.is_disqualified:
+                    participation.score = -9999
+                    participation.cumtime = 0
+                    participation.tiebreaker = 0
+
+            with transaction.atomic():
+                ContestParticipation.objects.bulk_update(participations, self.participation_result_fields)
+            updated += len(participations)
+            if progress is not None:
+                progress.did(len(participations))
+        return updated
+
+    # Whether the first live participation to solve each problem is highlighted.
+    show_first_solves = True
+
+    def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
+        first_solves = {str(problem.id): None for problem in problems}
+        total_ac = {str(problem.id): 0 for problem in problems}
+        min_times = {}
 
-                    if points == problem.points:
-                        total_ac[problem_id] += 1
+        for participation in participations:
+            for problem_id, time in self.get_participation_solves(problems, participation, frozen).items():
+                total_ac[problem_id] += 1
 
-                        # Only acknowledge first solves for live participations
-                        if participation.virtual == 0 and (min_time is None or min_time > time):
-                            min_time = time
-                            first_solves[problem_id] = participation.id
+                # Only acknowledge first solves for live participations
+                if self.show_first_solves and participation.virtual == 0 and \
+                        (problem_id not in min_times or min_times[problem_id] > time):
+                    min_times[problem_id] = time
+                    first_solves[problem_id] = participation.id
 
         return first_solves, total_ac
 
+    def get_participation_solves(self, problems, participation, frozen=False):
+        solves = {}
+        for problem in problems:
+            problem_id = str(problem.id)
+            format_data = (participation.format_data or {}).get(problem_id)
+            if format_data and format_data['points'] == problem.points:
+                solves[problem_id] = format_data['time']
+        return solves
+
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
 
@@ -1,7 +1,7 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Max, OuterRef, Subquery
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -46,33 +46,25 @@ class ECOOContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
+    participation_submission_fields = ('problem_id', 'points', 'submission__date', 'submission__result',
+                                       'problem__points')
+
+    def compute_participation(self, participation, submissions):
         cumtime = 0
         score = 0
         format_data = {}
 
-        submissions = participation.submissions.exclude(submission__result__in=('IE', 'CE'))
-
-        submission_counts = {
-            data['problem_id']: data['count'] for data in submissions.values('problem_id').annotate(count=Count('id'))
-        }
-        queryset = (
-            submissions
-            .values('problem_id')
-            .filter(
-                submission__date=Subquery(
-                    submissions
-                    .filter(problem_id=OuterRef('problem_id'))
-                    .order_by('-submission__date')
-                    .values('submission__date')[:1],
-                ),
-            )
-            .annotate(points=Max('points'))
-            .values_list('problem_id', 'problem__points', 'points', 'submission__date')
-        )
+        problem_subs = defaultdict(list)
+        for problem_id, points, date, result, problem_points in submissions:
+            if result not in ('IE', 'CE'):
+                problem_subs[problem_id].append((points, date, problem_points))
 
-        for problem_id, problem_points, points, date in queryset:
-            sub_cnt = submission_counts.get(problem_id, 0)
+        for problem_id, subs in problem_subs.items():
+            sub_cnt = len(subs)
+            # The largest points among the last submissions.
+            date = max(sub_date for _, sub_date, _ in subs)
+            points = max(sub_points for sub_points, sub_date, _ in subs if sub_date == date)
+            problem_points = subs[0][2]
 
             dt = (date - participation.start).total_seconds()
 
@@ -96,7 +88,6 @@ class ECOOContestFormat(DefaultContestFormat):
         participation.score = round(score, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
-        participation.save()
 
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
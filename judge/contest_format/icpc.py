@@ -1,8 +1,7 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db import connection
-from django.db.models import Max
 from django.template.defaultfilters import floatformat, pluralize
 from django.urls import reverse
 from django.utils.html import format_html
@@ -11,7 +10,6 @@ from django.utils.translation import gettext as _, gettext_lazy, ngettext
 
 from judge.contest_format.default import DefaultContestFormat
 from judge.contest_format.registry import register_contest_format
-from judge.timezone import from_database_time
 from judge.utils.timedelta import nice_repr
 
 
@@ -45,7 +43,11 @@ class ICPCContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
+    participation_submission_fields = ('problem_id', 'points', 'submission__date', 'submission__result')
+    participation_result_fields = ('cumtime', 'score', 'tiebreaker', 'frozen_cumtime', 'frozen_score',
+                                   'frozen_tiebreaker', 'format_data')
+
+    def compute_participation(self, participation, submissions):
         cumtime = 0
         last = 0
         penalty = 0
@@ -57,81 +59,71 @@ class ICPCContestFormat(DefaultContestFormat):
         frozen_score = 0
         frozen_time = participation.contest.frozen_time
 
+        is_frozen = participation.is_frozen
         format_data = {}
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT MAX(cs.points) as `points`, (
-                    SELECT MIN(csub.date)
-                        FROM judge_contestsubmission ccs LEFT OUTER JOIN
-                             judge_submission csub ON (csub.id = ccs.submission_id)
-                        WHERE ccs.problem_id = cp.id AND ccs.participation_id = %s AND ccs.points = MAX(cs.points)
-                ) AS `time`, cp.id AS `prob`
-                FROM judge_contestproblem cp INNER JOIN
-                     judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s) LEFT OUTER JOIN
-                     judge_submission sub ON (sub.id = cs.submission_id)
-                GROUP BY cp.id
-            """, (participation.id, participation.id))
-
-            for points, time, prob in cursor.fetchall():
-                time = from_database_time(time)
-                dt_second = (time - participation.start).total_seconds()
-                dt = int(dt_second // 60)
-                is_frozen_sub = (participation.is_frozen and time >= frozen_time)
-
-                frozen_points = 0
-                frozen_tries = 0
-                # Compute penalty
-                if self.config['penalty']:
-                    # An IE can have a submission result of `None`
-                    subs = participation.submissions.exclude(submission__result__isnull=True) \
-                                                    .exclude(submission__result__in=['IE', 'CE']) \
-                                                    .filter(problem_id=prob)
-                    if points:
-                        # Submissions after the first AC does not count toward number of tries
-                        tries = subs.filter(submission__date__lte=time).count()
-                        penalty += (tries - 1) * self.config['penalty']
-                        if not is_frozen_sub:
-                            # Because the sub have not frozen yet, we update the frozen_penalty just like
-                            # the normal penalty
-                            frozen_penalty += (tries - 1) * self.config['penalty']
-                            frozen_tries = tries
-                        else:
-                            # For frozen sub, we should always display the number of tries
-                            frozen_tries = subs.count()
-                    else:
-                        # We should always display the penalty, even if the user has a score of 0
-                        tries = subs.count()
-                        frozen_tries = tries
-                        # the raw SQL query above returns the first submission with the
-                        # largest points. However, for computing & showing frozen scoreboard,
-                        # if the largest points is 0, we need to get the last submission.
-                        time = subs.aggregate(time=Max('submission__date'))['time']
-                        # time can be None if there all of submissions are CE or IE.
-                        is_frozen_sub = (participation.is_frozen and time and time >= frozen_time)
-                else:
-                    tries = 0
-                    # Don't need to set frozen_tries = 0 because we've initialized it with 0
-
+        problem_subs = defaultdict(list)
+        for problem_id, points, date, result in submissions:
+            problem_subs[problem_id].append((points, date, result))
+
+        for prob, subs in sorted(problem_subs.items()):
+            # The first submission with the largest points.
+            points = max(sub_points for sub_points, _, _ in subs)
+            time = min(date for sub_points, date, _ in subs if sub_points == points)
+            dt_second = (time - participation.start).total_seconds()
+            dt = int(dt_second // 60)
+            is_frozen_sub = (is_frozen and time >= frozen_time)
+
+            frozen_points = 0
+            frozen_tries = 0
+            # Compute penalty
+            if self.config['penalty']:
+                # An IE can have a submission result of `None`
+                tried = [date for _, date, result in subs if result is not None and result not in ('IE', 'CE')]
                 if points:
-                    cumtime += dt
-                    last = max(last, dt)
-                    score += points
-
+                    # Submissions after the first AC does not count toward number of tries
+                    tries = sum(date <= time for date in tried)
+                    penalty += (tries - 1) * self.config['penalty']
                     if not is_frozen_sub:
-                        frozen_points = points
-                        frozen_cumtime += dt
-                        frozen_last = max(frozen_last, dt)
-                        frozen_score += points
-
-                format_data[str(prob)] = {
-                    'time': dt_second,
-                    'points': points,
-                    'frozen_points': frozen_points,
-                    'tries': tries,
-                    'frozen_tries': frozen_tries,
-                    'is_frozen': is_frozen_sub,
-                }
+                        # Because the sub have not frozen yet, we update the frozen_penalty just like
+                        # the normal penalty
+                        frozen_penalty += (tries - 1) * self.config['penalty']
+                        frozen_tries = tries
+                    else:
+                        # For frozen sub, we should always display the number of tries
+                        frozen_tries = len(tried)
+                else:
+                    # We should always display the penalty, even if the user has a score of 0
+                    tries = len(tried)
+                    frozen_tries = tries
+                    # The first submission with the largest points was used above. However, for computing & showing
+                    # frozen scoreboard, if the largest points is 0, we need to get the last submission.
+                    time = max(tried, default=None)
+                    # time can be None if there all of submissions are CE or IE.
+                    is_frozen_sub = (is_frozen and time and time >= frozen_time)
+            else:
+                tries = 0
+                # Don't need to set frozen_tries = 0 because we've initialized it with 0
+
+            if points:
+                cumtime += dt
+                last = max(last, dt)
+                score += points
+
+                if not is_frozen_sub:
+                    frozen_points = points
+                    frozen_cumtime += dt
+                    frozen_last = max(frozen_last, dt)
+                    frozen_score += points
+
+            format_data[str(prob)] = {
+                'time': dt_second,
+                'points': points,
+                'frozen_points': frozen_points,
+                'tries': tries,
+                'frozen_tries': frozen_tries,
+                'is_frozen': is_frozen_sub,
+            }
 
         participation.cumtime = max(cumtime + penalty, 0)
         participation.score = round(score, self.contest.points_precision)
@@ -142,34 +134,16 @@ class ICPCContestFormat(DefaultContestFormat):
         participation.frozen_tiebreaker = frozen_last
 
         participation.format_data = format_data
-        participation.save()
-
-    def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
-        first_solves = {}
-        total_ac = {}
 
+    def get_participation_solves(self, problems, participation, frozen=False):
+        solves = {}
         prefix = 'frozen_' if frozen else ''
         for problem in problems:
             problem_id = str(problem.id)
-            min_time = None
-            first_solves[problem_id] = None
-            total_ac[problem_id] = 0
-
-            for participation in participations:
-                format_data = (participation.format_data or {}).get(problem_id)
-                if format_data:
-                    points = format_data[prefix + 'points']
-                    time = format_data['time']
-
-                    if points == problem.points:
-                        total_ac[problem_id] += 1
-
-                        # Only acknowledge first solves for live participations
-                        if participation.virtual == 0 and (min_time is None or min_time > time):
-                            min_time = time
-                            first_solves[problem_id] = participation.id
-
-        return first_solves, total_ac
+            format_data = (participation.format_data or {}).get(problem_id)
+            if format_data and format_data[prefix + 'points'] == problem.points:
+                solves[problem_id] = format_data['time']
+        return solves
 
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
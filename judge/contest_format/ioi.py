@@ -1,6 +1,7 @@
 from django.db import connection
 from django.utils.translation import gettext as _, gettext_lazy
 
+from judge.contest_format.base import BaseContestFormat
 from judge.contest_format.legacy_ioi import LegacyIOIContestFormat
 from judge.contest_format.registry import register_contest_format
 from judge.timezone import from_database_time
@@ -14,6 +15,9 @@ class IOIContestFormat(LegacyIOIContestFormat):
         cumtime: Specify True if time penalties are to be computed. Defaults to False.
     """
 
+    # The results are computed from the test cases of each submission, so participations are updated one by one.
+    bulk_update_participations = BaseContestFormat.bulk_update_participations
+
     def update_participation(self, participation):
         cumtime = 0
         score = 0
@@ -90,7 +94,7 @@ class IOIContestFormat(LegacyIOIContestFormat):
         participation.score = round(score, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
-        participation.save()
+        participation.save(update_fields=['cumtime', 'score', 'tiebreaker', 'format_data'])
 
     def get_short_form_display(self):
         yield _('The maximum score for each problem batch will be used.')
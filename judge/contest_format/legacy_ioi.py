@@ -1,7 +1,7 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db.models import Min, OuterRef, Subquery
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -42,20 +42,20 @@ class LegacyIOIContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
+    def compute_participation(self, participation, submissions):
         cumtime = 0
         last_submission_time = 0
         score = 0
         format_data = {}
 
-        queryset = (participation.submissions.values('problem_id')
-                                             .filter(points=Subquery(
-                                                 participation.submissions.filter(problem_id=OuterRef('problem_id'))
-                                                                          .order_by('-points').values('points')[:1]))
-                                             .annotate(time=Min('submission__date'))
-                                             .values_list('problem_id', 'time', 'points'))
+        problem_subs = defaultdict(list)
+        for problem_id, sub_points, date in submissions:
+            problem_subs[problem_id].append((sub_points, date))
 
-        for problem_id, time, points in queryset:
+        for problem_id, subs in problem_subs.items():
+            # The first submission with the largest points.
+            points = max(sub_points for sub_points, _ in subs)
+            time = min(date for sub_points, date in subs if sub_points == points)
             if points:
                 dt = (time - participation.start).total_seconds()
                 if self.config['last_score_altering']:
@@ -72,34 +72,10 @@ class LegacyIOIContestFormat(DefaultContestFormat):
         participation.score = round(score, self.contest.points_precision)
         participation.tiebreaker = last_submission_time
         participation.format_data = format_data
-        participation.save()
 
-    def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
-        first_solves = {}
-        total_ac = {}
-
-        show_time = self.config['cumtime'] or self.config.get('last_score_altering', False)
-        for problem in problems:
-            problem_id = str(problem.id)
-            min_time = None
-            first_solves[problem_id] = None
-            total_ac[problem_id] = 0
-
-            for participation in participations:
-                format_data = (participation.format_data or {}).get(problem_id)
-                if format_data:
-                    points = format_data['points']
-                    time = format_data['time']
-
-                    if points == problem.points:
-                        total_ac[problem_id] += 1
-
-                        # Only acknowledge first solves for live participations
-                        if show_time and participation.virtual == 0 and (min_time is None or min_time > time):
-                            min_time = time
-                            first_solves[problem_id] = participation.id
-
-        return first_solves, total_ac
+    @property
+    def show_first_solves(self):
+        return self.config['cumtime'] or self.config.get('last_score_altering', False)
 
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
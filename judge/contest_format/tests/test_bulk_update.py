@@ -0,0 +1,73 @@
+import random
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import ContestParticipation, ContestSubmission, Language, Submission
+from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
+    create_contest_problem, create_problem, create_user
+
+RESULT_FIELDS = ('score', 'cumtime', 'tiebreaker', 'frozen_score', 'frozen_cumtime', 'frozen_tiebreaker',
+                 'format_data')
+
+
+class BulkUpdateParticipationsTestCase(CommonDataMixin, TestCase):
+    formats = {
+        'default': {},
+        'ioi': {'cumtime': True, 'last_score_altering': True},
+        'ioi16': {'cumtime': True},
+        'ecoo': {'cumtime': True},
+        'icpc': {'penalty': 20},
+        'atcoder': {'penalty': 5},
+        'vnoj': {'penalty': 5},
+    }
+
+    def test_bulk_update_matches_update_participation(self):
+        problems = [create_problem(code='bulk_%d' % i, points=1) for i in range(3)]
+        language = Language.get_python3()
+        _now = timezone.now()
+        start = _now - timedelta(hours=3)
+
+        for format_name, format_config in self.formats.items():
+            rng = random.Random(format_name)
+            contest = create_contest(
+                key='bulk_%s' % format_name,
+                format_name=format_name,
+                format_config=format_config,
+                start_time=start,
+                end_time=_now + timedelta(minutes=30),
+                frozen_last_minutes=60,
+            )
+            contest_problems = [create_contest_problem(contest=contest, problem=problem, points=rng.choice([1, 100]))
+                                for problem in problems]
+
+            for i in range(8):
+                user = create_user(username='bulk_%s_%d' % (format_name, i)).profile
+                participation = create_contest_participation(contest=contest, user=user, real_start=start,
+                                                             is_disqualified=i == 0)
+                for _ in range(rng.randrange(10)):
+                    contest_problem = rng.choice(contest_problems)
+                    points = rng.choice([0, 0, contest_problem.points // 2, contest_problem.points])
+                    result = 'AC' if points else rng.choice(['WA', 'CE', 'IE', None])
+                    submission = Submission.objects.create(user=user, problem=contest_problem.problem,
+                                                           language=language, result=result, points=points,
+                                                           status='D')
+                    Submission.objects.filter(id=submission.id).update(
+                        date=start + timedelta(minutes=rng.randrange(0, 180, rng.choice([1, 30]))),
+                    )
+                    ContestSubmission.objects.create(submission=submission, problem=contest_problem,
+                                                     participation=participation, points=points)
+
+            expected = {}
+            for participation in contest.users.all():
+                participation.recompute_results()
+                participation.refresh_from_db()
+                expected[participation.id] = [getattr(participation, field) for field in RESULT_FIELDS]
+
+            contest.users.update(score=0, cumtime=0, tiebreaker=0, format_data=None)
+            with self.subTest(format=format_name):
+                self.assertEqual(contest.format.bulk_update_participations(), len(expected))
+                for participation in ContestParticipation.objects.filter(contest=contest):
+                    self.assertEqual([getattr(participation, field) for field in RESULT_FIELDS],
+                                     expected[participation.id])
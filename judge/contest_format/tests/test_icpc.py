@@ -0,0 +1,144 @@
+import random
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import ContestSubmission, Language, Submission
+from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
+    create_contest_problem, create_problem, create_user
+from judge.timezone import from_database_time
+
+
+def legacy_update_participation(format, participation):
+    # The previous implementation, which queried each problem separately, kept as a reference.
+    cumtime = 0
+    last = 0
+    penalty = 0
+    score = 0
+
+    frozen_cumtime = 0
+    frozen_last = 0
+    frozen_penalty = 0
+    frozen_score = 0
+    frozen_time = participation.contest.frozen_time
+
+    format_data = {}
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT MAX(cs.points) as `points`, (
+                SELECT MIN(csub.date)
+                    FROM judge_contestsubmission ccs LEFT OUTER JOIN
+                         judge_submission csub ON (csub.id = ccs.submission_id)
+                    WHERE ccs.problem_id = cp.id AND ccs.participation_id = %s AND ccs.points = MAX(cs.points)
+            ) AS `time`, cp.id AS `prob`
+            FROM judge_contestproblem cp INNER JOIN
+                 judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s) LEFT OUTER JOIN
+                 judge_submission sub ON (sub.id = cs.submission_id)
+            GROUP BY cp.id
+        """, (participation.id, participation.id))
+
+        for points, time, prob in cursor.fetchall():
+            time = from_database_time(time)
+            dt_second = (time - participation.start).total_seconds()
+            dt = int(dt_second // 60)
+            is_frozen_sub = (participation.is_frozen and time >= frozen_time)
+
+            frozen_points = 0
+            frozen_tries = 0
+            if format.config['penalty']:
+                subs = participation.submissions.exclude(submission__result__isnull=True) \
+                                                .exclude(submission__result__in=['IE', 'CE']) \
+                                                .filter(problem_id=prob)
+                if points:
+                    tries = subs.filter(submission__date__lte=time).count()
+                    penalty += (tries - 1) * format.config['penalty']
+                    if not is_frozen_sub:
+                        frozen_penalty += (tries - 1) * format.config['penalty']
+                        frozen_tries = tries
+                    else:
+                        frozen_tries = subs.count()
+                else:
+                    tries = subs.count()
+                    frozen_tries = tries
+                    time = subs.aggregate(time=Max('submission__date'))['time']
+                    is_frozen_sub = (participation.is_frozen and time and time >= frozen_time)
+            else:
+                tries = 0
+
+            if points:
+                cumtime += dt
+                last = max(last, dt)
+                score += points
+
+                if not is_frozen_sub:
+                    frozen_points = points
+                    frozen_cumtime += dt
+                    frozen_last = max(frozen_last, dt)
+                    frozen_score += points
+
+            format_data[str(prob)] = {
+                'time': dt_second,
+                'points': points,
+                'frozen_points': frozen_points,
+                'tries': tries,
+                'frozen_tries': frozen_tries,
+                'is_frozen': is_frozen_sub,
+            }
+
+    return {
+        'cumtime': max(cumtime + penalty, 0),
+        'score': round(score, format.contest.points_precision),
+        'tiebreaker': last,
+        'frozen_cumtime': max(frozen_cumtime + frozen_penalty, 0),
+        'frozen_score': round(frozen_score, format.contest.points_precision),
+        'frozen_tiebreaker': frozen_last,
+        'format_data': format_data,
+    }
+
+
+class ICPCContestFormatTestCase(CommonDataMixin, TestCase):
+    def test_update_participation_matches_legacy(self):
+        problems = [create_problem(code='icpc_%d' % i, points=1) for i in range(4)]
+        language = Language.get_python3()
+
+        for seed in range(30):
+            rng = random.Random(seed)
+            _now = timezone.now()
+            start = _now - timedelta(hours=3)
+            contest = create_contest(
+                key='icpc_%d' % seed,
+                format_name='icpc',
+                format_config={'penalty': rng.choice([0, 20])},
+                start_time=start,
+                # Some contests are frozen right now, and others have not been frozen yet.
+                end_time=_now + timedelta(minutes=rng.choice([30, 120])),
+                frozen_last_minutes=rng.choice([0, 60]),
+            )
+            contest_problems = [create_contest_problem(contest=contest, problem=problem, points=rng.choice([1, 100]))
+                                for problem in problems]
+            user = create_user(username='icpc_user_%d' % seed).profile
+            participation = create_contest_participation(contest=contest, user=user, real_start=start)
+
+            for _ in range(rng.randrange(25)):
+                contest_problem = rng.choice(contest_problems)
+                points = rng.choice([0, 0, contest_problem.points])
+                result = 'AC' if points else rng.choice(['WA', 'TLE', 'CE', 'IE', None])
+                submission = Submission.objects.create(user=user, problem=contest_problem.problem, language=language,
+                                                       result=result, points=points, status='D')
+                # Dates are whole minutes apart, so that some submissions are made at the same time.
+                Submission.objects.filter(id=submission.id).update(
+                    date=start + timedelta(minutes=rng.randrange(0, 180, rng.choice([1, 30]))),
+                )
+                ContestSubmission.objects.create(submission=submission, problem=contest_problem,
+                                                 participation=participation, points=points)
+
+            with self.subTest(seed=seed):
+                expected = legacy_update_participation(contest.format, participation)
+                contest.format.update_participation(participation)
+                participation.refresh_from_db()
+                for field, value in expected.items():
+                    self.assertEqual(getattr(participation, field), value, field)
@@ -1,8 +1,7 @@
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db import connection
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -11,38 +10,10 @@ from django.utils.translation import gettext as _, gettext_lazy, ngettext
 
 from judge.contest_format.default import DefaultContestFormat
 from judge.contest_format.registry import register_contest_format
-from judge.timezone import from_database_time, to_database_time
 from judge.utils.timedelta import nice_repr
 
 ParticipationInfo = namedtuple('ParticipationInfo', 'cumtime score tiebreaker format_data')
 
-DEFAULT_RANKING_SQL = """
-SELECT MAX(cs.points) as `points`, (
-    SELECT MIN(csub.date)
-        FROM judge_contestsubmission ccs LEFT OUTER JOIN
-                judge_submission csub ON (csub.id = ccs.submission_id)
-        WHERE ccs.problem_id = cp.id AND ccs.participation_id = %s AND ccs.points = MAX(cs.points)
-) AS `time`, cp.id AS `prob`
-FROM judge_contestproblem cp INNER JOIN
-        judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s) LEFT OUTER JOIN
-        judge_submission sub ON (sub.id = cs.submission_id)
-GROUP BY cp.id
-"""
-
-FROZEN_RANKING_SQL = """
-SELECT MAX(cs.points) as `points`, (
-    SELECT MIN(csub.date)
-        FROM judge_contestsubmission ccs LEFT OUTER JOIN
-                judge_submission csub ON (csub.id = ccs.submission_id)
-        WHERE ccs.problem_id = cp.id AND ccs.participation_id = %s AND ccs.points = MAX(cs.points) AND csub.date < %s
-) AS `time`, cp.id AS `prob`
-FROM judge_contestproblem cp INNER JOIN
-        judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s) LEFT OUTER JOIN
-        judge_submission sub ON (sub.id = cs.submission_id)
-WHERE sub.date < %s
-GROUP BY cp.id
-"""
-
 
 @register_contest_format('vnoj')
 class VNOJContestFormat(DefaultContestFormat):
@@ -76,7 +47,11 @@ class VNOJContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def calculate_participation_info(self, participation, frozen=False) -> ParticipationInfo:
+    participation_submission_fields = ('problem_id', 'points', 'submission__date', 'submission__result')
+    participation_result_fields = ('cumtime', 'score', 'tiebreaker', 'frozen_cumtime', 'frozen_score',
+                                   'frozen_tiebreaker', 'format_data')
+
+    def calculate_participation_info(self, participation, submissions, frozen=False) -> ParticipationInfo:
         cumtime = 0
         last = 0
         penalty = 0
@@ -85,49 +60,49 @@ class VNOJContestFormat(DefaultContestFormat):
 
         frozen_time = participation.contest.frozen_time
 
-        with connection.cursor() as cursor:
-            if not frozen:
-                cursor.execute(DEFAULT_RANKING_SQL, (participation.id, participation.id))
-            else:
-                db_time = to_database_time(frozen_time)
-                cursor.execute(FROZEN_RANKING_SQL, (participation.id, db_time,
-                                                    participation.id, db_time))
-
-            for points, time, prob in cursor.fetchall():
-                time = from_database_time(time)
-                dt = (time - participation.start).total_seconds()
-                # An IE can have a submission result of `None`
-                problem_subs = participation.submissions.exclude(submission__result__isnull=True) \
-                                            .exclude(submission__result__in=['IE', 'CE']) \
-                                            .filter(problem_id=prob)
-
-                # Compute penalty
-                if self.config['penalty']:
-                    subs = problem_subs
-                    if frozen:
-                        subs = subs.filter(submission__date__lt=frozen_time)
-
-                    if points:
-                        prev = subs.filter(submission__date__lte=time).count() - 1
-                        penalty += prev * self.config['penalty'] * 60
-                    else:
-                        # We should always display the penalty, even if the user has a score of 0
-                        prev = subs.count()
+        problem_subs = defaultdict(list)
+        for problem_id, points, date, result in submissions:
+            problem_subs[problem_id].append((points, date, result))
+
+        for prob, subs in problem_subs.items():
+            # An IE can have a submission result of `None`
+            tried = [date for _, date, result in subs if result is not None and result not in ('IE', 'CE')]
+            if frozen:
+                subs = [sub for sub in subs if sub[1] < frozen_time]
+                if not subs:
+                    continue
+
+            # The first submission with the largest points.
+            points = max(sub_points for sub_points, _, _ in subs)
+            time = min(date for sub_points, date, _ in subs if sub_points == points)
+            dt = (time - participation.start).total_seconds()
+
+            # Compute penalty
+            if self.config['penalty']:
+                if frozen:
+                    tried_before = [date for date in tried if date < frozen_time]
                 else:
-                    prev = 0
+                    tried_before = tried
 
                 if points:
-                    cumtime += dt
-                    last = max(last, dt)
+                    prev = sum(date <= time for date in tried_before) - 1
+                    penalty += prev * self.config['penalty'] * 60
+                else:
+                    # We should always display the penalty, even if the user has a score of 0
+                    prev = len(tried_before)
+            else:
+                prev = 0
 
-                format_data[str(prob)] = {'time': dt, 'points': points, 'penalty': prev}
+            if points:
+                cumtime += dt
+                last = max(last, dt)
 
-                if not frozen and participation.contest.frozen_last_minutes != 0:
-                    format_data[str(prob)]['pending'] = problem_subs \
-                        .filter(submission__date__gte=frozen_time) \
-                        .count()
+            format_data[str(prob)] = {'time': dt, 'points': points, 'penalty': prev}
 
-                score += points
+            if not frozen and participation.contest.frozen_last_minutes != 0:
+                format_data[str(prob)]['pending'] = sum(date >= frozen_time for date in tried)
+
+            score += points
 
         return ParticipationInfo(
             cumtime=max((last if self.config['LSO'] else cumtime) + penalty, 0),
@@ -136,8 +111,9 @@ class VNOJContestFormat(DefaultContestFormat):
             format_data=format_data,
         )
 
-    def update_participation(self, participation):
-        actual_info = self.calculate_participation_info(participation)
+    def compute_participation(self, participation, submissions):
+        submissions = list(submissions)
+        actual_info = self.calculate_participation_info(participation, submissions)
 
         participation.cumtime = actual_info.cumtime
         participation.score = actual_info.score
@@ -145,7 +121,7 @@ class VNOJContestFormat(DefaultContestFormat):
         format_data = actual_info.format_data
 
         if participation.contest.frozen_last_minutes != 0:
-            frozen_info = self.calculate_participation_info(participation, frozen=True)
+            frozen_info = self.calculate_participation_info(participation, submissions, frozen=True)
             participation.frozen_cumtime = frozen_info.cumtime
             participation.frozen_score = frozen_info.score
             participation.frozen_tiebreaker = frozen_info.tiebreaker
@@ -161,35 +137,18 @@ class VNOJContestFormat(DefaultContestFormat):
                 format_data[prob] = new_prob_data
 
         participation.format_data = format_data
-        participation.save()
-
-    def get_first_solves_and_total_ac(self, problems, participations, frozen=False):
-        first_solves = {}
-        total_ac = {}
 
+    def get_participation_solves(self, problems, participation, frozen=False):
+        solves = {}
         for problem in problems:
             problem_id = str(problem.id)
-            min_time = None
-            first_solves[problem_id] = None
-            total_ac[problem_id] = 0
-
-            for participation in participations:
-                format_data = (participation.format_data or {}).get(problem_id)
-                if format_data:
-                    has_pending = bool(format_data.get('pending', 0))
-                    prefix = 'frozen_' if frozen and has_pending else ''
-                    points = format_data[prefix + 'points']
-                    time = format_data[prefix + 'time']
-
-                    if points == problem.points:
-                        total_ac[problem_id] += 1
-
-                        # Only acknowledge first solves for live participations
-                        if participation.virtual == 0 and (min_time is None or min_time > time):
-                            min_time = time
-                            first_solves[problem_id] = participation.id
-
-        return first_solves, total_ac
+            format_data = (participation.format_data or {}).get(problem_id)
+            if format_data:
+                has_pending = bool(format_data.get('pending', 0))
+                prefix = 'frozen_' if frozen and has_pending else ''
+                if format_data[prefix + 'points'] == problem.points:
+                    solves[problem_id] = format_data[prefix + 'time']
+        return solves
 
     def display_user_problem(self, participation, contest_problem, first_solves, frozen=False):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
@@ -1,6 +1,6 @@
 from django.conf import settings
 
-__all__ = ['last', 'post']
+__all__ = ['last', 'metrics', 'post']
 
 if not settings.EVENT_DAEMON_USE:
     real = False
@@ -10,9 +10,15 @@ if not settings.EVENT_DAEMON_USE:
 
     def last():
         return 0
+
+    def metrics():
+        return {}
 elif hasattr(settings, 'EVENT_DAEMON_AMQP'):
     from .event_poster_amqp import last, post
     real = True
+
+    def metrics():
+        return {}
 else:
-    from .event_poster_ws import last, post
+    from .event_poster_ws import last, metrics, post
     real = True
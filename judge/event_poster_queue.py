@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+__all__ = ['QueuedEventPoster']
+
+logger = logging.getLogger('judge.event_poster')
+
+
+class QueuedEventPoster(object):
+    """Posts events from a background thread, so that posting never waits on the event daemon.
+
+    Events are queued in memory, up to `max_size`, and the background thread sends them in batches of up to
+    `batch_size` through a poster made by `connect`, whose `post_many` sends a list of (channel, message) pairs and
+    appends the ID of each delivered event to the list passed as its `ids`. When a batch fails partway, only the
+    events that were not delivered are retried.
+    When the queue is full, `drop_policy` decides what happens to a new event:
+
+    - 'oldest' drops the oldest queued event to make room for it;
+    - 'newest' drops the new event;
+    - 'block' waits up to `block_timeout` seconds for room, then drops the new event.
+    """
+
+    drop_policies = ('oldest', 'newest', 'block')
+
+    def __init__(self, connect, max_size=10000, batch_size=100, drop_policy='oldest', block_timeout=1,
+                 retries=3, retry_delay=1):
+        if drop_policy not in self.drop_policies:
+            raise ValueError('unknown drop policy: %s' % drop_policy)
+
+        self.connect = connect
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self.pid = os.getpid()
+        self._queue = deque()  # (channel, message, time queued)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._full = False
+        self._poster = None
+        self._thread = threading.Thread(target=self._work, daemon=True)
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_latency = 0
+        self._total_latency = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the background thread, after sending the queued events for up to `timeout` seconds."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def post(self, channel, message):
+        with self._cond:
+            if len(self._queue) >= self.max_size and self.drop_policy == 'block':
+                self._cond.wait_for(lambda: len(self._queue) < self.max_size, self.block_timeout)
+
+            if len(self._queue) >= self.max_size:
+                if not self._full:
+                    logger.warning('Event queue is full, dropping the %s events', self.drop_policy)
+                    self._full = True
+                self.dropped += 1
+                if self.drop_policy != 'oldest':
+                    return 0
+                self._queue.popleft()
+
+            self._queue.append((channel, message, time.monotonic()))
+            self.queued += 1
+            self._cond.notify_all()
+        # The ID of the event is only known once the event daemon receives it.
+        return 0
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'queued': self.queued,
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'average_latency': self._total_latency / self.sent if self.sent else 0,
+                'max_latency': self.max_latency,
+            }
+
+    def _next_batch(self):
+        # Returns the next batch of events, waiting for one if needed, or None when stopping with nothing left.
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._stopping)
+            if not self._queue:
+                return None
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if len(self._queue) < self.max_size // 2:
+                self._full = False
+            self._cond.notify_all()
+            return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._send(batch)
+
+    def _send(self, batch):
+        for tries in range(self.retries + 1):
+            ids = []
+            try:
+                if self._poster is None:
+                    self._poster = self.connect()
+                self._poster.post_many([(channel, message) for channel, message, _ in batch], ids)
+            except Exception:
+                logger.exception('Failed to post %d events', len(batch) - len(ids))
+                self._poster = None
+                self._sent(batch[:len(ids)])
+                batch = batch[len(ids):]
+                if tries < self.retries and not self._stopping:
+                    time.sleep(self.retry_delay)
+            else:
+                self._sent(batch)
+                return
+
+        with self._cond:
+            self.failed += len(batch)
+
+    def _sent(self, events):
+        now = time.monotonic()
+        with self._cond:
+            self.sent += len(events)
+            for _, _, queued in events:
+                self._total_latency += now - queued
+                self.max_latency = max(self.max_latency, now - queued)
@@ -1,13 +1,19 @@
+import atexit
 import json
 import logging
+import os
 import socket
 import threading
 
 from django.conf import settings
 from websocket import WebSocketException, create_connection, setdefaulttimeout
 
-__all__ = ['EventPostingError', 'EventPoster', 'post', 'last']
+from judge.event_poster_queue import QueuedEventPoster
+
+__all__ = ['EventPostingError', 'EventPoster', 'post', 'last', 'metrics']
 _local = threading.local()
+_queued = None
+_queued_lock = threading.Lock()
 
 logger = logging.getLogger('judge.event_poster')
 
@@ -46,6 +52,21 @@ class EventPoster(object):
             self._connect()
             return self.post(channel, message, tries + 1)
 
+    def post_many(self, events, ids=None):
+        # The event daemon answers each command in order, so the replies are read after sending the whole batch.
+        # The IDs are appended to `ids` as the replies arrive, so that a caller knows how many events were delivered
+        # if this fails partway.
+        for channel, message in events:
+            self._conn.send(json.dumps({'command': 'post', 'channel': channel, 'message': message}))
+        if ids is None:
+            ids = []
+        for _ in events:
+            resp = json.loads(self._conn.recv())
+            if resp['status'] == 'error':
+                raise EventPostingError(resp['code'])
+            ids.append(resp['id'])
+        return ids
+
     def last(self, tries=0):
         try:
             self._conn.send('{"command": "last-msg"}')
@@ -67,16 +88,30 @@ def _get_poster():
     return _local.poster
 
 
+def _get_queued_poster():
+    global _queued
+    # A forked process does not inherit the background thread, so it needs its own queue.
+    if _queued is None or _queued.pid != os.getpid():
+        with _queued_lock:
+            if _queued is None or _queued.pid != os.getpid():
+                poster = QueuedEventPoster(
+                    EventPoster,
+                    max_size=settings.EVENT_DAEMON_QUEUE_SIZE,
+                    batch_size=settings.EVENT_DAEMON_BATCH_SIZE,
+                    drop_policy=settings.EVENT_DAEMON_DROP_POLICY,
+                )
+                poster.start()
+                atexit.register(poster.stop)
+                _queued = poster
+    return _queued
+
+
 def post(channel, message):
-    try:
-        return _get_poster().post(channel, message)
-    except (WebSocketException, socket.error) as e:
-        logger.error(e, exc_info=True)
-        try:
-            del _local.poster
-        except AttributeError:
-            pass
-    return 0
+    return _get_queued_poster().post(channel, message)
+
+
+def metrics():
+    return _get_queued_poster().metrics()
 
 
 def last():
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.utils.html import format_html, mark_safe
 
+from judge.utils.render_cache import RenderCache
+
 __all__ = ['highlight_code']
 
 
@@ -16,12 +19,31 @@ except ImportError:
     def highlight_code(code, language, cssclass=None):
         return _make_pre_code(code)
 else:
+    highlight_cache = RenderCache('highlight', settings.HIGHLIGHT_CACHE_SIZE, settings.HIGHLIGHT_CACHE_TIMEOUT)
+
+    # Lexers and formatters keep no state between calls, so one of each is made per language and CSS class.
+    _lexers = {}
+    _formatters = {}
+
+    def get_lexer(language):
+        if language not in _lexers:
+            try:
+                _lexers[language] = pygments.lexers.get_lexer_by_name(language)
+            except pygments.util.ClassNotFound:
+                _lexers[language] = None
+        return _lexers[language]
+
+    def get_formatter(cssclass):
+        if cssclass not in _formatters:
+            _formatters[cssclass] = pygments.formatters.HtmlFormatter(cssclass=cssclass, wrapcode=True)
+        return _formatters[cssclass]
+
     def highlight_code(code, language, cssclass='codehilite'):
-        try:
-            lexer = pygments.lexers.get_lexer_by_name(language)
-        except pygments.util.ClassNotFound:
+        lexer = get_lexer(language)
+        if lexer is None:
             return _make_pre_code(code)
 
-        return mark_safe(
-            pygments.highlight(code, lexer, pygments.formatters.HtmlFormatter(cssclass=cssclass, wrapcode=True)),
-        )
+        return mark_safe(highlight_cache.get_or_render(
+            (pygments.__version__, language, cssclass, code),
+            lambda: pygments.highlight(code, lexer, get_formatter(cssclass)),
+        ))
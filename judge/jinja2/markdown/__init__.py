@@ -1,3 +1,5 @@
+import hashlib
+import json
 import logging
 import re
 from html.parser import HTMLParser
@@ -14,6 +16,7 @@ from markupsafe import Markup
 from judge.highlight_code import highlight_code
 from judge.jinja2.markdown.lazy_load import lazy_load as lazy_load_processor
 from judge.utils.camo import client as camo_client
+from judge.utils.render_cache import RenderCache
 from judge.utils.texoid import TEXOID_ENABLED, TexoidRenderer
 from .bleach_whitelist import all_styles, mathml_attrs, mathml_tags
 from .. import registry
@@ -26,6 +29,19 @@ NOFOLLOW_WHITELIST = settings.NOFOLLOW_EXCLUDED
 cleaner_cache = {}
 
 
+def style_version(style):
+    def default(value):
+        return sorted(value) if isinstance(value, (set, frozenset)) else repr(value)
+    return hashlib.sha256(json.dumps(style, sort_keys=True, default=default).encode('utf-8')).hexdigest()[:16]
+
+
+# Computed before `get_cleaner` modifies the bleach parameters of the styles.
+style_versions = {name: style_version(style) for name, style in settings.MARKDOWN_STYLES.items()}
+style_versions[None] = style_version(settings.MARKDOWN_DEFAULT_STYLE)
+
+markdown_cache = RenderCache('markdown', settings.MARKDOWN_CACHE_SIZE, settings.MARKDOWN_CACHE_TIMEOUT)
+
+
 def get_cleaner(name, params):
     if name in cleaner_cache:
         return cleaner_cache[name]
@@ -66,9 +82,9 @@ def strip_paragraphs_tags(tree):
         parent = p.getparent()
         prev = p.getprevious()
         if prev is not None:
-            prev.tail = (prev.tail or '') + p.text
+            prev.tail = (prev.tail or '') + (p.text or '')
         else:
-            parent.text = (parent.text or '') + p.text
+            parent.text = (parent.text or '') + (p.text or '')
         parent.remove(p)
 
 
@@ -88,8 +104,7 @@ def add_table_class(text):
     return text.replace(r'<table>', r'<table class="table">')
 
 
-@registry.filter
-def markdown(text, style, math_engine=None, lazy_load=False, strip_paragraphs=False):
+def render_markdown(text, style, math_engine=None, lazy_load=False, strip_paragraphs=False):
     styles = settings.MARKDOWN_STYLES.get(style, settings.MARKDOWN_DEFAULT_STYLE)
     if styles.get('safe_mode', True):
         safe_mode = 'escape'
@@ -122,4 +137,13 @@ def markdown(text, style, math_engine=None, lazy_load=False, strip_paragraphs=Fa
         result = fragment_tree_to_str(tree)
     if bleach_params:
         result = get_cleaner(style, bleach_params).clean(result)
-    return Markup(result)
+    return result
+
+
+@registry.filter
+def markdown(text, style, math_engine=None, lazy_load=False, strip_paragraphs=False):
+    parts = (settings.MARKDOWN_CACHE_VERSION, style_versions.get(style, style_versions[None]), style, math_engine,
+             bool(lazy_load), bool(strip_paragraphs), text)
+    return Markup(markdown_cache.get_or_render(
+        parts, lambda: render_markdown(text, style, math_engine, lazy_load, strip_paragraphs),
+    ))
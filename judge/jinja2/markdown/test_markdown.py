@@ -1,7 +1,9 @@
-from django.test import SimpleTestCase
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
 from lxml import html
 
-from . import fragment_tree_to_str, fragments_to_tree, get_cleaner, markdown
+from . import fragment_tree_to_str, fragments_to_tree, get_cleaner, markdown, render_markdown, strip_paragraphs_tags
 
 MATHML_N = """\
 <math xmlns="http://www.w3.org/1998/Math/MathML">
@@ -130,6 +132,18 @@ class TestMarkdown(SimpleTestCase):
                              '<p><noscript><img src="test.png"></noscript>'
                              '<img src="/static/blank.gif" data-src="test.png" class="unveil"></p>')
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache(self):
+        with mock.patch('judge.jinja2.markdown.render_markdown', wraps=render_markdown) as render:
+            self.assertHTMLEqual(markdown('**test_cache**', self.BLEACHED_STYLE), '<p><strong>test_cache</strong></p>')
+            self.assertHTMLEqual(markdown('**test_cache**', self.BLEACHED_STYLE), '<p><strong>test_cache</strong></p>')
+            self.assertEqual(render.call_count, 1)
+
+            self.assertHTMLEqual(markdown('**test_cache**', self.BLEACHED_STYLE, strip_paragraphs=True),
+                                 '<strong>test_cache</strong>')
+            markdown('**test_cache**', self.UNBLEACHED_STYLE)
+            self.assertEqual(render.call_count, 3)
+
 
 class TestFragmentUtils(SimpleTestCase):
     def test_simple(self):
@@ -154,3 +168,9 @@ class TestFragmentUtils(SimpleTestCase):
         self.assertEqual(tree.text, 'z')
 
         self.assertHTMLEqual(fragment_tree_to_str(tree), 'z<p>a</p><p>b</p>')
+
+    def test_strip_paragraphs(self):
+        # Paragraphs that start with an element have no text of their own.
+        tree = fragments_to_tree('<p><b>a</b> b</p><p>c <i>d</i></p>')
+        strip_paragraphs_tags(tree)
+        self.assertHTMLEqual(fragment_tree_to_str(tree), '<b>a</b> bc <i>d</i>')
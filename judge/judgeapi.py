@@ -1,18 +1,29 @@
+import itertools
 import json
 import logging
+import os
 import socket
 import struct
+import threading
 import zlib
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from reversion import revisions
 
 from judge import event_poster as event
 from judge.judge_priority import BATCH_REJUDGE_PRIORITY, CONTEST_SUBMISSION_PRIORITY, DEFAULT_PRIORITY, REJUDGE_PRIORITY
+from judge.utils.iterator import chunk
 
 logger = logging.getLogger('judge.judgeapi')
 size_pack = struct.Struct('!I')
 
+REQUEST_TIMEOUT = 60
+JUDGE_BATCH_CHUNK_SIZE = 500
+JUDGE_BATCH_MAX_SOURCE_SIZE = 4 * 1024 * 1024
+_no_response = object()
+
 
 def _post_update_submission(submission, done=False):
     if submission.problem.is_public:
@@ -26,15 +37,128 @@ def _post_update_submission(submission, done=False):
                                    })
 
 
-def judge_request(packet, reply=True):
-    sock = socket.create_connection(settings.BRIDGED_DJANGO_CONNECT or
-                                    settings.BRIDGED_DJANGO_ADDRESS[0])
+def _bridge_address():
+    return settings.BRIDGED_DJANGO_CONNECT or settings.BRIDGED_DJANGO_ADDRESS[0]
 
+
+def _encode_packet(packet):
     output = json.dumps(packet, separators=(',', ':'))
     output = zlib.compress(output.encode('utf-8'))
+    return size_pack.pack(len(output)) + output
+
+
+class BridgeConnection(object):
+    """A long-lived connection to the bridge, shared by all threads of a process.
+
+    Every packet is sent with a request ID, which the bridge echoes back in its reply. This lets the bridge keep the
+    connection open, and lets many requests be in flight on the same socket. Replies are read by a background thread
+    and handed to the waiting request.
+    """
+
+    def __init__(self, address):
+        self.closed = False
+        self._sock = socket.create_connection(address)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+
+    def _read_replies(self):
+        reader = self._sock.makefile('rb', -1)
+        try:
+            while True:
+                input = reader.read(size_pack.size)
+                if len(input) < size_pack.size:
+                    break
+                length = size_pack.unpack(input)[0]
+                input = reader.read(length)
+                if len(input) < length:
+                    break
+                result = json.loads(zlib.decompress(input).decode('utf-8'))
+                waiter = self._pending.pop(result.get('request-id'), None)
+                if waiter is not None:
+                    waiter[1] = result.get('response')
+                    waiter[0].set()
+        except (OSError, ValueError, zlib.error):
+            logger.warning('Error reading from bridge connection', exc_info=True)
+        finally:
+            reader.close()
+            self.close()
+
+    def request(self, packet, reply=True, timeout=REQUEST_TIMEOUT):
+        if self.closed:
+            raise ConnectionError('Bridge connection is closed')
+
+        id = next(self._ids)
+        waiter = [threading.Event(), _no_response]
+        if reply:
+            self._pending[id] = waiter
+
+        try:
+            with self._write_lock:
+                self._sock.sendall(_encode_packet(dict(packet, **{'request-id': id})))
+        except OSError:
+            self._pending.pop(id, None)
+            self.close()
+            raise
+
+        if reply:
+            if not waiter[0].wait(timeout):
+                self._pending.pop(id, None)
+                raise ValueError('Judge did not respond')
+            if waiter[1] is _no_response:
+                raise ConnectionError('Bridge connection closed before replying')
+            return waiter[1]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+        # Wake up everyone still waiting; they will see that the connection is closed.
+        for waiter in list(self._pending.values()):
+            waiter[0].set()
+        self._pending.clear()
+
+
+_connection = None
+_connection_pid = None
+_connection_lock = threading.Lock()
+
+
+def _get_connection():
+    global _connection, _connection_pid
+    with _connection_lock:
+        # A connection inherited from the parent process after a fork must not be shared.
+        if _connection is None or _connection.closed or _connection_pid != os.getpid():
+            _connection = BridgeConnection(_bridge_address())
+            _connection_pid = os.getpid()
+        return _connection
+
+
+def _judge_request_persistent(packet, reply=True):
+    connection = _get_connection()
+    try:
+        return connection.request(packet, reply=reply)
+    except ConnectionError:
+        # The bridge may have restarted since the connection was opened. Sending a packet again is harmless, as the
+        # bridge handles duplicate submission requests idempotently.
+        logger.info('Bridge connection lost, reconnecting')
+        return _get_connection().request(packet, reply=reply)
+
+
+def _judge_request_once(packet, reply=True):
+    sock = socket.create_connection(_bridge_address())
+
     writer = sock.makefile('wb')
-    writer.write(size_pack.pack(len(output)))
-    writer.write(output)
+    writer.write(_encode_packet(packet))
     writer.close()
 
     if reply:
@@ -53,8 +177,14 @@ def judge_request(packet, reply=True):
         return result
 
 
+def judge_request(packet, reply=True):
+    if settings.BRIDGED_DJANGO_PERSISTENT:
+        return _judge_request_persistent(packet, reply=reply)
+    return _judge_request_once(packet, reply=reply)
+
+
 def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=None):
-    from .models import ContestSubmission, Submission, SubmissionTestCase
+    from .models import ContestSubmission, ProblemUserStats, Submission, SubmissionTestCase
 
     updates = {'time': None, 'memory': None, 'points': None, 'result': None, 'case_points': 0, 'case_total': 0,
                'error': None, 'rejudged_date': timezone.now() if rejudge or batch_rejudge else None, 'status': 'QU'}
@@ -104,15 +234,143 @@ def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=No
     except BaseException:
         logger.exception('Failed to send request to judge')
         Submission.objects.filter(id=submission.id).update(status='IE', result='IE')
+        ProblemUserStats.refresh_submissions([submission.id])
         success = False
     else:
         if response['name'] != 'submission-received' or response['submission-id'] != submission.id:
             Submission.objects.filter(id=submission.id).update(status='IE', result='IE')
+            ProblemUserStats.refresh_submissions([submission.id])
         _post_update_submission(submission)
         success = True
     return success
 
 
+def _send_submission_batch(requests):
+    from .models import ProblemUserStats, Submission
+
+    try:
+        response = judge_request({'name': 'submission-batch-request', 'submissions': requests})
+    except BaseException:
+        logger.exception('Failed to send batch request to judge')
+        received = set()
+    else:
+        received = set(response.get('submission-ids', ())) if response['name'] == 'submission-batch-received' else set()
+
+    failed = [request['submission-id'] for request in requests if request['submission-id'] not in received]
+    if failed:
+        Submission.objects.filter(id__in=failed).update(status='IE', result='IE')
+        ProblemUserStats.refresh_submissions(failed)
+    return len(requests) - len(failed)
+
+
+def judge_submissions(queryset, rejudge=False, batch_rejudge=False, judge_id=None, rejudge_user=None,
+                      force_judge=False, chunk_size=JUDGE_BATCH_CHUNK_SIZE):
+    """Judge many submissions at once, with the same semantics as calling `Submission.judge` on each of them.
+
+    Statuses are reset and test cases are deleted for each chunk of submissions with a handful of queries, and each
+    chunk is sent to the bridge as a single `submission-batch-request` packet. Returns the number of submissions that
+    were sent to the bridge.
+    """
+    from .models import Contest, ContestParticipation, ProblemUserStats, Submission, SubmissionTestCase
+
+    if not force_judge:
+        queryset = queryset.exclude(locked_after__lt=timezone.now())
+
+    # Submissions to problems with grading disabled are rare; they take the slow path.
+    for submission in queryset.filter(problem__enable_grading=False):
+        submission.judge(rejudge=rejudge, force_judge=True, rejudge_user=rejudge_user)
+    queryset = queryset.filter(problem__enable_grading=True)
+
+    updates = {'time': None, 'memory': None, 'points': None, 'result': None, 'case_points': 0, 'case_total': 0,
+               'error': None, 'rejudged_date': timezone.now() if rejudge or batch_rejudge else None, 'status': 'QU'}
+    banned_judges_cache = {}
+    judged = 0
+
+    for ids in chunk(queryset.order_by('id').values_list('id', flat=True).iterator(), chunk_size):
+        with transaction.atomic():
+            # See judge_submission for why submissions that are being graded must not be touched.
+            rows = list(
+                Submission.objects.filter(id__in=ids).exclude(status__in=('P', 'G')).select_for_update()
+                .values_list('id', 'problem__code', 'language__key', 'contest__problem__contest__run_pretests_only',
+                             'contest__problem__is_pretested', 'contest__participation__virtual',
+                             'contest__participation__contest_id'),
+            )
+            if not rows:
+                continue
+            ids = [row[0] for row in rows]
+
+            if rejudge:
+                with revisions.create_revision(manage_manually=True):
+                    if rejudge_user:
+                        revisions.set_user(rejudge_user)
+                    revisions.set_comment('Rejudged')
+                    for submission in Submission.objects.filter(id__in=ids):
+                        revisions.add_to_revision(submission)
+
+            pretested = {True: [], False: [], None: []}
+            for id, _, _, run_pretests_only, is_pretested, _, _ in rows:
+                pretested[None if run_pretests_only is None else bool(run_pretests_only and is_pretested)].append(id)
+            for is_pretested, group in pretested.items():
+                if not group:
+                    continue
+                group_updates = updates if is_pretested is None else dict(updates, is_pretested=is_pretested)
+                Submission.objects.filter(id__in=group).update(**group_updates)
+            SubmissionTestCase.objects.filter(submission_id__in=ids).delete()
+
+        sources = dict(Submission.objects.filter(id__in=ids).values_list('id', 'source__source'))
+        # Like judge_submission, a submission without a source cannot be judged and is marked as an internal error.
+        missing = [id for id in ids if sources[id] is None]
+        if missing:
+            Submission.objects.filter(id__in=missing).update(status='IE', result='IE')
+            ProblemUserStats.refresh_submissions(missing)
+
+        requests = []
+        request_size = 0
+        for id, problem, language, run_pretests_only, _, virtual, contest_id in rows:
+            source = sources[id]
+            if source is None:
+                continue
+
+            banned_judges = []
+            if virtual in (ContestParticipation.LIVE, ContestParticipation.SPECTATE):
+                if contest_id not in banned_judges_cache:
+                    banned_judges_cache[contest_id] = list(
+                        Contest.banned_judges.through.objects.filter(contest_id=contest_id)
+                        .values_list('judge__name', flat=True),
+                    )
+                banned_judges = banned_judges_cache[contest_id]
+
+            if batch_rejudge:
+                priority = BATCH_REJUDGE_PRIORITY
+            elif rejudge:
+                priority = REJUDGE_PRIORITY
+            elif run_pretests_only is not None:
+                priority = CONTEST_SUBMISSION_PRIORITY
+            else:
+                priority = DEFAULT_PRIORITY
+
+            requests.append({
+                'submission-id': id,
+                'problem-id': problem,
+                'language': language,
+                'source': source,
+                'judge-id': judge_id,
+                'banned-judges': banned_judges,
+                'priority': priority,
+            })
+
+            # Keep every packet well under the bridge's maximum packet size.
+            request_size += len(source)
+            if request_size >= JUDGE_BATCH_MAX_SOURCE_SIZE:
+                judged += _send_submission_batch(requests)
+                requests = []
+                request_size = 0
+
+        if requests:
+            judged += _send_submission_batch(requests)
+    return judged
+
+
 def disconnect_judge(judge, force=False):
     judge_request({'name': 'disconnect-judge', 'judge-id': judge.name, 'force': force}, reply=False)
 
@@ -122,7 +380,7 @@ def update_disable_judge(judge):
 
 
 def abort_submission(submission):
-    from .models import Submission
+    from .models import ProblemUserStats, Submission
     # We only want to try to abort a submission if it's still grading, otherwise this can lead to fully graded
     # submissions marked as aborted.
     if submission.status == 'D':
@@ -132,5 +390,6 @@ def abort_submission(submission):
     # and returns a bad-request, the submission is not falsely shown as "Aborted" when it will still be judged.
     if not response.get('judge-aborted', True):
         Submission.objects.filter(id=submission.id).update(status='AB', result='AB', points=0)
+        ProblemUserStats.refresh_submissions([submission.id])
         event.post('sub_%s' % Submission.get_id_secret(submission.id), {'type': 'aborted-submission'})
         _post_update_submission(submission, done=True)
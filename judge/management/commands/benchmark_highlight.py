@@ -0,0 +1,56 @@
+import random
+import time
+
+import pygments
+import pygments.formatters
+import pygments.lexers
+from django.core.management.base import BaseCommand
+
+from judge.highlight_code import highlight_cache, highlight_code
+
+
+class Command(BaseCommand):
+    help = 'compares highlighting a large random source with and without the highlight cache'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=65536, help='size of the source in characters')
+        parser.add_argument('--language', default='cpp', help='Pygments name of the language of the source')
+        parser.add_argument('-n', '--repeat', type=int, default=10, help='number of times to highlight the source')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='seed of the random source, which is different on each run by default')
+
+    def make_source(self, rng, size):
+        lines = ['#include <bits/stdc++.h>', 'using namespace std;', '']
+        length = 0
+        while length < size:
+            name = 'f%d' % rng.randrange(10 ** 6)
+            lines += [
+                'long long %s(vector<long long>& a, int n) {' % name,
+                '    long long ans = %d; // %s' % (rng.randrange(100), name),
+                '    for (int i = 0; i < n; ++i) ans = max(ans, a[i] * %d + (ans >> 1));' % rng.randrange(100),
+                '    return ans %% %d;' % rng.randrange(10 ** 9),
+                '}',
+                '',
+            ]
+            length = sum(map(len, lines))
+        return '\n'.join(lines)[:size]
+
+    def handle(self, *args, **options):
+        source = self.make_source(random.Random(options['seed']), options['size'])
+        language = options['language']
+
+        def run(label, highlight, repeat=options['repeat']):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                highlight()
+            self.stdout.write('%s: %.4fs per highlight' % (label, (time.perf_counter() - start) / repeat))
+
+        run('Uncached', lambda: pygments.highlight(
+            source, pygments.lexers.get_lexer_by_name(language),
+            pygments.formatters.HtmlFormatter(cssclass='codehilite', wrapcode=True),
+        ))
+        run('Cold cache', lambda: highlight_code(source, language), repeat=1)
+        run('In-process cache', lambda: highlight_code(source, language))
+        run('Shared cache', lambda: (highlight_cache.clear(), highlight_code(source, language)))
+        self.stdout.write('Cache: %s' % ', '.join('%s=%s' % item for item in highlight_cache.metrics().items()))
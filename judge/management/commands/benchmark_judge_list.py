@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from judge.bridge.judge_list import JudgeList
+
+
+class SimulatedJudge:
+    def __init__(self, name, problems, executors, load):
+        self.name = name
+        self.problems = problems
+        self.executors = executors
+        self.is_disabled = False
+        self.load = load
+        self._working = False
+
+    def can_judge(self, problem, executor, judge_id=None):
+        return problem in self.problems and executor in self.executors and  \
+            ((not judge_id and not self.is_disabled) or self.name == judge_id)
+
+    @property
+    def working(self):
+        return bool(self._working)
+
+    def submit(self, id, problem, language, source):
+        self._working = id
+
+    def get_current_submission(self):
+        return self._working or None
+
+
+class Command(BaseCommand):
+    help = 'simulates dispatching queued submissions to judges'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('-j', '--judges', type=int, default=40, help='number of judges')
+        parser.add_argument('-s', '--submissions', type=int, default=10000, help='number of queued submissions')
+        parser.add_argument('-p', '--problems', type=int, default=50, help='number of distinct problems')
+        parser.add_argument('-l', '--languages', type=int, default=10, help='number of distinct languages')
+        parser.add_argument('--coverage', type=float, default=0.8, help='fraction of problems each judge supports')
+        parser.add_argument('--seed', type=int, default=0, help='seed of the random judges and submissions')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        problems = ['p%d' % i for i in range(options['problems'])]
+        languages = ['l%d' % i for i in range(options['languages'])]
+        judges = JudgeList()
+        for i in range(options['judges']):
+            supported = rng.sample(problems, max(1, int(len(problems) * options['coverage'])))
+            judge = SimulatedJudge('judge%d' % i, dict.fromkeys(supported), dict.fromkeys(languages), rng.random())
+            judge._working = -1 - i
+            judges.judges.add(judge)
+            judges.submission_map[judge._working] = judge
+
+        start = time.perf_counter()
+        for id in range(1, options['submissions'] + 1):
+            judges.judge(id, rng.choice(problems), rng.choice(languages), '', None,
+                         rng.randrange(judges.priorities), [])
+        queue_time = time.perf_counter() - start
+        self.stdout.write('Queued %d submissions in %.3fs' % (judges.count_queued(), queue_time))
+
+        dispatched = 0
+        start = time.perf_counter()
+        busy = list(judges.judges)
+        while busy:
+            judge = busy.pop(rng.randrange(len(busy)))
+            judges.on_judge_free(judge, judge._working)
+            if judge.working:
+                dispatched += 1
+                busy.append(judge)
+        dispatch_time = time.perf_counter() - start
+        self.stdout.write('Dispatched %d submissions in %.3fs (%.1f us/dispatch), %d left in queue' % (
+            dispatched, dispatch_time, dispatch_time / max(dispatched, 1) * 1e6, judges.count_queued()))
@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from judge.jinja2.markdown import markdown, markdown_cache, render_markdown
+
+WORDS = ('the', 'array', 'answer', 'is', 'sorted', 'so', 'we', 'can', 'binary', 'search', 'on', 'it', 'but', 'my',
+         'solution', 'gets', 'TLE', 'test', 'why', 'use', 'a', 'segment', 'tree', 'instead', 'of', 'brute', 'force')
+
+
+class Command(BaseCommand):
+    help = 'compares rendering a thread of random comments with and without the markdown render cache'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--comments', type=int, default=200, help='number of comments in the thread')
+        parser.add_argument('--style', default='comment', help='markdown style to render the comments with')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='seed of the random comments, which are different on each run by default')
+
+    def sentence(self, rng):
+        words = [rng.choice(WORDS) for _ in range(rng.randrange(5, 25))]
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), '~a_i \\le 10^{%d}~' % rng.randrange(3, 19))
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), '[link](https://example.com/%d)' % rng.randrange(1000))
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), '**%s**' % rng.choice(WORDS))
+        return ' '.join(words).capitalize() + '.'
+
+    def comment(self, rng):
+        blocks = []
+        for _ in range(rng.randrange(1, 5)):
+            kind = rng.random()
+            if kind < 0.15:
+                lines = ['    for (int i = 0; i < n; ++i) ans += a[i] * %d;' % rng.randrange(100)
+                         for _ in range(rng.randrange(3, 30))]
+                blocks.append('```cpp\n%s\n```' % '\n'.join(lines))
+            elif kind < 0.25:
+                blocks.append('\n'.join('- %s' % self.sentence(rng) for _ in range(rng.randrange(2, 6))))
+            else:
+                blocks.append(' '.join(self.sentence(rng) for _ in range(rng.randrange(1, 5))))
+        return '\n\n'.join(blocks)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        comments = [self.comment(rng) for _ in range(options['comments'])]
+        style = options['style']
+        self.stdout.write('%d comments, %d characters in total' % (len(comments), sum(map(len, comments))))
+
+        def run(label, render):
+            start = time.perf_counter()
+            for comment in comments:
+                render(comment, style, lazy_load=True)
+            self.stdout.write('%s: %.3fs' % (label, time.perf_counter() - start))
+
+        run('Uncached', render_markdown)
+        markdown_cache.clear()
+        run('Cold cache', markdown)
+        run('In-process cache', markdown)
+        markdown_cache.clear()
+        run('Shared cache', markdown)
+        self.stdout.write('Cache: %s' % ', '.join('%s=%s' % item for item in markdown_cache.metrics().items()))
@@ -0,0 +1,45 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from judge.ratings import MEAN_INIT, recalculate_ratings_numpy, recalculate_ratings_python, tie_ranker
+
+
+class Command(BaseCommand):
+    help = 'compares the speed and results of the pure Python and NumPy rating solvers on a random contest'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--participants', type=int, default=3000, help='number of rated participants')
+        parser.add_argument('--history', type=int, default=20, help='maximum number of past contests per participant')
+        parser.add_argument('--seed', type=int, default=0, help='seed of the random contest')
+        parser.add_argument('--skip-python', action='store_true', help='only time the NumPy solver')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        n = options['participants']
+
+        scores = sorted((rng.randrange(n // 2 + 1) for _ in range(n)), reverse=True)
+        ranking = list(tie_ranker(scores, key=lambda score: score))
+        times_ranked = [rng.randrange(options['history'] + 1) for _ in range(n)]
+        historical_p = [[rng.gauss(MEAN_INIT, 400) for _ in range(times)] for times in times_ranked]
+        old_mean = [rng.gauss(MEAN_INIT, 300) if times else MEAN_INIT for times in times_ranked]
+        args = ranking, old_mean, times_ranked, historical_p
+
+        start = time.perf_counter()
+        rating, mean, performance = recalculate_ratings_numpy(*args)
+        self.stdout.write('NumPy: %.3fs' % (time.perf_counter() - start))
+
+        if options['skip_python']:
+            return
+
+        start = time.perf_counter()
+        py_rating, py_mean, py_performance = recalculate_ratings_python(*args)
+        self.stdout.write('Python: %.3fs' % (time.perf_counter() - start))
+
+        self.stdout.write('Max difference: rating %d, mean %.6f, performance %.6f' % (
+            max(abs(a - b) for a, b in zip(rating, py_rating)),
+            max(abs(a - b) for a, b in zip(mean, py_mean)),
+            max(abs(a - b) for a, b in zip(performance, py_performance)),
+        ))
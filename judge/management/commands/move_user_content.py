@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from judge.models import Comment, CommentVote, ContestParticipation, Profile, Submission
+from judge.models import Comment, CommentVote, ContestParticipation, ProblemUserStats, Profile, Submission
 
 
 class Command(BaseCommand):
@@ -26,6 +26,12 @@ class Command(BaseCommand):
             raise CommandError(f'Cannot move user {options["source"]} because it has contest participations.')
 
         with transaction.atomic():
+            problem_ids = set(Submission.objects.filter(user=source).values_list('problem_id', flat=True))
             Submission.objects.filter(user=source).update(user=target)
+            # The statistics of both users on the problems of the moved submissions, and so their points, change.
+            for problem_id in problem_ids:
+                ProblemUserStats.refresh(problem_id, source.id)
+                ProblemUserStats.refresh(problem_id, target.id)
+            Profile.calculate_points_bulk([source.id, target.id])
             Comment.objects.filter(author=source).update(author=target)
             CommentVote.objects.filter(voter=source).update(voter=target)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from judge.models import Contest, ContestParticipation, ContestSubmission
+
+
+class Command(BaseCommand):
+    help = 'recounts the submissions of contest participations from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*', help='keys of contests to rebuild, defaults to all contests')
+        parser.add_argument('--verify', action='store_true', help='only report participations whose counts drifted')
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.order_by('key')
+        if options['keys']:
+            contests = contests.filter(key__in=options['keys'])
+
+        count = Coalesce(Subquery(
+            ContestSubmission.objects.filter(participation=OuterRef('pk')).order_by()
+                                     .values('participation').annotate(count=Count('id')).values('count'),
+        ), 0)
+
+        drifted = 0
+        for contest in contests.iterator():
+            ids = [id for id, stored, computed in contest.users.annotate(computed=Count('submission'))
+                   .values_list('id', 'submission_count', 'computed') if stored != computed]
+            if ids:
+                drifted += len(ids)
+                self.stdout.write('%s: %d participations drifted' % (contest.key, len(ids)))
+                if not options['verify']:
+                    # The counts are recomputed in the UPDATE itself, so that concurrent submissions are not lost.
+                    ContestParticipation.objects.filter(id__in=ids).update(submission_count=count)
+
+        self.stdout.write('%d participations drifted' % drifted)
@@ -0,0 +1,47 @@
+import math
+
+from django.core.management.base import BaseCommand
+
+from judge.models import Problem, Profile
+
+
+class Command(BaseCommand):
+    help = 'recounts the submission statistics of problems from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('codes', nargs='*', help='codes of problems to rebuild, defaults to all problems')
+        parser.add_argument('--verify', action='store_true', help='only report problems whose statistics drifted')
+
+    def handle(self, *args, **options):
+        problems = Problem.objects.order_by('code')
+        if options['codes']:
+            problems = problems.filter(code__in=options['codes'])
+
+        drifted = 0
+        fixed = set()
+        for problem in problems.iterator():
+            user_stats = problem.compute_user_stats()
+            stored = {row[0]: row[1:] for row in problem.user_stats.values_list(
+                'user_id', 'submission_count', 'ac_submission_count', 'points', 'is_solved',
+            )}
+            computed = {user_id: (stats['submission_count'], stats['ac_submission_count'], stats['points'],
+                                  stats['is_solved'])
+                        for user_id, stats in user_stats.items()}
+            users = {user_id for user_id in stored.keys() | computed.keys()
+                     if stored.get(user_id) != computed.get(user_id)}
+            counters = [field for field, value in problem.compute_counters(user_stats).items()
+                        if not math.isclose(getattr(problem, field), value, abs_tol=1e-9)]
+            if users or counters:
+                drifted += 1
+                self.stdout.write('%s: %d users drifted%s' % (
+                    problem.code, len(users), ', counters drifted: %s' % ', '.join(counters) if counters else '',
+                ))
+            if not options['verify']:
+                problem._updating_stats_only = True
+                problem.update_stats()
+                fixed |= users
+
+        self.stdout.write('%d problems drifted' % drifted)
+        if fixed:
+            # The points of users are computed from their statistics, so those of the fixed users may have drifted too.
+            self.stdout.write('%d users changed points' % Profile.calculate_points_bulk(sorted(fixed)))
@@ -0,0 +1,63 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    schema_editor.execute("""\
+INSERT INTO `judge_problemuserstats` (`problem_id`, `user_id`, `submission_count`, `ac_submission_count`)
+SELECT `judge_submission`.`problem_id`, `judge_submission`.`user_id`, COUNT(*),
+       SUM(`judge_submission`.`result` = 'AC' AND `judge_submission`.`points` >= `judge_problem`.`points`)
+FROM `judge_submission` INNER JOIN `judge_problem` ON (`judge_submission`.`problem_id` = `judge_problem`.`id`)
+GROUP BY `judge_submission`.`problem_id`, `judge_submission`.`user_id`;
+""")
+    schema_editor.execute("""\
+UPDATE `judge_problem` INNER JOIN (
+    SELECT `judge_problemuserstats`.`problem_id` AS `id`,
+           SUM(`judge_problemuserstats`.`submission_count`) AS `submissions`,
+           SUM(`judge_problemuserstats`.`ac_submission_count`) AS `ac_submissions`,
+           SUM(`judge_problemuserstats`.`ac_submission_count` > 0) AS `users`
+    FROM `judge_problemuserstats` INNER JOIN `judge_profile`
+        ON (`judge_problemuserstats`.`user_id` = `judge_profile`.`id`)
+    WHERE NOT `judge_profile`.`is_unlisted`
+    GROUP BY 1
+) `stats` ON (`judge_problem`.`id` = `stats`.`id`)
+SET `judge_problem`.`submission_count` = `stats`.`submissions`,
+    `judge_problem`.`ac_submission_count` = `stats`.`ac_submissions`,
+    `judge_problem`.`user_count` = `stats`.`users`,
+    `judge_problem`.`ac_rate` = IF(`stats`.`submissions`, 100.0 * `stats`.`ac_submissions` / `stats`.`submissions`, 0);
+""")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('judge', '0194_remove_tag_feature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='submission_count',
+            field=models.IntegerField(default=0, verbose_name='number of submissions'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='ac_submission_count',
+            field=models.IntegerField(default=0, verbose_name='number of accepted submissions'),
+        ),
+        migrations.CreateModel(
+            name='ProblemUserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission_count', models.IntegerField(default=0, verbose_name='number of submissions')),
+                ('ac_submission_count', models.IntegerField(default=0, verbose_name='number of accepted submissions')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='judge.problem', verbose_name='problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_stats', to='judge.profile', verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'problem statistics of user',
+                'verbose_name_plural': 'problem statistics of users',
+                'unique_together': {('problem', 'user')},
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop, atomic=False, elidable=True),
+    ]
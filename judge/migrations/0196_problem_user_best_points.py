@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def populate_points(apps, schema_editor):
+    schema_editor.execute("""\
+UPDATE `judge_problemuserstats` INNER JOIN (
+    SELECT `judge_submission`.`problem_id`, `judge_submission`.`user_id`,
+           MAX(`judge_submission`.`points`) AS `points`,
+           MAX(`judge_submission`.`result` = 'AC' AND
+               `judge_submission`.`case_points` >= `judge_submission`.`case_total`) AS `is_solved`
+    FROM `judge_submission`
+    GROUP BY `judge_submission`.`problem_id`, `judge_submission`.`user_id`
+) `best` ON (`judge_problemuserstats`.`problem_id` = `best`.`problem_id` AND
+             `judge_problemuserstats`.`user_id` = `best`.`user_id`)
+SET `judge_problemuserstats`.`points` = `best`.`points`,
+    `judge_problemuserstats`.`is_solved` = COALESCE(`best`.`is_solved`, 0);
+""")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('judge', '0195_problem_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problemuserstats',
+            name='points',
+            field=models.FloatField(db_index=True, null=True, verbose_name='best points'),
+        ),
+        migrations.AddField(
+            model_name='problemuserstats',
+            name='is_solved',
+            field=models.BooleanField(default=False, verbose_name='fully solved'),
+        ),
+        migrations.RunPython(populate_points, migrations.RunPython.noop, atomic=False, elidable=True),
+    ]
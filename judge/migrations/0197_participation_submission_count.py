@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def populate_submission_count(apps, schema_editor):
+    schema_editor.execute("""\
+UPDATE `judge_contestparticipation` INNER JOIN (
+    SELECT `judge_contestsubmission`.`participation_id`, COUNT(*) AS `count`
+    FROM `judge_contestsubmission`
+    GROUP BY `judge_contestsubmission`.`participation_id`
+) `submissions` ON (`judge_contestparticipation`.`id` = `submissions`.`participation_id`)
+SET `judge_contestparticipation`.`submission_count` = `submissions`.`count`;
+""")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('judge', '0196_problem_user_best_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestparticipation',
+            name='submission_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of submissions, used as the last tiebreaker.',
+                                              verbose_name='submission count'),
+        ),
+        migrations.RunPython(populate_submission_count, migrations.RunPython.noop, atomic=False, elidable=True),
+        migrations.AddIndex(
+            model_name='contestparticipation',
+            index=models.Index(fields=['contest', 'is_disqualified', '-score', 'cumtime', 'tiebreaker',
+                                       '-submission_count'], name='judge_conte_contest_8783d7_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def renumber_trees(apps, schema_editor):
+    schema_editor.execute("""\
+UPDATE `judge_comment` INNER JOIN (
+    SELECT `judge_comment`.`tree_id`, MIN(`judge_comment`.`id`) AS `root_id`
+    FROM `judge_comment`
+    WHERE `judge_comment`.`parent_id` IS NULL
+    GROUP BY `judge_comment`.`tree_id`
+) `roots` ON (`judge_comment`.`tree_id` = `roots`.`tree_id`)
+SET `judge_comment`.`tree_id` = `roots`.`root_id`;
+""")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('judge', '0197_participation_submission_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_trees, migrations.RunPython.noop, atomic=False, elidable=True),
+    ]
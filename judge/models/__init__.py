@@ -6,7 +6,7 @@ from judge.models.contest import Contest, ContestAnnouncement, ContestMoss, Cont
     ContestSubmission, ContestTag, Rating
 from judge.models.interface import BlogPost, BlogVote, MiscConfig, NavigationBar, validate_regex
 from judge.models.problem import LanguageLimit, License, Problem, ProblemClarification, ProblemGroup, \
-    ProblemTranslation, ProblemType, Solution, SubmissionSourceAccess, TranslatedProblemQuerySet
+    ProblemTranslation, ProblemType, ProblemUserStats, Solution, SubmissionSourceAccess, TranslatedProblemQuerySet
 from judge.models.problem_data import CHECKERS, ProblemData, ProblemTestCase, problem_data_storage, \
     problem_directory_file
 from judge.models.profile import Badge, Organization, OrganizationRequest, Profile, WebAuthnCredential
@@ -4,12 +4,13 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import RegexValidator
-from django.db import models
-from django.db.models import CASCADE
+from django.db import models, transaction
+from django.db.models import CASCADE, F
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from mptt.fields import TreeForeignKey
+from mptt.managers import TreeManager
 from mptt.models import MPTTModel
 
 from judge.models.contest import Contest
@@ -24,6 +25,21 @@ comment_validator = RegexValidator(r'^\w+:[a-z0-9A-Z_]+$',
                                    _(r'Page code must be ^\w+:[a-z0-9A-Z_]+$'))
 
 
+class CommentManager(TreeManager):
+    # Each thread is numbered by the ID of its root comment, so that starting a thread never renumbers the others.
+    # Every way of making a reply the root of its own thread ends in _make_child_root_node.
+    def _create_tree_space(self, target_tree_id, num_trees=1):
+        pass
+
+    def _make_child_root_node(self, node, new_tree_id=None):
+        super()._make_child_root_node(node, node.pk)
+
+    def _make_sibling_of_root_node(self, node, target, position):
+        # Threads are ordered by their numbers, so a thread has no position among the others to move to.
+        if node.is_child_node():
+            self._make_child_root_node(node)
+
+
 class Comment(MPTTModel):
     author = models.ForeignKey(Profile, verbose_name=_('commenter'), on_delete=CASCADE)
     time = models.DateTimeField(verbose_name=_('posted time'), auto_now_add=True)
@@ -36,6 +52,8 @@ class Comment(MPTTModel):
                             on_delete=CASCADE)
     revisions = models.IntegerField(verbose_name=_('revisions'), default=0)
 
+    objects = CommentManager()
+
     class Meta:
         verbose_name = _('comment')
         verbose_name_plural = _('comments')
@@ -43,10 +61,28 @@ class Comment(MPTTModel):
     class MPTTMeta:
         order_insertion_by = ['-time']
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None or self.lft is not None:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            if self.parent_id is None:
+                self.tree_id, self.lft, self.rght, self.level = 0, 1, 2, 0
+                super().save(*args, **kwargs)
+                Comment.objects.filter(id=self.id).update(tree_id=self.id)
+                self.tree_id = self.id
+            else:
+                # Replies to a thread take turns on the row of its root comment, and the parent is read under that
+                # lock, so that its tree fields are current. The newest reply is always the first child.
+                tree_id = Comment.objects.filter(id=self.parent_id).values_list('tree_id', flat=True).get()
+                list(Comment.objects.select_for_update().filter(tree_id=tree_id, parent=None).values_list('id'))
+                self.parent = Comment.objects.select_for_update().get(id=self.parent_id)
+                self.insert_at(self.parent, 'first-child', allow_existing_pk=True, refresh_target=False)
+                super().save(*args, **kwargs)
+
     def vote(self, delta):
-        self.score += delta
-        self.save(update_fields=['score'])
-        self.author.update_contribution_points(delta * settings.VNOJ_CP_COMMENT)
+        Comment.objects.filter(id=self.id).update(score=F('score') + delta)
+        Profile.add_contribution_points([self.author_id], delta * settings.VNOJ_CP_COMMENT)
 
     @classmethod
     def get_newest_visible_comments(cls, viewer, author=None, n=None, batch=None):
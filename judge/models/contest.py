@@ -19,7 +19,6 @@ from judge import contest_format, event_poster as event
 from judge.models.problem import Problem
 from judge.models.profile import Organization, Profile
 from judge.models.submission import Submission
-from judge.ratings import rate_contest
 from judge.utils.unicode import utf8bytes
 
 __all__ = ['Contest', 'ContestTag', 'ContestAnnouncement', 'ContestParticipation', 'ContestProblem',
@@ -521,12 +520,9 @@ class Contest(models.Model):
         return queryset.distinct()
 
     def rate(self):
-        with transaction.atomic():
-            Rating.objects.filter(contest__end_time__range=(self.end_time, self._now)).delete()
-            for contest in Contest.objects.filter(
-                is_rated=True, end_time__range=(self.end_time, self._now),
-            ).order_by('end_time'):
-                rate_contest(contest)
+        """Schedules rating this contest again, along with the later contests that depend on its ratings."""
+        from judge.tasks import rerate_contests
+        transaction.on_commit(rerate_contests.s(self.id).delay)
 
     class Meta:
         permissions = (
@@ -580,6 +576,8 @@ class ContestParticipation(models.Model):
     virtual = models.IntegerField(verbose_name=_('virtual participation id'), default=LIVE,
                                   help_text=_('0 means non-virtual, otherwise the n-th virtual participation.'))
     format_data = JSONField(verbose_name=_('contest format specific data'), null=True, blank=True)
+    submission_count = models.PositiveIntegerField(verbose_name=_('submission count'), default=0,
+                                                   help_text=_('Number of submissions, used as the last tiebreaker.'))
 
     def recompute_results(self):
         with transaction.atomic():
@@ -669,6 +667,10 @@ class ContestParticipation(models.Model):
         verbose_name_plural = _('contest participations')
 
         unique_together = ('contest', 'user', 'virtual')
+        indexes = [
+            # For contest rankings
+            models.Index(fields=['contest', 'is_disqualified', '-score', 'cumtime', 'tiebreaker', '-submission_count']),
+        ]
 
 
 class ContestProblem(models.Model):
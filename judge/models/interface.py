@@ -3,7 +3,7 @@ import re
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import CASCADE
+from django.db.models import CASCADE, F
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -84,14 +84,13 @@ class BlogPost(models.Model):
         return self.title
 
     def vote(self, delta):
-        self.score += delta
-        self.save(update_fields=['score'])
+        BlogPost.objects.filter(id=self.id).update(score=F('score') + delta)
 
         # Only update contributions for global and personal posts
         if self.visible and self.organization is None:
-            for author in self.authors.all():
-                # Blog votes are counted as comment votes
-                author.update_contribution_points(delta * settings.VNOJ_CP_COMMENT)
+            # Blog votes are counted as comment votes
+            Profile.add_contribution_points(list(self.authors.values_list('id', flat=True)),
+                                            delta * settings.VNOJ_CP_COMMENT)
 
     def get_absolute_url(self):
         return reverse('blog_post', args=(self.id, self.slug))
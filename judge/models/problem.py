@@ -1,5 +1,6 @@
 import errno
 import json
+from functools import partial
 from operator import attrgetter
 
 from django.conf import settings
@@ -8,7 +9,7 @@ from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models, transaction
-from django.db.models import CASCADE, Exists, F, FilteredRelation, OuterRef, Q, SET_NULL
+from django.db.models import CASCADE, Case, Count, Exists, F, FilteredRelation, Max, OuterRef, Q, SET_NULL, When
 from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
@@ -23,7 +24,7 @@ from judge.user_translations import gettext as user_gettext
 from judge.utils.url import get_absolute_pdf_url
 
 __all__ = ['ProblemGroup', 'ProblemType', 'Problem', 'ProblemTranslation', 'ProblemClarification', 'License',
-           'Solution', 'SubmissionSourceAccess', 'TranslatedProblemQuerySet']
+           'Solution', 'SubmissionSourceAccess', 'TranslatedProblemQuerySet', 'ProblemUserStats']
 
 
 def disallowed_characters_validator(text):
@@ -198,6 +199,8 @@ class Problem(models.Model):
     user_count = models.IntegerField(verbose_name=_('number of users'), default=0,
                                      help_text=_('The number of users who solved the problem.'))
     ac_rate = models.FloatField(verbose_name=_('solve rate'), default=0)
+    submission_count = models.IntegerField(verbose_name=_('number of submissions'), default=0)
+    ac_submission_count = models.IntegerField(verbose_name=_('number of accepted submissions'), default=0)
     is_full_markup = models.BooleanField(verbose_name=_('allow full markdown access'), default=False)
     submission_source_visibility_mode = models.CharField(verbose_name=_('submission source visibility'), max_length=1,
                                                          default=SubmissionSourceAccess.FOLLOW,
@@ -488,19 +491,59 @@ class Problem(models.Model):
             }[settings.DMOJ_SUBMISSION_SOURCE_VISIBILITY]
         return self.submission_source_visibility_mode
 
+    def compute_user_stats(self):
+        """Computes the statistics of each user on this problem from scratch.
+
+        Returns a dict mapping user ID to a dict of `ProblemUserStats` field values, plus `is_unlisted`.
+        """
+        return {
+            row['user_id']: {
+                'submission_count': row['submissions'],
+                'ac_submission_count': row['ac_submissions'],
+                'points': row['best_points'],
+                'is_solved': bool(row['solved']),
+                'is_unlisted': row['user__is_unlisted'],
+            }
+            for row in self.submission_set.values('user_id', 'user__is_unlisted')
+                                          .annotate(**ProblemUserStats.aggregates(self.points)).order_by()
+        }
+
     def update_stats(self):
-        all_queryset = self.submission_set.filter(user__is_unlisted=False)
-        ac_queryset = all_queryset.filter(points__gte=self.points, result='AC')
-        self.user_count = ac_queryset.values('user').distinct().count()
-        submissions = all_queryset.count()
-        if submissions:
-            self.ac_rate = 100.0 * ac_queryset.count() / submissions
-        else:
-            self.ac_rate = 0
-        self.save()
+        """Rebuilds the stored submission statistics of this problem from scratch.
+
+        After each submission, `ProblemUserStats.refresh` applies the change in a single user's counts instead.
+        """
+        with transaction.atomic():
+            Problem.objects.select_for_update().filter(id=self.id).values_list('id').first()
+            user_stats = self.compute_user_stats()
+            ProblemUserStats.objects.filter(problem=self).delete()
+            ProblemUserStats.objects.bulk_create([
+                ProblemUserStats(problem=self, user_id=user_id, submission_count=stats['submission_count'],
+                                 ac_submission_count=stats['ac_submission_count'], points=stats['points'],
+                                 is_solved=stats['is_solved'])
+                for user_id, stats in user_stats.items()
+            ], batch_size=1000)
+
+            counters = self.compute_counters(user_stats)
+            for field, value in counters.items():
+                setattr(self, field, value)
+            self.save(update_fields=list(counters))
 
     update_stats.alters_data = True
 
+    @staticmethod
+    def compute_counters(user_stats):
+        """Computes the problem-level counters from the result of `compute_user_stats`."""
+        listed = [stats for stats in user_stats.values() if not stats['is_unlisted']]
+        submission_count = sum(stats['submission_count'] for stats in listed)
+        ac_submission_count = sum(stats['ac_submission_count'] for stats in listed)
+        return {
+            'submission_count': submission_count,
+            'ac_submission_count': ac_submission_count,
+            'user_count': sum(1 for stats in listed if stats['ac_submission_count']),
+            'ac_rate': 100.0 * ac_submission_count / submission_count if submission_count else 0,
+        }
+
     def _get_limits(self, key):
         global_limit = getattr(self, key)
         limits = {limit['language_id']: (limit['language__name'], limit[key])
@@ -645,6 +688,107 @@ class ProblemTranslation(models.Model):
         verbose_name_plural = _('problem translations')
 
 
+class ProblemUserStats(models.Model):
+    problem = models.ForeignKey(Problem, verbose_name=_('problem'), related_name='user_stats', on_delete=CASCADE)
+    user = models.ForeignKey(Profile, verbose_name=_('user'), related_name='problem_stats', on_delete=CASCADE)
+    submission_count = models.IntegerField(verbose_name=_('number of submissions'), default=0)
+    ac_submission_count = models.IntegerField(verbose_name=_('number of accepted submissions'), default=0)
+    points = models.FloatField(verbose_name=_('best points'), null=True, db_index=True)
+    is_solved = models.BooleanField(verbose_name=_('fully solved'), default=False)
+
+    @staticmethod
+    def aggregates(problem_points):
+        return {
+            'submissions': Count('id'),
+            'ac_submissions': Count('id', filter=Q(result='AC', points__gte=problem_points)),
+            'best_points': Max('points'),
+            'solved': Count('id', filter=Q(result='AC', case_points__gte=F('case_total'))),
+        }
+
+    @classmethod
+    def refresh(cls, problem_id, user_id):
+        """Recomputes the statistics of a user on a problem, and applies the change to the problem's counters.
+
+        This must be called whenever a submission is created or deleted, or its result or points change.
+        Returns whether the best points or solved state of the user changed.
+        """
+        from judge.models.submission import Submission
+
+        with transaction.atomic():
+            # Locking the problem serializes refreshes, so concurrent gradings cannot both add the same solver.
+            points = Problem.objects.select_for_update().filter(id=problem_id).values_list('points', flat=True).first()
+            if points is None:
+                return False
+
+            counts = Submission.objects.filter(problem_id=problem_id, user_id=user_id) \
+                                       .aggregate(**cls.aggregates(points))
+            try:
+                stats = cls.objects.get(problem_id=problem_id, user_id=user_id)
+            except cls.DoesNotExist:
+                stats = cls(problem_id=problem_id, user_id=user_id)
+
+            submission_delta = counts['submissions'] - stats.submission_count
+            ac_delta = counts['ac_submissions'] - stats.ac_submission_count
+            user_delta = bool(counts['ac_submissions']) - bool(stats.ac_submission_count)
+            solved_changed = bool(counts['solved']) != stats.is_solved
+            score_changed = counts['best_points'] != stats.points or solved_changed
+            if not submission_delta and not ac_delta and not score_changed:
+                return False
+
+            if solved_changed:
+                # The cached set of solved problems may have been filled from the old row since grading ended.
+                transaction.on_commit(partial(cache.delete, 'user_complete:%d' % user_id))
+
+            if counts['submissions']:
+                stats.submission_count = counts['submissions']
+                stats.ac_submission_count = counts['ac_submissions']
+                stats.points = counts['best_points']
+                stats.is_solved = bool(counts['solved'])
+                stats.save()
+            elif stats.pk is not None:
+                stats.delete()
+
+            if (submission_delta or ac_delta) and not Profile.objects.filter(id=user_id, is_unlisted=True).exists():
+                Problem.objects.filter(id=problem_id).update(
+                    submission_count=F('submission_count') + submission_delta,
+                    ac_submission_count=F('ac_submission_count') + ac_delta,
+                    user_count=F('user_count') + user_delta,
+                )
+                Problem.objects.filter(id=problem_id).update(ac_rate=Case(
+                    When(submission_count__gt=0, then=100.0 * F('ac_submission_count') / F('submission_count')),
+                    default=0.0,
+                ))
+            return score_changed
+
+    @classmethod
+    def refresh_submissions(cls, ids):
+        """Refreshes the statistics of the users on the problems of the given submissions, and their points.
+
+        This is for submissions whose result was changed with a bulk update, such as when they end as CE, IE or AB.
+        """
+        from judge.models.submission import Submission
+
+        pairs = Submission.objects.filter(id__in=ids).values_list('problem_id', 'user_id').distinct().order_by()
+        users = {user_id for problem_id, user_id in pairs
+                 if cls.refresh(problem_id, user_id) and Problem.get_public_problems().filter(id=problem_id).exists()}
+        if users:
+            Profile.calculate_points_bulk(sorted(users))
+
+    @classmethod
+    def refresh_user(cls, user_id):
+        from judge.models.submission import Submission
+
+        problem_ids = Submission.objects.filter(user_id=user_id).values_list('problem_id', flat=True).distinct()
+        for problem_id in set(problem_ids) | set(cls.objects.filter(user_id=user_id).values_list('problem_id',
+                                                                                                 flat=True)):
+            cls.refresh(problem_id, user_id)
+
+    class Meta:
+        unique_together = ('problem', 'user')
+        verbose_name = _('problem statistics of user')
+        verbose_name_plural = _('problem statistics of users')
+
+
 class ProblemClarification(models.Model):
     problem = models.ForeignKey(Problem, verbose_name=_('clarified problem'), on_delete=CASCADE)
     description = models.TextField(verbose_name=_('clarification body'), validators=[disallowed_characters_validator])
@@ -3,6 +3,7 @@ import hmac
 import json
 import secrets
 import struct
+from collections import Counter, defaultdict
 
 import pyotp
 import webauthn
@@ -10,7 +11,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.db import models
-from django.db.models import F, Max, Sum
+from django.db.models import F, Sum
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import force_bytes
@@ -21,10 +22,12 @@ from fernet_fields import EncryptedCharField
 from pyotp.utils import strings_equal
 from sortedm2m.fields import SortedManyToManyField
 
+from judge.caching import bump_fragment_versions
 from judge.models.choices import ACE_THEMES, MATH_ENGINES_CHOICES, SITE_THEMES, TIMEZONE
 from judge.models.runtime import Language
 from judge.ratings import rating_class
 from judge.utils.float_compare import float_compare_equal
+from judge.utils.iterator import chunk
 from judge.utils.two_factor import webauthn_decode
 
 __all__ = ['Organization', 'Profile', 'OrganizationRequest', 'WebAuthnCredential']
@@ -230,32 +233,64 @@ class Profile(models.Model):
 
     _pp_table = [pow(settings.DMOJ_PP_STEP, i) for i in range(settings.DMOJ_PP_ENTRIES)]
 
-    def calculate_points(self, table=_pp_table):
-        from judge.models import Problem
-        public_problems = Problem.get_public_problems()
-        data = (
-            public_problems.filter(submission__user=self, submission__points__isnull=False)
-                           .annotate(max_points=Max('submission__points')).order_by('-max_points')
-                           .values_list('max_points', flat=True).filter(max_points__gt=0)
-        )
-        bonus_function = settings.DMOJ_PP_BONUS_FUNCTION
+    def _set_points(self, data, problems, table=_pp_table):
+        # `data` is the best points of the user on each public problem, in descending order.
         points = sum(data)
-        problems = (
-            public_problems.filter(submission__user=self, submission__result='AC',
-                                   submission__case_points__gte=F('submission__case_total'))
-            .values('id').distinct().count()
-        )
-        pp = sum(x * y for x, y in zip(table, data)) + bonus_function(problems)
+        pp = sum(x * y for x, y in zip(table, data)) + settings.DMOJ_PP_BONUS_FUNCTION(problems)
         if not float_compare_equal(self.points, points) or \
            problems != self.problem_count or \
            not float_compare_equal(self.performance_points, pp):
             self.points = points
             self.problem_count = problems
             self.performance_points = pp
+            return True
+        return False
+
+    def calculate_points(self, table=_pp_table):
+        public_stats = self.problem_stats.filter(problem__is_public=True, problem__is_organization_private=False)
+        data = list(public_stats.filter(points__gt=0).order_by('-points').values_list('points', flat=True))
+        problems = public_stats.filter(is_solved=True).count()
+        if self._set_points(data, problems, table):
             self.save(update_fields=['points', 'problem_count', 'performance_points'])
             for org in self.organizations.get_queryset():
                 org.calculate_points()
-        return points
+        return self.points
+
+    @classmethod
+    def calculate_points_bulk(cls, profile_ids, progress=None, chunk_size=1000):
+        """Recalculates the points of many profiles, like `calculate_points`, with a few queries per chunk of profiles.
+
+        The organizations of the profiles whose points changed are recalculated once each at the end.
+        Returns the number of profiles whose points changed.
+        """
+        from judge.models.problem import ProblemUserStats
+
+        changed = set()
+        for ids in chunk(profile_ids, chunk_size):
+            data = defaultdict(list)
+            solved = Counter()
+            for user_id, points, is_solved in ProblemUserStats.objects.filter(
+                user_id__in=ids, problem__is_public=True, problem__is_organization_private=False,
+            ).order_by('user_id', '-points').values_list('user_id', 'points', 'is_solved'):
+                if points is not None and points > 0:
+                    data[user_id].append(points)
+                if is_solved:
+                    solved[user_id] += 1
+
+            profiles = [profile for profile in cls.objects.filter(id__in=ids)
+                        .only('id', 'points', 'problem_count', 'performance_points')
+                        if profile._set_points(data[profile.id], solved[profile.id])]
+            cls.objects.bulk_update(profiles, ['points', 'problem_count', 'performance_points'])
+            changed.update(profile.id for profile in profiles)
+            if progress is not None:
+                progress.did(len(ids))
+
+        if changed:
+            # The profiles are updated in bulk, so the post_save signal does not bump the top users.
+            bump_fragment_versions('home_top_users')
+        for org in Organization.objects.filter(member__in=changed).distinct():
+            org.calculate_points()
+        return len(changed)
 
     calculate_points.alters_data = True
 
@@ -291,6 +326,13 @@ class Profile(models.Model):
 
     update_contribution_points.alters_data = True
 
+    @classmethod
+    def add_contribution_points(cls, profile_ids, delta):
+        # Added in the UPDATE itself, so that concurrent changes to the same profiles are not lost.
+        count = cls.objects.filter(id__in=profile_ids).update(contribution_points=F('contribution_points') + delta)
+        bump_fragment_versions('home_top_users')
+        return count
+
     def generate_api_token(self):
         secret = secrets.token_bytes(32)
         self.api_token = hmac.new(force_bytes(settings.SECRET_KEY), msg=secret, digestmod='sha256').hexdigest()
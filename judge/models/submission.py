@@ -11,7 +11,7 @@ from django.utils.translation import gettext_lazy as _
 from reversion import revisions
 
 from judge.judgeapi import abort_submission, judge_submission
-from judge.models.problem import Problem, SubmissionSourceAccess
+from judge.models.problem import Problem, ProblemUserStats, SubmissionSourceAccess
 from judge.models.profile import Profile
 from judge.models.runtime import Language
 from judge.utils.unicode import utf8bytes
@@ -132,6 +132,7 @@ class Submission(models.Model):
             Submission.objects.filter(id=self.id).update(status='D', result='AB')
             SubmissionTestCase.objects.filter(submission_id=self.id).delete()
             self.update_contest()
+            ProblemUserStats.refresh_submissions([self.id])
         elif force_judge or not self.is_locked:
             if rejudge:
                 with revisions.create_revision(manage_manually=True):
@@ -178,11 +179,11 @@ class Submission(models.Model):
 
         return False
 
-    def update_contest(self):
+    def update_contest(self, recompute_participation=True):
         try:
             contest = self.contest
         except AttributeError:
-            return
+            return False
 
         contest_problem = contest.problem
         contest.points = round(self.case_points / self.case_total * contest_problem.points
@@ -193,7 +194,9 @@ class Submission(models.Model):
             contest.points = 0
 
         contest.save()
-        contest.participation.recompute_results()
+        if recompute_participation:
+            contest.participation.recompute_results()
+        return True
 
     update_contest.alters_data = True
 
@@ -1,10 +1,14 @@
+from io import StringIO
+
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
-from judge.models import Contest, ContestParticipation, ContestTag
+from judge.models import Contest, ContestParticipation, ContestSubmission, ContestTag, Language, Submission
 from judge.models.contest import MinValueOrNoneValidator
-from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, create_user
+from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
+    create_contest_problem, create_user
 
 
 class ContestTestCase(CommonDataMixin, TestCase):
@@ -880,3 +884,40 @@ class MinValueOrNoneValidatorTestCase(SimpleTestCase):
 
         with self.assertRaises(ValidationError):
             MinValueOrNoneValidator(100)(0)
+
+
+class ContestParticipationSubmissionCountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.contest = create_contest(key='submission_count')
+        cls.contest_problem = create_contest_problem(contest=cls.contest, problem='submission_count')
+        cls.participation = create_contest_participation(contest=cls.contest, user='submission_count')
+
+    def submit(self):
+        submission = Submission.objects.create(user=self.participation.user, problem=self.contest_problem.problem,
+                                               language=Language.get_python3(), contest_object=self.contest)
+        return ContestSubmission.objects.create(submission=submission, problem=self.contest_problem,
+                                                participation=self.participation)
+
+    def submission_count(self):
+        return ContestParticipation.objects.get(id=self.participation.id).submission_count
+
+    def test_incremental(self):
+        first = self.submit()
+        self.submit()
+        self.assertEqual(self.submission_count(), 2)
+
+        # Recomputing the results must not overwrite the count with a stale one.
+        self.participation.recompute_results()
+        self.assertEqual(self.submission_count(), 2)
+
+        first.delete()
+        self.assertEqual(self.submission_count(), 1)
+
+    def test_rebuild(self):
+        self.submit()
+        ContestParticipation.objects.filter(id=self.participation.id).update(submission_count=5)
+        call_command('rebuild_participation_stats', 'submission_count', '--verify', stdout=StringIO())
+        self.assertEqual(self.submission_count(), 5)
+        call_command('rebuild_participation_stats', 'submission_count', stdout=StringIO())
+        self.assertEqual(self.submission_count(), 1)
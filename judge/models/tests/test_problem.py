@@ -1,12 +1,17 @@
+from io import StringIO
+
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import SimpleTestCase, TestCase, override_settings
 from django.utils import timezone
 
-from judge.models import ContestParticipation, Language, LanguageLimit, Problem
+from judge.models import ContestParticipation, Language, LanguageLimit, Problem, ProblemUserStats, Profile, \
+    Submission
 from judge.models.problem import ProblemTestcaseAccess, disallowed_characters_validator
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
     create_contest_problem, create_organization, create_problem, create_problem_type, create_solution, \
     create_user
+from judge.utils.problems import user_completed_ids
 
 
 class ProblemTestCase(CommonDataMixin, TestCase):
@@ -446,6 +451,88 @@ class ProblemTestCase(CommonDataMixin, TestCase):
                         problem_codes,
                     )
 
+    def test_update_stats_delta(self):
+        problem = create_problem(code='stats', points=10)
+        unlisted = create_user(username='stats_unlisted').profile
+        Profile.objects.filter(id=unlisted.id).update(is_unlisted=True)
+        users = [self.users['normal'].profile, self.users['suggester'].profile, unlisted]
+
+        def submit(user, result, points):
+            return Submission.objects.create(user=user, problem=problem, language=Language.get_python3(),
+                                             result=result, points=points, status='D')
+
+        def assertStats(submissions, ac_submissions, user_count):
+            stored = Problem.objects.get(id=problem.id)
+            self.assertEqual(stored.submission_count, submissions)
+            self.assertEqual(stored.ac_submission_count, ac_submissions)
+            self.assertEqual(stored.user_count, user_count)
+            self.assertAlmostEqual(stored.ac_rate, 100.0 * ac_submissions / submissions if submissions else 0)
+
+            rows = set(problem.user_stats.values_list('user_id', 'submission_count', 'ac_submission_count'))
+            problem.update_stats()
+            self.assertEqual(rows, set(problem.user_stats.values_list('user_id', 'submission_count',
+                                                                      'ac_submission_count')))
+            rebuilt = Problem.objects.get(id=problem.id)
+            self.assertEqual((rebuilt.submission_count, rebuilt.ac_submission_count, rebuilt.user_count),
+                             (submissions, ac_submissions, user_count))
+
+        # Creating a submission counts it through the post_save signal.
+        wrong = submit(users[0], 'WA', 0)
+        assertStats(1, 0, 0)
+
+        Submission.objects.filter(id=wrong.id).update(result='AC', points=10)
+        ProblemUserStats.refresh(problem.id, users[0].id)
+        assertStats(1, 1, 1)
+
+        partial = submit(users[1], 'AC', 5)
+        submit(users[1], 'AC', 10)
+        ProblemUserStats.refresh(problem.id, users[1].id)
+        assertStats(3, 2, 2)
+
+        # Unlisted users are tracked per user, but do not count towards the problem.
+        submit(unlisted, 'AC', 10)
+        ProblemUserStats.refresh(problem.id, unlisted.id)
+        assertStats(3, 2, 2)
+        self.assertTrue(problem.user_stats.filter(user=unlisted).exists())
+
+        wrong.delete()
+        assertStats(2, 1, 1)
+        self.assertFalse(problem.user_stats.filter(user=users[0]).exists())
+
+        partial.delete()
+        assertStats(1, 1, 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refresh_solved_cache(self):
+        problem = create_problem(code='stats_solved', points=10)
+        profile = self.users['normal'].profile
+        submission = Submission.objects.create(user=profile, problem=problem, language=Language.get_python3(),
+                                               result='WA', points=0, case_points=0, case_total=1, status='D')
+        self.assertNotIn(problem.id, user_completed_ids(profile))
+
+        # A request between the end of grading and the refresh fills the cache from the old row.
+        Submission.objects.filter(id=submission.id).update(result='AC', points=10, case_points=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProblemUserStats.refresh(problem.id, profile.id)
+        self.assertIn(problem.id, user_completed_ids(profile))
+
+    def test_rebuild_counters(self):
+        problem = create_problem(code='stats_rebuild', points=10)
+        Submission.objects.create(user=self.users['normal'].profile, problem=problem, language=Language.get_python3(),
+                                  result='AC', points=10, status='D')
+        # Only the problem-level counters drift, the per-user rows are correct.
+        Problem.objects.filter(id=problem.id).update(user_count=5, ac_rate=12.5)
+
+        output = StringIO()
+        call_command('rebuild_problem_stats', 'stats_rebuild', '--verify', stdout=output)
+        self.assertIn('stats_rebuild: 0 users drifted, counters drifted: user_count, ac_rate', output.getvalue())
+        self.assertIn('1 problems drifted', output.getvalue())
+        self.assertEqual(Problem.objects.get(id=problem.id).user_count, 5)
+
+        call_command('rebuild_problem_stats', 'stats_rebuild', stdout=StringIO())
+        rebuilt = Problem.objects.get(id=problem.id)
+        self.assertEqual((rebuilt.user_count, rebuilt.ac_rate), (1, 100.0))
+
 
 @override_settings(LANGUAGE_CODE='en-US', LANGUAGES=(('en', 'English'),))
 class SolutionTestCase(CommonDataMixin, TestCase):
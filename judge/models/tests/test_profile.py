@@ -7,8 +7,10 @@ from django.test import TestCase
 from django.utils import timezone
 from django.utils.encoding import force_bytes
 
-from judge.models import Profile
-from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation
+from judge.models import Language, ProblemUserStats, Profile, Submission
+from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, create_problem, \
+    create_user
+from judge.utils.problems import user_completed_ids
 
 
 class OrganizationTestCase(CommonDataMixin, TestCase):
@@ -64,6 +66,36 @@ class ProfileTestCase(CommonDataMixin, TestCase):
                 self.profile.calculate_points()
                 self.assertEqual(getattr(self.profile, attr), 0)
 
+    def test_calculate_points_best_scores(self):
+        profile = create_user(username='best_scores').profile
+        partial = create_problem(code='best_partial', points=10, partial=True, is_public=True)
+        other = create_problem(code='best_other', points=5, is_public=True)
+        private = create_problem(code='best_private', points=5, is_public=False)
+
+        def submit(problem, result, case_points, case_total):
+            return Submission.objects.create(
+                user=profile, problem=problem, language=Language.get_python3(), status='D', result=result,
+                case_points=case_points, case_total=case_total, points=problem.points * case_points / case_total,
+            )
+
+        submit(partial, 'WA', 3, 10)
+        best = submit(partial, 'AC', 10, 10)
+        submit(other, 'WA', 0, 1)
+        submit(private, 'AC', 1, 1)
+
+        profile.calculate_points()
+        self.assertEqual(profile.points, 10)
+        self.assertEqual(profile.problem_count, 1)
+        self.assertEqual(user_completed_ids(profile), {partial.id, private.id})
+
+        # A rejudge lowering the best submission falls back to the next best one.
+        Submission.objects.filter(id=best.id).update(result='WA', case_points=2, points=2)
+        self.assertTrue(ProblemUserStats.refresh(partial.id, profile.id))
+        self.assertFalse(ProblemUserStats.refresh(partial.id, profile.id))
+        profile.calculate_points()
+        self.assertEqual(profile.points, 3)
+        self.assertEqual(profile.problem_count, 0)
+
     def test_generate_api_token(self):
         token = self.profile.generate_api_token()
 
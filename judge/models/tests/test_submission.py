@@ -1,7 +1,11 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from judge.judge_priority import CONTEST_SUBMISSION_PRIORITY, DEFAULT_PRIORITY
+from judge.judgeapi import judge_submissions
 from judge.models import ContestSubmission, Language, Submission, SubmissionSource
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
     create_contest_problem, create_problem, create_user
@@ -141,6 +145,55 @@ class SubmissionTestCase(CommonDataMixin, TestCase):
         self.queued_submission.update_contest()
         self.assertEqual(self.queued_contest_submission.points, 0)
 
+    def test_judge_submissions(self):
+        self.full_ac_submission.test_cases.create(case=1, status='AC', time=1, memory=1, points=1, total=1)
+        packets = []
+
+        def judge_request(packet, reply=True):
+            packets.append(packet)
+            return {
+                'name': 'submission-batch-received',
+                'submission-ids': [request['submission-id'] for request in packet['submissions']],
+            }
+
+        queryset = Submission.objects.filter(
+            id__in=(self.full_ac_submission.id, self.locked_submission.id, self.queued_submission.id),
+        )
+        with mock.patch('judge.judgeapi.judge_request', judge_request):
+            self.assertEqual(judge_submissions(queryset), 1)
+
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0]['name'], 'submission-batch-request')
+        requests = {request['submission-id']: request for request in packets[0]['submissions']}
+        self.assertEqual(set(requests), {self.full_ac_submission.id})
+        self.assertEqual(requests[self.full_ac_submission.id]['problem-id'], 'full_ac')
+        self.assertEqual(requests[self.full_ac_submission.id]['priority'], DEFAULT_PRIORITY)
+
+        self.full_ac_submission.refresh_from_db()
+        self.assertEqual(self.full_ac_submission.status, 'QU')
+        self.assertIsNone(self.full_ac_submission.result)
+        self.assertFalse(self.full_ac_submission.test_cases.exists())
+        self.locked_submission.refresh_from_db()
+        self.assertEqual(self.locked_submission.status, 'D')
+        # The queued submission has no source, so it cannot be judged.
+        self.queued_submission.refresh_from_db()
+        self.assertEqual((self.queued_submission.status, self.queued_submission.result), ('IE', 'IE'))
+
+    def test_judge_submissions_priority(self):
+        SubmissionSource.objects.create(submission=self.queued_submission, source='')
+        packets = []
+
+        def judge_request(packet, reply=True):
+            packets.append(packet)
+            return {
+                'name': 'submission-batch-received',
+                'submission-ids': [request['submission-id'] for request in packet['submissions']],
+            }
+
+        with mock.patch('judge.judgeapi.judge_request', judge_request):
+            self.assertEqual(judge_submissions(Submission.objects.filter(id=self.queued_submission.id)), 1)
+        self.assertEqual(packets[0]['submissions'][0]['priority'], CONTEST_SUBMISSION_PRIORITY)
+
     def test_basic_submission_methods(self):
         data = {
             'superuser': {
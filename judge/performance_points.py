@@ -32,15 +32,15 @@ def get_pp_breakdown(user, start=0, end=settings.DMOJ_PP_ENTRIES):
                 SELECT judge_problem.id problem_id,
                        judge_problem.name problem_name,
                        judge_problem.code problem_code,
-                       MAX(judge_submission.points) AS max_points
-                FROM judge_problem
-                INNER JOIN judge_submission ON (judge_problem.id = judge_submission.problem_id)
+                       judge_problemuserstats.points AS max_points
+                FROM judge_problemuserstats
+                INNER JOIN judge_problem ON (judge_problem.id = judge_problemuserstats.problem_id)
                 WHERE (judge_problem.is_public AND
                        NOT judge_problem.is_organization_private AND
-                       judge_submission.points IS NOT NULL AND
-                       judge_submission.user_id = %s)
-                GROUP BY judge_problem.id
-                HAVING MAX(judge_submission.points) > 0.0
+                       judge_problemuserstats.user_id = %s AND
+                       judge_problemuserstats.points > 0.0)
+                ORDER BY judge_problemuserstats.points DESC, judge_problemuserstats.problem_id
+                LIMIT %s OFFSET %s
             ) AS max_points_table
             {join_type} judge_submission ON (
                 judge_submission.problem_id = max_points_table.problem_id AND
@@ -50,8 +50,7 @@ def get_pp_breakdown(user, start=0, end=settings.DMOJ_PP_ENTRIES):
             {join_type} judge_language ON (judge_submission.language_id = judge_language.id)
             GROUP BY max_points_table.problem_id
             ORDER BY max_points DESC, judge_submission.date DESC
-            LIMIT %s OFFSET %s
-        """, (user.id, user.id, end - start + 1, start))
+        """, (user.id, end - start + 1, start, user.id))
         data = cursor.fetchall()
 
     breakdown = []
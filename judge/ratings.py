@@ -1,10 +1,11 @@
-from bisect import bisect
+from bisect import bisect, bisect_left, insort
+from collections import defaultdict
 from math import pi, sqrt, tanh
 from operator import attrgetter, itemgetter
 
+import numpy as np
 from django.db import transaction
-from django.db.models import Count, OuterRef, Subquery
-from django.db.models.functions import Coalesce
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.utils import timezone
 
 
@@ -76,7 +77,7 @@ def get_var(times_ranked, cache=[VAR_INIT]):
     return cache[times_ranked]
 
 
-def recalculate_ratings(ranking, old_mean, times_ranked, historical_p):
+def recalculate_ratings_python(ranking, old_mean, times_ranked, historical_p):
     n = len(ranking)
     new_p = [0.] * n
     new_mean = [0.] * n
@@ -139,40 +140,186 @@ def recalculate_ratings(ranking, old_mean, times_ranked, historical_p):
     return new_rating, new_mean, new_p
 
 
-def rate_contest(contest):
-    from judge.models import Rating, Profile
+def solve_numpy(eval_tanhs, y_tg, lin_factor=0, bounds=VALID_RANGE):
+    """Runs `solve` for every row at once. `eval_tanhs(x)` returns the sum of the tanh terms of each row i at x[i]."""
+    n = len(y_tg)
+    L, R = np.full(n, bounds[0]), np.full(n, bounds[1])
+    Ly, Ry = np.full(n, np.nan), np.full(n, np.nan)
+    exact = np.full(n, np.nan)
+    # Every row starts with the same bounds, so they all take the same number of steps.
+    while R[0] - L[0] > 2:
+        x = (L + R) / 2
+        y = lin_factor * x + eval_tanhs(x)
+        above, below = y > y_tg, y < y_tg
+        R, Ry = np.where(above, x, R), np.where(above, y, Ry)
+        L, Ly = np.where(below, x, L), np.where(below, y, Ly)
+        exact = np.where(~above & ~below & np.isnan(exact), x, exact)
+    # Use linear interpolation to be slightly more accurate.
+    if np.isnan(Ly).any():
+        Ly = np.where(np.isnan(Ly), lin_factor * L + eval_tanhs(L), Ly)
+    if np.isnan(Ry).any():
+        Ry = np.where(np.isnan(Ry), lin_factor * R + eval_tanhs(R), Ry)
+    inside = (y_tg > Ly) & (y_tg < Ry)
+    ratio = np.where(inside, y_tg - Ly, 0) / np.where(inside, Ry - Ly, 1)
+    x = np.where(y_tg <= Ly, L, np.where(y_tg >= Ry, R, L * (1 - ratio) + R * ratio))
+    return np.where(np.isnan(exact), x, exact)
+
+
+def recalculate_ratings_numpy(ranking, old_mean, times_ranked, historical_p, block_size=1024):
+    """Computes the same ratings as `recalculate_ratings_python`, with every participant solved at once.
+
+    The performances are solved over the full valid range instead of the bounds found by divide and conquer, so they
+    can differ from the pure Python results by a small fraction of a rating point.
+    """
+    n = len(ranking)
+    if n < 2:
+        new_mean = list(old_mean)
+        new_p = list(old_mean)
+    else:
+        ranking = np.asarray(ranking, dtype=float)
+        old_mean = np.asarray(old_mean, dtype=float)
+        times = np.asarray(times_ranked, dtype=int)
+        var = np.array([get_var(t) for t in range(times.max() + 2)])
+
+        # Note: pre-multiply delta by TANH_C to improve efficiency.
+        delta = TANH_C * np.sqrt(var[times] + VAR_PER_CONTEST + BETA2)
+        inv_delta = 1. / delta
+
+        # Each participant gains 1 / delta for everyone ranked below, and loses it for everyone ranked above.
+        order = np.argsort(ranking, kind='stable')
+        sorted_ranking = ranking[order]
+        prefix = np.concatenate(([0.], np.cumsum(inv_delta[order])))
+        beaten_by = prefix[np.searchsorted(sorted_ranking, ranking, side='left')]
+        beats = prefix[-1] - prefix[np.searchsorted(sorted_ranking, ranking, side='right')]
+        p_tg = beats - beaten_by
+
+        def eval_p_tanhs(x):
+            y = np.empty(n)
+            # The terms are shared by everyone, so they are evaluated in blocks to bound the memory used.
+            for start in range(0, n, block_size):
+                block = x[start:start + block_size, None]
+                y[start:start + block_size] = np.tanh((block - old_mean) / (2 * delta)) @ inv_delta
+            return y
+
+        new_p = solve_numpy(eval_p_tanhs, p_tg)
+
+        # The terms of row i are the new performance of participant i, followed by their past performances.
+        m = 1 + max(map(len, historical_p))
+        h = np.zeros((n, m))
+        h[:, 0] = new_p
+        present = np.zeros((n, m), dtype=bool)
+        present[:, 0] = True
+        for i, past in enumerate(historical_p):
+            h[i, 1:1 + len(past)] = past
+            present[i, 1:1 + len(past)] = True
+
+        j = np.arange(m)
+        h_var = var[np.clip(times[:, None] + 1 - j, 0, None)]
+        k = np.where(j > 0, h_var / (h_var + VAR_PER_CONTEST), 1.)
+        w = np.where(present, np.cumprod(k ** 2, axis=1), 0.)
+        w0 = 1. / var[times + 1] - w.sum(axis=1) / BETA2
+
+        sd = sqrt(BETA2) * TANH_C
+
+        def eval_mean_tanhs(x, w=w):
+            return ((w / sd) * np.tanh((x[:, None] - h) / (2 * sd))).sum(axis=1)
+
+        w_past = w.copy()
+        w_past[:, 0] = 0
+        p0 = eval_mean_tanhs(old_mean, w_past) / w0 + old_mean
+        new_mean = solve_numpy(eval_mean_tanhs, w0 * p0, lin_factor=w0).tolist()
+        new_p = new_p.tolist()
+
+    # Display a slightly lower rating to incentivize participation.
+    new_rating = [max(1, round(m - (sqrt(get_var(t + 1)) - SD_LIM))) for m, t in zip(new_mean, times_ranked)]
+
+    return new_rating, new_mean, new_p
+
+
+recalculate_ratings = recalculate_ratings_numpy
+
+
+RERATE_TOLERANCE = 0.01
+
+
+def later_contests(contest, prefix=''):
+    """Returns a Q matching the contests rated after `contest`."""
+    return Q(**{prefix + 'end_time__gt': contest.end_time}) | \
+        Q(**{prefix + 'end_time': contest.end_time, prefix + 'id__gt': contest.id})
+
+
+class RatingStore(object):
+    """The ratings of users, kept in memory while rating contests one after another.
+
+    All the ratings are loaded once. A contest is rated from each user's ratings before it, which holds even when
+    later contests are already rated, and its new ratings replace the old ones in the store.
+    """
+
+    def __init__(self, user_ids=None):
+        from judge.models import Rating
+
+        self.users = defaultdict(list)  # user_id: [((end_time, contest_id), rating, mean, performance)]
+        self.contests = defaultdict(dict)  # contest_id: {user_id: (rating, mean, performance)}
+
+        ratings = Rating.objects.order_by('contest__end_time', 'contest_id')
+        if user_ids is not None:
+            ratings = ratings.filter(user_id__in=user_ids)
+        for user_id, contest_id, end_time, rating, mean, performance in ratings.values_list(
+                'user_id', 'contest_id', 'contest__end_time', 'rating', 'mean', 'performance').iterator():
+            self.users[user_id].append(((end_time, contest_id), rating, mean, performance))
+            self.contests[contest_id][user_id] = (rating, mean, performance)
+
+    @staticmethod
+    def contest_key(contest):
+        # Contests are rated by end time, then by ID.
+        return contest.end_time, contest.id
+
+    def history(self, user_id, contest):
+        """Returns the ratings of a user before a contest, oldest first."""
+        history = self.users.get(user_id, [])
+        return history[:bisect_left(history, (self.contest_key(contest),))]
+
+    def contest_ratings(self, contest):
+        return self.contests.get(contest.id, {})
+
+    def set_contest_ratings(self, contest, ratings):
+        """Replaces the ratings of a contest with `ratings`, as {user_id: (rating, mean, performance)}."""
+        key = self.contest_key(contest)
+        for user_id in self.contests.pop(contest.id, {}):
+            history = self.users[user_id]
+            del history[bisect_left(history, (key,))]
+        for user_id, result in ratings.items():
+            insort(self.users[user_id], (key, *result))
+        self.contests[contest.id] = ratings
+
+
+def rate_contest(contest, store=None):
+    from judge.models import Rating
 
-    rating_subquery = Rating.objects.filter(user=OuterRef('user'))
-    rating_sorted = rating_subquery.order_by('-contest__end_time')
     users = contest.users.order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker') \
-        .annotate(submissions=Count('submission'),
-                  last_rating=Coalesce(Subquery(rating_sorted.values('rating')[:1]), RATING_INIT),
-                  last_mean=Coalesce(Subquery(rating_sorted.values('mean')[:1]), MEAN_INIT),
-                  times=Coalesce(Subquery(rating_subquery.order_by().values('user_id')
-                                          .annotate(count=Count('id')).values('count')), 0)) \
+        .annotate(submissions=Count('submission')) \
         .exclude(user_id__in=contest.rate_exclude.all()) \
-        .filter(virtual=0).values('id', 'user_id', 'score', 'cumtime', 'tiebreaker', 'last_mean', 'times')
+        .filter(virtual=0).values('id', 'user_id', 'score', 'cumtime', 'tiebreaker')
     if not contest.rate_all:
         users = users.filter(submissions__gt=0)
+    users = list(users)
+
+    if store is None:
+        store = RatingStore(user_ids=list(map(itemgetter('user_id'), users)))
+    for user in users:
+        user['history'] = history = store.history(user['user_id'], contest)
+        user['last_rating'] = history[-1][1] if history else RATING_INIT
     if contest.rating_floor is not None:
-        users = users.exclude(last_rating__lt=contest.rating_floor)
+        users = [user for user in users if user['last_rating'] >= contest.rating_floor]
     if contest.rating_ceiling is not None:
-        users = users.exclude(last_rating__gt=contest.rating_ceiling)
+        users = [user for user in users if user['last_rating'] <= contest.rating_ceiling]
 
-    users = list(users)
     participation_ids = list(map(itemgetter('id'), users))
     user_ids = list(map(itemgetter('user_id'), users))
     ranking = list(tie_ranker(users, key=itemgetter('score', 'cumtime', 'tiebreaker')))
-    old_mean = list(map(itemgetter('last_mean'), users))
-    times_ranked = list(map(itemgetter('times'), users))
-    historical_p = [[] for _ in users]
-
-    user_id_to_idx = {uid: i for i, uid in enumerate(user_ids)}
-    for h in Rating.objects.filter(user_id__in=user_ids) \
-            .order_by('-contest__end_time') \
-            .values('user_id', 'performance'):
-        idx = user_id_to_idx[h['user_id']]
-        historical_p[idx].append(h['performance'])
+    old_mean = [user['history'][-1][2] if user['history'] else MEAN_INIT for user in users]
+    times_ranked = [len(user['history']) for user in users]
+    historical_p = [[performance for *_, performance in reversed(user['history'])] for user in users]
 
     rating, mean, performance = recalculate_ratings(ranking, old_mean, times_ranked, historical_p)
 
@@ -182,10 +329,44 @@ def rate_contest(contest):
                for i, pid, r, m, perf, z in zip(user_ids, participation_ids, rating, mean, performance, ranking)]
     with transaction.atomic():
         Rating.objects.bulk_create(ratings)
+        update_participant_ratings(contest)
+    store.set_contest_ratings(contest, {i: (r, m, perf) for i, r, m, perf in zip(user_ids, rating, mean, performance)})
+
+
+def update_participant_ratings(contest):
+    """Sets the rating of each participant of a contest to their latest rating."""
+    from judge.models import Rating, Profile
 
-        Profile.objects.filter(contest_history__contest=contest, contest_history__virtual=0).update(
-            rating=Subquery(Rating.objects.filter(user=OuterRef('id'))
-                            .order_by('-contest__end_time').values('rating')[:1]))
+    Profile.objects.filter(contest_history__contest=contest, contest_history__virtual=0).update(
+        rating=Subquery(Rating.objects.filter(user=OuterRef('id'))
+                        .order_by('-contest__end_time', '-contest_id').values('rating')[:1]))
+
+
+def rerate_contest(contest, tolerance=RERATE_TOLERANCE, store=None):
+    """Deletes the ratings of a contest and rates it again, if it is still rated.
+
+    Returns the IDs of the users whose rating, mean or performance in the contest changed by more than `tolerance`,
+    or who were rated only before or only after.
+    """
+    if store is None:
+        store = RatingStore(user_ids=contest.users.filter(virtual=0).values('user_id'))
+    old = store.contest_ratings(contest)
+    with transaction.atomic():
+        contest.ratings.all().delete()
+        if contest.is_rated:
+            rate_contest(contest, store)
+        else:
+            update_participant_ratings(contest)
+            store.set_contest_ratings(contest, {})
+    new = store.contest_ratings(contest)
+
+    changed = old.keys() ^ new.keys()
+    for user_id in old.keys() & new.keys():
+        (old_rating, old_mean, old_performance), (rating, mean, performance) = old[user_id], new[user_id]
+        if old_rating != rating or abs(old_mean - mean) > tolerance or \
+                abs(old_performance - performance) > tolerance:
+            changed.add(user_id)
+    return changed
 
 
 RATING_LEVELS = ['Newbie', 'Pupil', 'Specialist', 'Expert', 'Candidate Master', 'Master', 'International Master',
@@ -1,5 +1,6 @@
 import errno
 import os
+from functools import partial
 from typing import Optional
 
 from django.conf import settings
@@ -7,15 +8,18 @@ from django.contrib.flatpages.models import FlatPage
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
 from django.db import transaction
+from django.db.models import F
 from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from registration.models import RegistrationProfile
 from registration.signals import user_registered
 
-from judge.caching import finished_submission
-from judge.models import BlogPost, Comment, Contest, ContestAnnouncement, ContestSubmission, EFFECTIVE_MATH_ENGINES, \
-    Judge, Language, License, MiscConfig, Organization, Problem, Profile, Submission, WebAuthnCredential
+from judge.caching import bump_fragment_versions, finished_submission
+from judge.models import BlogPost, Comment, Contest, ContestAnnouncement, ContestParticipation, ContestSubmission, \
+    EFFECTIVE_MATH_ENGINES, Judge, Language, License, MiscConfig, Organization, Problem, ProblemUserStats, Profile, \
+    Submission, WebAuthnCredential
 from judge.tasks import on_new_comment
+from judge.utils.scoreboard import ContestScoreboard
 from judge.views.register import RegistrationView
 
 
@@ -55,9 +59,17 @@ def problem_update(sender, instance, **kwargs):
         if cached_pdf_filename is not None:
             unlink_if_exists(cached_pdf_filename)
 
+    bump_fragment_versions('home_problems')
+
+
+@receiver(post_delete, sender=Problem)
+def problem_delete(sender, instance, **kwargs):
+    bump_fragment_versions('home_problems')
+
 
 @receiver(post_save, sender=Profile)
 def profile_update(sender, instance, **kwargs):
+    bump_fragment_versions('home_top_users')
     if hasattr(instance, '_updating_stats_only'):
         return
 
@@ -81,6 +93,19 @@ def contest_update(sender, instance, **kwargs):
     cache.delete_many(['generated-meta-contest:%d' % instance.id] +
                       [make_template_fragment_key('contest_html', (instance.id, engine))
                        for engine in EFFECTIVE_MATH_ENGINES])
+    ContestScoreboard.invalidate(instance)
+    bump_fragment_versions('home_contests')
+
+
+@receiver(post_delete, sender=Contest)
+def contest_delete(sender, instance, **kwargs):
+    bump_fragment_versions('home_contests')
+
+
+@receiver(post_save, sender=ContestParticipation)
+@receiver(post_delete, sender=ContestParticipation)
+def contest_participation_update(sender, instance, **kwargs):
+    transaction.on_commit(partial(ContestScoreboard.update_participation, instance.contest, instance.id))
 
 
 @receiver(post_save, sender=License)
@@ -102,11 +127,17 @@ def judge_update(sender, instance, **kwargs):
 @receiver(post_save, sender=Comment)
 def comment_update(sender, instance, created, **kwargs):
     cache.delete('comment_feed:%d' % instance.id)
+    bump_fragment_versions('home_comments')
     if not created:
         return
     on_new_comment.delay(instance.id)
 
 
+@receiver(post_delete, sender=Comment)
+def comment_delete(sender, instance, **kwargs):
+    bump_fragment_versions('home_comments')
+
+
 @receiver(post_save, sender=BlogPost)
 def post_update(sender, instance, **kwargs):
     cache.delete_many([
@@ -121,14 +152,21 @@ def post_update(sender, instance, **kwargs):
 @receiver(post_delete, sender=Submission)
 def submission_delete(sender, instance, **kwargs):
     finished_submission(instance)
+    ProblemUserStats.refresh(instance.problem_id, instance.user_id)
     instance.user._updating_stats_only = True
     instance.user.calculate_points()
-    instance.problem._updating_stats_only = True
-    instance.problem.update_stats()
+
+
+@receiver(post_save, sender=Submission)
+def submission_create(sender, instance, created, **kwargs):
+    if created:
+        ProblemUserStats.refresh(instance.problem_id, instance.user_id)
 
 
 @receiver(post_delete, sender=ContestSubmission)
 def contest_submission_delete(sender, instance, **kwargs):
+    ContestParticipation.objects.filter(id=instance.participation_id, submission_count__gt=0) \
+                                .update(submission_count=F('submission_count') - 1)
     participation = instance.participation
     participation.recompute_results()
     Submission.objects.filter(id=instance.submission_id).update(contest_object=None)
@@ -159,7 +197,10 @@ def misc_config_delete(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=ContestSubmission)
-def contest_submission_update(sender, instance, **kwargs):
+def contest_submission_update(sender, instance, created, **kwargs):
+    if created:
+        ContestParticipation.objects.filter(id=instance.participation_id) \
+                                    .update(submission_count=F('submission_count') + 1)
     Submission.objects.filter(id=instance.submission_id).update(contest_object_id=instance.participation.contest_id)
 
 
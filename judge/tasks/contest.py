@@ -3,36 +3,93 @@ import json
 import os
 import re
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from celery import shared_task
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import default_storage
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from moss import MOSS
 
-from judge.models import Contest, ContestMoss, ContestParticipation, ContestSubmission, Problem, Submission
+from judge.models import Contest, ContestMoss, ContestParticipation, ContestSubmission, Problem, Submission, \
+    SubmissionSource
+from judge.ratings import RatingStore, later_contests, rerate_contest
 from judge.utils.celery import Progress
+from judge.utils.iterator import chunk
+from judge.utils.scoreboard import ContestScoreboard
 
-__all__ = ('rescore_contest', 'run_moss', 'prepare_contest_data')
+__all__ = ('rescore_contest', 'rerate_contests', 'run_moss', 'prepare_contest_data')
 rewildcard = re.compile(r'\*+')
 
+RERATE_CHECKPOINT_TIMEOUT = 86400
+EXPORT_CHUNK_SIZE = 500
+
 
 @shared_task(bind=True)
 def rescore_contest(self, contest_key):
     contest = Contest.objects.get(key=contest_key)
-    participations = contest.users
-
-    rescored = 0
-    with Progress(self, participations.count(), stage=_('Recalculating contest scores')) as p:
-        for participation in participations.iterator():
-            participation.recompute_results()
-            rescored += 1
-            if rescored % 10 == 0:
-                p.done = rescored
+
+    with Progress(self, contest.users.count(), stage=_('Recalculating contest scores')) as p:
+        rescored = contest.format.bulk_update_participations(progress=p)
+
+    # The participations are saved in bulk, without their post_save signals.
+    ContestScoreboard.invalidate(contest)
     return rescored
 
 
+@shared_task(bind=True)
+def rerate_contests(self, contest_id):
+    """Rates a contest again, then the later rated contests whose participants' ratings changed as a result.
+
+    Propagation stops once no changed rating is left to carry over. The task saves its position after each contest,
+    so a redelivery of the same task after an interruption resumes where it stopped. The position is kept per task,
+    so that a new trigger for the same contest always starts over.
+    """
+    contest = Contest.objects.get(id=contest_id)
+    checkpoint_key = 'rerate_contests:%d:%s' % (contest.id, self.request.id)
+    checkpoint = cache.get(checkpoint_key)
+    store = RatingStore()
+
+    if checkpoint is None:
+        changed = rerate_contest(contest, store=store)
+        ContestScoreboard.invalidate(contest)
+        later = list(Contest.objects.filter(later_contests(contest), is_rated=True, end_time__lte=timezone.now())
+                     .order_by('end_time', 'id').values_list('id', flat=True))
+        checkpoint = {'changed': changed, 'later': later}
+        cache.set(checkpoint_key, checkpoint, RERATE_CHECKPOINT_TIMEOUT)
+
+    changed, later = checkpoint['changed'], checkpoint['later']
+    rerated = 0
+    with Progress(self, len(later), stage=_('Recalculating ratings')) as p:
+        while later and changed:
+            contest = Contest.objects.get(id=later[0])
+            participants = set(contest.users.filter(virtual=ContestParticipation.LIVE)
+                               .values_list('user_id', flat=True))
+            if participants & changed:
+                contest_changed = rerate_contest(contest, store=store)
+                ContestScoreboard.invalidate(contest)
+                rated = store.contest_ratings(contest).keys()
+                changed = (changed - rated) | contest_changed
+                rerated += 1
+
+            later = later[1:]
+            cache.set(checkpoint_key, {'changed': changed, 'later': later}, RERATE_CHECKPOINT_TIMEOUT)
+            p.did(1)
+
+    cache.delete(checkpoint_key)
+    return rerated
+
+
+def process_moss(moss_api_key, moss_lang, comment, sources):
+    moss_call = MOSS(moss_api_key, language=moss_lang, matching_file_limit=100, comment=comment)
+    for username, source in sources.items():
+        moss_call.add_file_from_memory(username, source.encode('utf-8'))
+    return moss_call.process()
+
+
 @shared_task(bind=True)
 def run_moss(self, contest_key):
     moss_api_key = settings.MOSS_API_KEY
@@ -43,37 +100,43 @@ def run_moss(self, contest_key):
     ContestMoss.objects.filter(contest=contest).delete()
 
     length = len(ContestMoss.LANG_MAPPING) * contest.problems.count()
+    languages = [dmoj_lang for dmoj_lang, moss_lang in ContestMoss.LANG_MAPPING]
+    concurrency = max(settings.MOSS_CONCURRENCY, 1)
     moss_results = []
+    running = {}  # future: result
+
+    with Progress(self, length, stage=_('Running MOSS')) as p, ThreadPoolExecutor(concurrency) as executor:
+        def wait_for_moss():
+            for future in wait(running, return_when=FIRST_COMPLETED).done:
+                running.pop(future).url = future.result()
+                p.did(1)
 
-    with Progress(self, length, stage=_('Running MOSS')) as p:
         for problem in contest.problems.all():
+            # The best submission of each user in each language.
+            sources = {dmoj_lang: {} for dmoj_lang in languages}
+            for dmoj_lang, username, source in Submission.objects.filter(
+                contest__participation__virtual__in=(ContestParticipation.LIVE, ContestParticipation.SPECTATE),
+                contest_object=contest,
+                problem=problem,
+                language__common_name__in=languages,
+            ).order_by('-points').values_list('language__common_name', 'user__user__username', 'source__source'):
+                sources[dmoj_lang].setdefault(username, source)
+
             for dmoj_lang, moss_lang in ContestMoss.LANG_MAPPING:
                 result = ContestMoss(contest=contest, problem=problem, language=dmoj_lang)
+                moss_results.append(result)
+                if not sources[dmoj_lang]:
+                    p.did(1)
+                    continue
 
-                subs = Submission.objects.filter(
-                    contest__participation__virtual__in=(ContestParticipation.LIVE, ContestParticipation.SPECTATE),
-                    contest_object=contest,
-                    problem=problem,
-                    language__common_name=dmoj_lang,
-                ).order_by('-points').values_list('user__user__username', 'source__source')
-
-                if subs.exists():
-                    moss_call = MOSS(moss_api_key, language=moss_lang, matching_file_limit=100,
-                                     comment='%s - %s' % (contest.key, problem.code))
-
-                    users = set()
-
-                    for username, source in subs:
-                        if username in users:
-                            continue
-                        users.add(username)
-                        moss_call.add_file_from_memory(username, source.encode('utf-8'))
+                result.submission_count = len(sources[dmoj_lang])
+                while len(running) >= concurrency:
+                    wait_for_moss()
+                running[executor.submit(process_moss, moss_api_key, moss_lang,
+                                        '%s - %s' % (contest.key, problem.code), sources[dmoj_lang])] = result
 
-                    result.url = moss_call.process()
-                    result.submission_count = len(users)
-
-                moss_results.append(result)
-                p.did(1)
+        while running:
+            wait_for_moss()
 
     ContestMoss.objects.bulk_create(moss_results)
 
@@ -90,12 +153,9 @@ def prepare_contest_data(self, contest_id, options):
         contest = Contest.objects.get(id=contest_id)
         queryset = ContestSubmission.objects.filter(participation__contest=contest, participation__virtual=0) \
                                     .order_by('-points', 'id') \
-                                    .select_related('problem__problem', 'submission__user__user',
-                                                    'submission__source', 'submission__language') \
                                     .values_list('submission__user__user__id', 'submission__user__user__username',
-                                                 'problem__problem__code', 'submission__source__source',
-                                                 'submission__language__extension', 'submission__id',
-                                                 'submission__language__file_only')
+                                                 'problem__problem__code', 'submission__language__extension',
+                                                 'submission__id', 'submission__language__file_only')
 
         if options['submission_results']:
             queryset = queryset.filter(result__in=options['submission_results'])
@@ -108,34 +168,36 @@ def prepare_contest_data(self, contest_id, options):
                 problem__problem__in=Problem.objects.filter(code__regex=fnmatch.translate(problem_glob)),
             )
 
-        submissions = list(queryset)
+        length = queryset.count()
         p.did(1)
 
-    length = len(submissions)
-    with Progress(self, length, stage=_('Preparing contest data')) as p:
-        data_file = zipfile.ZipFile(os.path.join(settings.DMOJ_CONTEST_DATA_CACHE, '%s.zip' % contest_id), mode='w')
+    data_path = os.path.join(settings.DMOJ_CONTEST_DATA_CACHE, '%s.zip' % contest_id)
+    with Progress(self, length, stage=_('Preparing contest data')) as p, \
+            zipfile.ZipFile(data_path, mode='w') as data_file:
         exported = set()
-        for user_id, username, problem, source, ext, sub_id, file_only in submissions:
-            if (user_id, problem) in exported:
-                path = os.path.join(username, '$History', f'{problem}_{sub_id}.{ext}')
-            else:
-                path = os.path.join(username, f'{problem}.{ext}')
-                exported.add((user_id, problem))
-
-            if file_only:
-                # Get the basename of the source as it is an URL
-                filename = os.path.basename(source)
-                data_file.write(
-                    default_storage.path(os.path.join(settings.SUBMISSION_FILE_UPLOAD_MEDIA_DIR,
-                                         problem, str(user_id), filename)),
-                    path,
-                )
-                pass
-            else:
-                data_file.writestr(path, source)
-
-            p.did(1)
-
-        data_file.close()
+        # The sources are only fetched for one chunk of submissions at a time, to keep memory use bounded.
+        for submissions in chunk(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+            sources = dict(SubmissionSource.objects.filter(submission_id__in=[sub[4] for sub in submissions])
+                           .values_list('submission_id', 'source'))
+            for user_id, username, problem, ext, sub_id, file_only in submissions:
+                source = sources.pop(sub_id, '')
+                if (user_id, problem) in exported:
+                    path = os.path.join(username, '$History', f'{problem}_{sub_id}.{ext}')
+                else:
+                    path = os.path.join(username, f'{problem}.{ext}')
+                    exported.add((user_id, problem))
+
+                if file_only:
+                    # Get the basename of the source as it is an URL
+                    filename = os.path.basename(source)
+                    data_file.write(
+                        default_storage.path(os.path.join(settings.SUBMISSION_FILE_UPLOAD_MEDIA_DIR,
+                                             problem, str(user_id), filename)),
+                        path,
+                    )
+                else:
+                    data_file.writestr(path, source)
+
+            p.did(len(submissions))
 
     return length
@@ -5,11 +5,15 @@ from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from judge.models import Problem, Profile, Submission
+from judge.judgeapi import JUDGE_BATCH_CHUNK_SIZE, judge_submissions
+from judge.models import ContestParticipation, ContestSubmission, Problem, Profile, Submission
 from judge.utils.celery import Progress
+from judge.utils.iterator import chunk
 
 __all__ = ('apply_submission_filter', 'rejudge_problem_filter', 'rescore_problem')
 
+RESCORE_CHUNK_SIZE = 1000
+
 
 def apply_submission_filter(queryset, id_range, languages, results):
     if id_range:
@@ -32,11 +36,11 @@ def rejudge_problem_filter(self, problem_id, id_range=None, languages=None, resu
 
     rejudged = 0
     with Progress(self, queryset.count()) as p:
-        for submission in queryset.iterator():
-            submission.judge(rejudge=True, batch_rejudge=True, rejudge_user=user)
-            rejudged += 1
-            if rejudged % 10 == 0:
-                p.done = rejudged
+        for ids in chunk(queryset.order_by('id').values_list('id', flat=True).iterator(), JUDGE_BATCH_CHUNK_SIZE):
+            judge_submissions(Submission.objects.filter(id__in=ids), rejudge=True, batch_rejudge=True,
+                              rejudge_user=user)
+            rejudged += len(ids)
+            p.done = rejudged
     return rejudged
 
 
@@ -52,26 +56,52 @@ def rescore_problem(self, problem_id, publicy_changed=False):
 
     with Progress(self, submissions.count(), stage=_('Modifying submissions')) as p:
         rescored = 0
-        for submission in submissions.iterator():
-            submission.points = round(submission.case_points / submission.case_total
-                                      if submission.case_total else 0, 3) * problem.points
-            if not problem.partial and submission.points < problem.points:
-                submission.points = 0
-            submission.save(update_fields=['points'])
-            submission.update_contest()
-            rescored += 1
-            if rescored % 10 == 0:
-                p.done = rescored
+        rows = submissions.order_by('id').values_list('id', 'case_points', 'case_total', 'points')
+        for chunk_rows in chunk(rows.iterator(chunk_size=RESCORE_CHUNK_SIZE), RESCORE_CHUNK_SIZE):
+            changed = []
+            for id, case_points, case_total, old_points in chunk_rows:
+                points = round(case_points / case_total if case_total else 0, 3) * problem.points
+                if not problem.partial and points < problem.points:
+                    points = 0
+                if points != old_points:
+                    changed.append(Submission(id=id, points=points))
+            Submission.objects.bulk_update(changed, ['points'])
+            rescored += len(chunk_rows)
+            p.done = rescored
+
+    contest_submissions = ContestSubmission.objects.filter(submission__problem_id=problem_id)
+    with Progress(self, contest_submissions.count(), stage=_('Recalculating contest results')) as p:
+        participations = set()
+        rows = contest_submissions.order_by('id').values_list(
+            'id', 'submission__case_points', 'submission__case_total', 'points', 'problem__points',
+            'problem__partial', 'participation_id',
+        )
+        for chunk_rows in chunk(rows.iterator(chunk_size=RESCORE_CHUNK_SIZE), RESCORE_CHUNK_SIZE):
+            changed = []
+            for id, case_points, case_total, old_points, problem_points, partial, participation_id in chunk_rows:
+                # Same as Submission.update_contest.
+                points = round(case_points / case_total * problem_points if case_total > 0 else 0, 3)
+                if not (partial and problem.partial) and points != problem_points:
+                    points = 0
+                if points != old_points:
+                    changed.append(ContestSubmission(id=id, points=points))
+                    participations.add(participation_id)
+            ContestSubmission.objects.bulk_update(changed, ['points'])
+            p.did(len(chunk_rows))
+
+        # Each affected participation is recomputed once, however many of its submissions changed.
+        p.total += len(participations)
+        for participation in ContestParticipation.objects.filter(id__in=participations).iterator():
+            participation.recompute_results()
+            p.did(1)
+
+    # Changing the points of a problem changes the best points of its users, and which submissions count as accepted.
+    problem._updating_stats_only = True
+    problem.update_stats()
 
-    with Progress(self, submissions.values('user_id').distinct().count(), stage=_('Recalculating user points')) as p:
-        users = 0
-        profiles = Profile.objects.filter(id__in=submissions.values_list('user_id', flat=True).distinct())
-        for profile in profiles.iterator():
-            profile._updating_stats_only = True
-            profile.calculate_points()
-            cache.delete('user_complete:%d' % profile.id)
-            cache.delete('user_attempted:%d' % profile.id)
-            users += 1
-            if users % 10 == 0:
-                p.done = users
+    user_ids = list(submissions.order_by().values_list('user_id', flat=True).distinct())
+    with Progress(self, len(user_ids), stage=_('Recalculating user points')) as p:
+        Profile.calculate_points_bulk(user_ids, progress=p)
+        cache.delete_many(['user_complete:%d' % id for id in user_ids] +
+                          ['user_attempted:%d' % id for id in user_ids])
     return rescored
@@ -2,24 +2,29 @@ import fnmatch
 import json
 import os
 import re
+import shutil
+import tempfile
 import zipfile
 
 from celery import shared_task
 from django.conf import settings
 from django.utils.translation import gettext as _
 
-from judge.models import Comment, Problem, Submission
+from judge.models import Comment, Problem, Submission, SubmissionSource
 from judge.utils.celery import Progress
+from judge.utils.iterator import chunk
 from judge.utils.raw_sql import use_straight_join
 from judge.utils.unicode import utf8bytes
 
 __all__ = ('prepare_user_data',)
 rewildcard = re.compile(r'\*+')
 
+EXPORT_CHUNK_SIZE = 500
+
 
 def apply_submission_filter(queryset, options):
     if not options['submission_download']:
-        return []
+        return queryset.none()
 
     use_straight_join(queryset)
 
@@ -34,13 +39,35 @@ def apply_submission_filter(queryset, options):
             problem__in=Problem.objects.filter(code__regex=fnmatch.translate(problem_glob)),
         )
 
-    return list(queryset)
+    return queryset
 
 
 def apply_comment_filter(queryset, options):
     if not options['comment_download']:
-        return []
-    return list(queryset)
+        return queryset.none()
+    return queryset
+
+
+class JSONObjectSpool(object):
+    """Builds a JSON object one item at a time in a temporary file, instead of holding all of it in memory."""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.file.write(b'{')
+        self.empty = True
+
+    def add(self, key, value):
+        self.file.write(b'\n' if self.empty else b',\n')
+        # Strip the braces around the single item, keeping its indentation.
+        self.file.write(utf8bytes(json.dumps({str(key): value}, sort_keys=True, indent=4)[2:-2]))
+        self.empty = False
+
+    def write_to(self, data_file, name):
+        self.file.write(b'}' if self.empty else b'\n}')
+        self.file.seek(0)
+        with data_file.open(name, 'w') as f:
+            shutil.copyfileobj(self.file, f)
+        self.file.close()
 
 
 @shared_task(bind=True)
@@ -50,72 +77,71 @@ def prepare_user_data(self, profile_id, options):
         # Force an update so that we get a progress bar.
         p.done = 0
         submissions = apply_submission_filter(
-            Submission.objects.select_related('problem', 'language', 'source').filter(user_id=profile_id),
+            Submission.objects.select_related('problem', 'language').filter(user_id=profile_id).order_by('id'),
             options,
         )
+        submission_count = submissions.count()
         p.did(1)
-        comments = apply_comment_filter(Comment.objects.filter(author_id=profile_id), options)
+        comments = apply_comment_filter(Comment.objects.filter(author_id=profile_id).order_by('id'), options)
+        comment_count = comments.count()
         p.did(1)
 
+    # Sources and comment bodies are only fetched for one chunk at a time, to keep memory use bounded.
     with zipfile.ZipFile(os.path.join(settings.DMOJ_USER_DATA_CACHE, '%s.zip' % profile_id), mode='w') as data_file:
-        submission_count = len(submissions)
         if submission_count:
-            submission_info = {}
+            submission_info = JSONObjectSpool()
             with Progress(self, submission_count, stage=_('Preparing your submission data')) as p:
-                prepared = 0
-                interval = max(submission_count // 10, 1)
-                for submission in submissions:
-                    submission_info[submission.id] = {
-                        'problem': submission.problem.code,
-                        'date': submission.date.isoformat(),
-                        'time': submission.time,
-                        'memory': submission.memory,
-                        'language': submission.language.key,
-                        'status': submission.status,
-                        'result': submission.result,
-                        'case_points': submission.case_points,
-                        'case_total': submission.case_total,
-                    }
-                    with data_file.open(
-                        'submissions/%s.%s' % (submission.id, submission.language.extension),
-                        'w',
-                    ) as f:
-                        f.write(utf8bytes(submission.source.source))
-
-                    prepared += 1
-                    if prepared % interval == 0:
-                        p.done = prepared
-
-                with data_file.open('submissions/info.json', 'w') as f:
-                    f.write(utf8bytes(json.dumps(submission_info, sort_keys=True, indent=4)))
-
-        comment_count = len(comments)
+                for chunk_submissions in chunk(submissions.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+                    sources = dict(SubmissionSource.objects.filter(submission_id__in=[
+                        submission.id for submission in chunk_submissions
+                    ]).values_list('submission_id', 'source'))
+                    for submission in chunk_submissions:
+                        submission_info.add(submission.id, {
+                            'problem': submission.problem.code,
+                            'date': submission.date.isoformat(),
+                            'time': submission.time,
+                            'memory': submission.memory,
+                            'language': submission.language.key,
+                            'status': submission.status,
+                            'result': submission.result,
+                            'case_points': submission.case_points,
+                            'case_total': submission.case_total,
+                        })
+                        with data_file.open(
+                            'submissions/%s.%s' % (submission.id, submission.language.extension),
+                            'w',
+                        ) as f:
+                            f.write(utf8bytes(sources.pop(submission.id, '')))
+
+                    p.did(len(chunk_submissions))
+
+                submission_info.write_to(data_file, 'submissions/info.json')
+
         if comment_count:
-            comment_info = {}
+            comment_info = JSONObjectSpool()
+            related_object = {
+                'b': 'blog post',
+                'c': 'contest',
+                'p': 'problem',
+                's': 'problem editorial',
+            }
             with Progress(self, comment_count, stage=_('Preparing your comment data')) as p:
-                prepared = 0
-                interval = max(comment_count // 10, 1)
-                for comment in comments:
-                    related_object = {
-                        'b': 'blog post',
-                        'c': 'contest',
-                        'p': 'problem',
-                        's': 'problem editorial',
-                    }
-                    comment_info[comment.id] = {
-                        'date': comment.time.isoformat(),
-                        'related_object': related_object[comment.page[0]],
-                        'page': comment.page[2:],
-                        'score': comment.score,
-                    }
-                    with data_file.open('comments/%s.txt' % comment.id, 'w') as f:
-                        f.write(utf8bytes(comment.body))
-
-                    prepared += 1
-                    if prepared % interval == 0:
-                        p.done = prepared
-
-                with data_file.open('comments/info.json', 'w') as f:
-                    f.write(utf8bytes(json.dumps(comment_info, sort_keys=True, indent=4)))
+                for chunk_comments in chunk(comments.defer('body').iterator(chunk_size=EXPORT_CHUNK_SIZE),
+                                            EXPORT_CHUNK_SIZE):
+                    bodies = dict(Comment.objects.filter(id__in=[comment.id for comment in chunk_comments])
+                                  .values_list('id', 'body'))
+                    for comment in chunk_comments:
+                        comment_info.add(comment.id, {
+                            'date': comment.time.isoformat(),
+                            'related_object': related_object[comment.page[0]],
+                            'page': comment.page[2:],
+                            'score': comment.score,
+                        })
+                        with data_file.open('comments/%s.txt' % comment.id, 'w') as f:
+                            f.write(utf8bytes(bodies.pop(comment.id, '')))
+
+                    p.did(len(chunk_comments))
+
+                comment_info.write_to(data_file, 'comments/info.json')
 
     return submission_count + comment_count
@@ -0,0 +1,118 @@
+import random
+import threading
+from collections import defaultdict
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from reversion.models import Version
+
+from judge.models import Comment
+from judge.models.tests.util import create_blogpost, create_user
+from judge.views.blog import PostView
+
+
+class CommentTreeMixin(object):
+    def assertTreesConsistent(self, page):
+        comments = list(Comment.objects.filter(page=page))
+        children = defaultdict(list)
+        for comment in comments:
+            children[comment.parent_id].append(comment)
+
+        def number(comment, tree_id, level, cursor):
+            self.assertEqual((comment.tree_id, comment.level, comment.lft), (tree_id, level, cursor))
+            # The newest reply is always the first child.
+            for child in sorted(children[comment.id], key=lambda child: -child.id):
+                cursor = number(child, tree_id, level + 1, cursor + 1)
+            self.assertEqual(comment.rght, cursor + 1)
+            return cursor + 1
+
+        for root in children[None]:
+            number(root, root.id, 0, 1)
+        self.assertEqual(len({comment.tree_id for comment in comments}), len(children[None]))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CommentPostTestCase(CommentTreeMixin, TransactionTestCase):
+    threads = 8
+    posts = 10
+
+    def setUp(self):
+        self.users = [create_user(username='commenter_%d' % i, is_staff=True) for i in range(self.threads)]
+        self.post = create_blogpost(title='comments', visible=True)
+        self.page = 'b:%d' % self.post.id
+        self.url = reverse('blog_post', args=(self.post.id, self.post.slug))
+
+    def post_comments(self, user, seed, errors):
+        rng = random.Random(seed)
+        client = Client()
+        client.force_login(user)
+        try:
+            for i in range(self.posts):
+                ids = list(Comment.objects.filter(page=self.page).values_list('id', flat=True))
+                parent = rng.choice(ids) if ids and rng.random() < 0.7 else ''
+                response = client.post(self.url, {'body': 'comment %d by %s' % (i, user.username), 'parent': parent})
+                if response.status_code != 302:
+                    errors.append((user.username, i, response.status_code))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_posts(self):
+        errors = []
+        threads = [threading.Thread(target=self.post_comments, args=(user, i, errors))
+                   for i, user in enumerate(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Comment.objects.filter(page=self.page).count(), self.threads * self.posts)
+        self.assertEqual(Version.objects.get_for_model(Comment).count(), self.threads * self.posts)
+        self.assertTreesConsistent(self.page)
+
+
+class CommentTreeTestCase(CommentTreeMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(username='comment_tree').profile
+        cls.post = create_blogpost(title='comment_tree', visible=True)
+        cls.page = 'b:%d' % cls.post.id
+
+    def comment(self, body, parent=None):
+        return Comment.objects.create(author=self.author, page=self.page, body=body, parent=parent)
+
+    def test_newest_thread_first(self):
+        older = self.comment('older thread')
+        self.comment('newer thread')
+        self.comment('reply to the older thread', older)
+        self.assertTreesConsistent(self.page)
+
+        request = RequestFactory().get(reverse('blog_post', args=(self.post.id, self.post.slug)))
+        request.user = AnonymousUser()
+        view = PostView()
+        view.setup(request, id=self.post.id, slug=self.post.slug)
+        view.object = view.get_object()
+        context = view.get_context_data(object=view.object)
+        self.assertEqual([comment.body for comment in context['comment_list']],
+                         ['newer thread', 'older thread', 'reply to the older thread'])
+
+    def test_move_reply_to_root(self):
+        root = self.comment('root')
+        reply = self.comment('reply', root)
+        self.comment('reply to the reply', reply)
+        self.comment('other reply', root)
+
+        reply = Comment.objects.get(id=reply.id)
+        reply.parent = None
+        reply.save()
+
+        reply = Comment.objects.get(id=reply.id)
+        self.assertEqual((reply.tree_id, reply.level, reply.lft, reply.rght), (reply.id, 0, 1, 4))
+        self.assertEqual([comment.body for comment in reply.get_descendants()], ['reply to the reply'])
+        self.assertEqual([comment.body for comment in Comment.objects.get(id=root.id).get_descendants()],
+                         ['other reply'])
+        self.assertTreesConsistent(self.page)
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import zipfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from judge.models import ContestSubmission, Language, Submission, SubmissionSource
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.tasks import prepare_contest_data, prepare_user_data
+
+SOURCE_SIZE = 16 * 1024
+
+
+class DataExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = Language.get_python3()
+        cls.problem = create_problem(code='export')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        patcher = override_settings(DMOJ_USER_DATA_CACHE=self.root, DMOJ_CONTEST_DATA_CACHE=self.root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def create_submissions(self, profile, count):
+        submissions = Submission.objects.bulk_create([
+            Submission(user=profile, problem=self.problem, language=self.language, result='AC', status='D')
+            for _ in range(count)
+        ])
+        if submissions[0].id is None:
+            submissions = list(Submission.objects.filter(user=profile).order_by('id'))
+        SubmissionSource.objects.bulk_create([
+            SubmissionSource(submission=submission, source=str(submission.id).ljust(SOURCE_SIZE, '#'))
+            for submission in submissions
+        ])
+        return submissions
+
+    def export_user_data(self, profile):
+        options = json.dumps({
+            'submission_download': True, 'submission_results': [], 'submission_problem_glob': '*',
+            'comment_download': False,
+        })
+        prepare_user_data.apply(args=(profile.id, options))
+        return zipfile.ZipFile(os.path.join(self.root, '%s.zip' % profile.id))
+
+    def peak_memory(self, export, *args):
+        # The peak RSS of a process cannot be reset, so the peak of the memory traced by Python is measured instead.
+        tracemalloc.start()
+        try:
+            export(*args).close()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @mock.patch('judge.tasks.user.EXPORT_CHUNK_SIZE', 10)
+    def test_user_data(self):
+        profile = create_user(username='export_user').profile
+        submissions = self.create_submissions(profile, 25)
+
+        with self.export_user_data(profile) as data_file:
+            info = json.loads(data_file.read('submissions/info.json'))
+            self.assertEqual(set(info), {str(submission.id) for submission in submissions})
+            for submission in submissions:
+                self.assertEqual(info[str(submission.id)]['problem'], 'export')
+                source = data_file.read('submissions/%s.py' % submission.id).decode()
+                self.assertEqual(source, str(submission.id).ljust(SOURCE_SIZE, '#'))
+
+    @mock.patch('judge.tasks.user.EXPORT_CHUNK_SIZE', 10)
+    def test_user_data_memory(self):
+        small = create_user(username='export_small').profile
+        large = create_user(username='export_large').profile
+        self.create_submissions(small, 40)
+        self.create_submissions(large, 200)
+
+        small_peak = self.peak_memory(self.export_user_data, small)
+        large_peak = self.peak_memory(self.export_user_data, large)
+        # Five times the sources should not take five times the memory.
+        self.assertLess(large_peak, small_peak * 2)
+        self.assertLess(large_peak, 200 * SOURCE_SIZE / 2)
+
+    @mock.patch('judge.tasks.contest.EXPORT_CHUNK_SIZE', 10)
+    def test_contest_data(self):
+        contest = create_contest(key='export')
+        contest_problem = create_contest_problem(contest=contest, problem=self.problem)
+        profile = create_user(username='export_contestant').profile
+        participation = create_contest_participation(contest=contest, user=profile)
+        submissions = self.create_submissions(profile, 25)
+        ContestSubmission.objects.bulk_create([
+            ContestSubmission(submission=submission, problem=contest_problem, participation=participation,
+                              points=submission.id == submissions[-1].id)
+            for submission in submissions
+        ])
+
+        options = json.dumps({'submission_results': [], 'submission_problem_glob': '*'})
+        self.assertEqual(prepare_contest_data.apply(args=(contest.id, options)).get(), 25)
+        with zipfile.ZipFile(os.path.join(self.root, '%s.zip' % contest.id)) as data_file:
+            names = set(data_file.namelist())
+            self.assertEqual(len(names), 25)
+            # The submission with the most points is exported as the solution, and the others as history.
+            self.assertEqual(data_file.read('export_contestant/export.py').decode(),
+                             str(submissions[-1].id).ljust(SOURCE_SIZE, '#'))
+            for submission in submissions[:-1]:
+                self.assertIn('export_contestant/$History/export_%d.py' % submission.id, names)
@@ -0,0 +1,97 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from judge.event_poster_queue import QueuedEventPoster
+
+
+class FakePoster(object):
+    def __init__(self, sent, fail=0, gate=None, fail_after=None):
+        self.sent = sent
+        self.fail = fail
+        self.gate = gate
+        self.fail_after = fail_after
+
+    def post_many(self, events, ids=None):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError()
+        if ids is None:
+            ids = []
+        if self.fail_after is not None:
+            # Delivers the first events of the batch before the connection breaks.
+            self.sent.append(list(events[:self.fail_after]))
+            ids.extend(range(self.fail_after))
+            self.fail_after = None
+            raise ConnectionError()
+        self.sent.append(list(events))
+        ids.extend(range(len(events)))
+        return ids
+
+
+class QueuedEventPosterTestCase(SimpleTestCase):
+    def test_post_in_order(self):
+        sent = []
+        poster = QueuedEventPoster(lambda: FakePoster(sent), batch_size=3)
+        for i in range(10):
+            self.assertEqual(poster.post('channel', i), 0)
+        poster.start()
+        poster.stop()
+
+        self.assertEqual([message for batch in sent for _, message in batch], list(range(10)))
+        self.assertTrue(all(len(batch) <= 3 for batch in sent))
+        metrics = poster.metrics()
+        self.assertEqual(metrics['sent'], 10)
+        self.assertEqual(metrics['dropped'], 0)
+        self.assertEqual(metrics['queue_depth'], 0)
+
+    def test_drop_oldest(self):
+        poster = QueuedEventPoster(lambda: FakePoster([]), max_size=3, drop_policy='oldest')
+        for i in range(5):
+            poster.post('channel', i)
+        self.assertEqual([message for _, message, _ in poster._queue], [2, 3, 4])
+        self.assertEqual(poster.metrics()['dropped'], 2)
+
+    def test_drop_newest(self):
+        poster = QueuedEventPoster(lambda: FakePoster([]), max_size=3, drop_policy='newest')
+        for i in range(5):
+            poster.post('channel', i)
+        self.assertEqual([message for _, message, _ in poster._queue], [0, 1, 2])
+        self.assertEqual(poster.metrics()['dropped'], 2)
+
+    def test_post_does_not_wait_for_daemon(self):
+        sent = []
+        gate = threading.Event()
+        poster = QueuedEventPoster(lambda: FakePoster(sent, gate=gate), max_size=5, drop_policy='block',
+                                   block_timeout=0.01)
+        poster.start()
+        for i in range(20):
+            poster.post('channel', i)
+        self.assertGreater(poster.metrics()['dropped'], 0)
+        gate.set()
+        poster.stop()
+        self.assertEqual(poster.metrics()['sent'] + poster.metrics()['dropped'], 20)
+
+    def test_reconnect_on_failure(self):
+        sent = []
+        posters = [FakePoster(sent, fail=1), FakePoster(sent)]
+        poster = QueuedEventPoster(lambda: posters.pop(0), retry_delay=0)
+        poster.post('channel', 'message')
+        poster.start()
+        poster.stop()
+        self.assertEqual(sent, [[('channel', 'message')]])
+        self.assertEqual(poster.metrics()['failed'], 0)
+
+    def test_retry_undelivered_only(self):
+        sent = []
+        posters = [FakePoster(sent, fail_after=2), FakePoster(sent)]
+        poster = QueuedEventPoster(lambda: posters.pop(0), batch_size=5, retry_delay=0)
+        for i in range(5):
+            poster.post('channel', i)
+        poster.start()
+        poster.stop()
+        self.assertEqual([message for batch in sent for _, message in batch], list(range(5)))
+        self.assertEqual(poster.metrics()['sent'], 5)
+        self.assertEqual(poster.metrics()['failed'], 0)
@@ -0,0 +1,34 @@
+from unittest import mock
+
+import pygments
+import pygments.formatters
+import pygments.lexers
+from django.test import SimpleTestCase, override_settings
+
+from judge.highlight_code import highlight_cache, highlight_code
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class HighlightCodeTestCase(SimpleTestCase):
+    def setUp(self):
+        highlight_cache.clear()
+
+    def test_same_as_pygments(self):
+        code = '#include <cstdio>\nint main() { return 0; }\n'
+        expected = pygments.highlight(code, pygments.lexers.get_lexer_by_name('cpp'),
+                                      pygments.formatters.HtmlFormatter(cssclass='codehilite', wrapcode=True))
+        self.assertEqual(highlight_code(code, 'cpp'), expected)
+        self.assertEqual(highlight_code(code, 'cpp'), expected)
+
+    def test_cached(self):
+        with mock.patch('judge.highlight_code.pygments.highlight', wraps=pygments.highlight) as highlight:
+            highlight_code('print(1)\n', 'python3')
+            highlight_code('print(1)\n', 'python3')
+            self.assertEqual(highlight.call_count, 1)
+
+            highlight_code('print(1)\n', 'python3', cssclass='other')
+            highlight_code('print(1)\n', 'text')
+            self.assertEqual(highlight.call_count, 3)
+
+    def test_unknown_language(self):
+        self.assertHTMLEqual(highlight_code('<a>', 'not-a-language'), '<pre><code>&lt;a&gt;</code></pre>')
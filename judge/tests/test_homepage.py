@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from judge.admin.comments import CommentAdmin
+from judge.caching import get_fragment_versions
+from judge.models import Comment, Profile
+from judge.models.tests.util import create_contest, create_problem, create_user
+from judge.views.blog import PostList
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class HomepageSidebarTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(username='home_%d' % i) for i in range(5)]
+        Profile.objects.filter(user__in=cls.users).update(performance_points=10, contribution_points=5)
+        for i in range(5):
+            problem = create_problem(code='home_%d' % i, is_public=True)
+            Comment.objects.create(author=cls.users[i].profile, page='p:%s' % problem.code, body='comment')
+        now = timezone.now()
+        create_contest(key='home_ongoing', is_visible=True)
+        create_contest(key='home_future', is_visible=True, start_time=now + timezone.timedelta(days=1))
+        create_contest(key='home_private', is_visible=True, is_private=True, private_contestants=['home_0'],
+                       start_time=now + timezone.timedelta(days=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def context(self, user=None):
+        request = RequestFactory().get(reverse('home'))
+        request.user = user or AnonymousUser()
+        if user is not None:
+            request.profile = user.profile
+        request.session = {}
+        view = PostList()
+        view.setup(request, page=1)
+        view.object_list = view.get_queryset()
+        with CaptureQueriesContext(connection) as queries:
+            context = view.get_context_data()
+        return context, len(queries)
+
+    def versions(self):
+        return get_fragment_versions('home_comments', 'home_problems', 'home_contests', 'home_top_users')
+
+    def test_queries(self):
+        _, cold = self.context()
+        context, warm = self.context()
+        self.assertLess(warm, cold)
+
+        # The blocks that are rendered as cached fragments query nothing until they are rendered.
+        with CaptureQueriesContext(connection) as queries:
+            context['comments']()
+        self.assertTrue(queries)
+
+    def test_stats(self):
+        self.assertEqual(self.context()[0]['user_count'](), Profile.objects.count())
+        create_user(username='home_new')
+        self.assertEqual(self.context()[0]['user_count'](), Profile.objects.count() - 1)
+
+    def test_contests(self):
+        context, _ = self.context()
+        self.assertEqual([contest.key for contest in context['current_contests']], ['home_ongoing'])
+        self.assertEqual([contest.key for contest in context['future_contests']], ['home_future'])
+
+        context, _ = self.context(self.users[0])
+        self.assertEqual([contest.key for contest in context['future_contests']], ['home_future', 'home_private'])
+        context, _ = self.context(self.users[1])
+        self.assertEqual([contest.key for contest in context['future_contests']], ['home_future'])
+
+        contest = create_contest(key='home_new', is_visible=True)
+        contest.save()
+        context, _ = self.context()
+        self.assertEqual(sorted(contest.key for contest in context['current_contests']), ['home_new', 'home_ongoing'])
+
+    def test_comment_versions(self):
+        versions = self.versions()
+        comment = Comment.objects.create(author=self.users[0].profile, page='p:home_0', body='new comment')
+        self.assertNotEqual(self.versions()['home_comments'], versions['home_comments'])
+
+        versions = self.versions()
+        request = RequestFactory().post('/')
+        with mock.patch.object(CommentAdmin, 'message_user'):
+            CommentAdmin(Comment, AdminSite()).hide_comment(request, Comment.objects.filter(id=comment.id))
+        self.assertNotEqual(self.versions()['home_comments'], versions['home_comments'])
+        self.assertEqual(self.versions()['home_problems'], versions['home_problems'])
+
+    def test_top_users_versions(self):
+        versions = self.versions()
+        Profile.add_contribution_points([self.users[0].profile.id], 1)
+        self.assertNotEqual(self.versions()['home_top_users'], versions['home_top_users'])
+
+        versions = self.versions()
+        Profile.objects.filter(id=self.users[0].profile.id).update(points=0, problem_count=1)
+        Profile.calculate_points_bulk([self.users[0].profile.id])
+        self.assertNotEqual(self.versions()['home_top_users'], versions['home_top_users'])
+        self.assertEqual(self.versions()['home_comments'], versions['home_comments'])
@@ -0,0 +1,98 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from judge.models import ContestMoss, ContestSubmission, Language, Submission, SubmissionSource
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.tasks import run_moss
+
+
+class FakeMOSS(object):
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    calls = []
+
+    def __init__(self, user_id, language, matching_file_limit, comment):
+        self.language = language
+        self.comment = comment
+        self.files = {}
+
+    def add_file_from_memory(self, virtual_path, content):
+        self.files[virtual_path] = content.decode('utf-8')
+
+    def process(self):
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+            cls.calls.append((self.comment, self.language, self.files))
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running -= 1
+        return 'http://moss.test/%s/%s' % (self.comment, self.language)
+
+
+@override_settings(MOSS_API_KEY='key')
+class RunMossTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.contest = create_contest(key='moss')
+        languages = {
+            common_name: Language.objects.create(key=key, name=key, common_name=common_name, extension=key.lower())
+            for key, common_name in (('CPP', 'C++'), ('JAVA', 'Java'), ('PY', 'Python'))
+        }
+
+        for i in range(3):
+            problem = create_problem(code='moss_%d' % i)
+            contest_problem = create_contest_problem(contest=cls.contest, problem=problem, order=i)
+            for j in range(2):
+                profile = create_user(username='moss_%d_%d' % (i, j)).profile
+                participation = create_contest_participation(contest=cls.contest, user=profile)
+                for language, points in (('C++', 1), ('C++', 0), ('Python', 0)):
+                    submission = Submission.objects.create(
+                        user=profile, problem=problem, language=languages[language], contest_object=cls.contest,
+                        points=points, result='AC', status='D',
+                    )
+                    SubmissionSource.objects.create(submission=submission, source='%s %d' % (language, points))
+                    ContestSubmission.objects.create(submission=submission, problem=contest_problem,
+                                                     participation=participation, points=points)
+
+    def setUp(self):
+        FakeMOSS.running = FakeMOSS.max_running = 0
+        FakeMOSS.calls = []
+
+    def run_moss(self, concurrency):
+        with override_settings(MOSS_CONCURRENCY=concurrency), mock.patch('judge.tasks.contest.MOSS', FakeMOSS):
+            return run_moss.apply(args=(self.contest.key,)).get()
+
+    def test_results(self):
+        self.assertEqual(self.run_moss(4), 3 * len(ContestMoss.LANG_MAPPING))
+        self.assertEqual(len(FakeMOSS.calls), 6)
+        for comment, language, files in FakeMOSS.calls:
+            # Only the best submission of each user is sent.
+            self.assertEqual(len(files), 2)
+            if language == 'cc':
+                self.assertEqual(set(files.values()), {'C++ 1'})
+
+        for result in ContestMoss.objects.filter(contest=self.contest):
+            if result.language in ('C++', 'Python'):
+                self.assertEqual(result.submission_count, 2)
+                self.assertEqual(result.url, 'http://moss.test/moss - %s/%s' % (
+                    result.problem.code, dict(ContestMoss.LANG_MAPPING)[result.language]))
+            else:
+                self.assertEqual(result.submission_count, 0)
+                self.assertIsNone(result.url)
+
+    def test_concurrency_limit(self):
+        self.run_moss(2)
+        self.assertEqual(len(FakeMOSS.calls), 6)
+        self.assertEqual(FakeMOSS.max_running, 2)
+
+    def test_sequential(self):
+        self.run_moss(1)
+        self.assertEqual(len(FakeMOSS.calls), 6)
+        self.assertEqual(FakeMOSS.max_running, 1)
@@ -0,0 +1,108 @@
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from judge.models import Rating
+from judge.models.tests.util import create_contest, create_contest_participation, create_user
+from judge.ratings import MEAN_INIT, RatingStore, rate_contest, recalculate_ratings_numpy, \
+    recalculate_ratings_python, rerate_contest, tie_ranker
+from judge.tasks import rerate_contests
+
+
+class RecalculateRatingsTestCase(SimpleTestCase):
+    def random_contest(self, rng, n):
+        scores = sorted((rng.randrange(10) for _ in range(n)), reverse=True)
+        times_ranked = [rng.randrange(15) for _ in range(n)]
+        return (
+            list(tie_ranker(scores, key=lambda score: score)),
+            [rng.gauss(MEAN_INIT, 300) if times else MEAN_INIT for times in times_ranked],
+            times_ranked,
+            [[rng.gauss(MEAN_INIT, 400) for _ in range(times)] for times in times_ranked],
+        )
+
+    def test_numpy_matches_python(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            contest = self.random_contest(rng, rng.choice([1, 2, 3, 10, 100]))
+            with self.subTest(seed=seed):
+                py_rating, py_mean, py_performance = recalculate_ratings_python(*contest)
+                rating, mean, performance = recalculate_ratings_numpy(*contest, block_size=16)
+                for a, b in zip(rating, py_rating):
+                    self.assertLessEqual(abs(a - b), 1)
+                for a, b in zip(mean, py_mean):
+                    self.assertAlmostEqual(a, b, delta=0.01)
+                for a, b in zip(performance, py_performance):
+                    self.assertAlmostEqual(a, b, delta=0.01)
+
+
+class RerateContestTestCase(TestCase):
+    def setUp(self):
+        _now = timezone.now()
+        self.users = [create_user(username='rerate_%d' % i).profile for i in range(6)]
+        self.contests = []
+        for i in range(3):
+            contest = create_contest(key='rerate_%d' % i, is_rated=True, rate_all=True,
+                                     start_time=_now - timedelta(days=10 - i, hours=2),
+                                     end_time=_now - timedelta(days=10 - i))
+            # The last contest only has users who did not take part in the first one.
+            for j, user in enumerate(self.users[:4] if i < 2 else self.users[4:]):
+                create_contest_participation(contest=contest, user=user, virtual=0, score=(i + j) % 4)
+            self.contests.append(contest)
+        for contest in self.contests:
+            rate_contest(contest)
+
+    def ratings(self):
+        return {(contest_id, user_id): (rating, mean, performance)
+                for contest_id, user_id, rating, mean, performance in Rating.objects.values_list(
+                    'contest_id', 'user_id', 'rating', 'mean', 'performance')}
+
+    def test_rate_with_store(self):
+        ratings = self.ratings()
+        Rating.objects.all().delete()
+        store = RatingStore()
+        for contest in self.contests:
+            rate_contest(contest, store)
+        self.assertEqual(self.ratings(), ratings)
+        self.assertEqual(store.contest_ratings(self.contests[1]),
+                         {user_id: result for (contest_id, user_id), result in ratings.items()
+                          if contest_id == self.contests[1].id})
+
+    def test_rerate_unchanged(self):
+        ratings = self.ratings()
+        self.assertEqual(rerate_contest(self.contests[0]), set())
+        self.assertEqual(self.ratings(), ratings)
+
+    def test_rerate_matches_full_recalculation(self):
+        # The last placed user wins instead.
+        self.contests[0].users.filter(user=self.users[0]).update(score=9999)
+        changed = rerate_contest(self.contests[0])
+        self.assertTrue(changed)
+        self.assertLessEqual(changed, {user.id for user in self.users[:4]})
+
+        # Only the second contest has users whose ratings changed.
+        self.assertTrue(rerate_contest(self.contests[1]))
+        ratings = self.ratings()
+
+        Rating.objects.all().delete()
+        for contest in self.contests:
+            rate_contest(contest)
+        self.assertEqual(self.ratings(), ratings)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_rerate_task_checkpoint(self):
+        contest = self.contests[0]
+        contest.users.filter(user=self.users[0]).update(score=9999)
+        ratings = self.ratings()
+
+        # A redelivered task resumes from its checkpoint, which here has nothing left to do.
+        cache.set('rerate_contests:%d:interrupted' % contest.id, {'changed': set(), 'later': []})
+        self.assertEqual(rerate_contests.apply(args=(contest.id,), task_id='interrupted').get(), 0)
+        self.assertEqual(self.ratings(), ratings)
+
+        # A new trigger rates the contest itself again, despite the checkpoint left by another run.
+        cache.set('rerate_contests:%d:interrupted' % contest.id, {'changed': set(), 'later': []})
+        self.assertEqual(rerate_contests.apply(args=(contest.id,)).get(), 1)
+        self.assertNotEqual(self.ratings(), ratings)
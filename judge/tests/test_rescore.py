@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from judge.models import ContestSubmission, Language, Problem, Profile, Submission
+from judge.models.tests.util import create_contest, create_contest_participation, create_contest_problem, \
+    create_problem, create_user
+from judge.tasks import rescore_problem
+
+
+class RescoreProblemTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = create_problem(code='rescore', points=10, partial=True, is_public=True)
+        cls.contest = create_contest(key='rescore')
+        cls.contest_problem = create_contest_problem(contest=cls.contest, problem=cls.problem, points=100,
+                                                     partial=True)
+        cls.profiles = [create_user(username='rescore_%d' % i).profile for i in range(3)]
+        cls.participation = create_contest_participation(contest=cls.contest, user=cls.profiles[0])
+
+        cls.submissions = []
+        for profile, case_points in zip(cls.profiles, (5, 10, 0)):
+            submission = Submission.objects.create(
+                user=profile, problem=cls.problem, language=Language.get_python3(), result='AC', status='D',
+                case_points=case_points, case_total=10, points=case_points,
+            )
+            cls.submissions.append(submission)
+        ContestSubmission.objects.create(submission=cls.submissions[0], problem=cls.contest_problem,
+                                         participation=cls.participation, points=50)
+        cls.participation.recompute_results()
+        cls.problem.update_stats()
+        Profile.calculate_points_bulk([profile.id for profile in cls.profiles])
+
+    def rescore(self, **fields):
+        Problem.objects.filter(id=self.problem.id).update(**fields)
+        return rescore_problem.apply(args=(self.problem.id,)).get()
+
+    def test_points_changed(self):
+        self.assertEqual(self.rescore(points=20), 3)
+        self.assertEqual([submission.points for submission in Submission.objects.filter(problem=self.problem)
+                          .order_by('id')], [10, 20, 0])
+        self.assertEqual(Profile.objects.get(id=self.profiles[0].id).points, 10)
+        self.assertEqual(Profile.objects.get(id=self.profiles[1].id).points, 20)
+
+    def test_partial_changed(self):
+        self.rescore(partial=False)
+        self.assertEqual([submission.points for submission in Submission.objects.filter(problem=self.problem)
+                          .order_by('id')], [0, 10, 0])
+        self.assertEqual(ContestSubmission.objects.get(submission=self.submissions[0]).points, 0)
+        self.participation.refresh_from_db()
+        self.assertEqual(self.participation.score, 0)
+        self.assertEqual(Profile.objects.get(id=self.profiles[0].id).points, 0)
+
+    def test_calculate_points_bulk(self):
+        self.rescore(points=30)
+        for profile in self.profiles:
+            bulk = Profile.objects.get(id=profile.id)
+            profile.refresh_from_db()
+            profile.points = profile.performance_points = -1
+            profile.calculate_points()
+            self.assertAlmostEqual(bulk.points, profile.points)
+            self.assertAlmostEqual(bulk.performance_points, profile.performance_points)
+            self.assertEqual(bulk.problem_count, profile.problem_count)
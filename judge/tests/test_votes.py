@@ -0,0 +1,62 @@
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from judge.models import BlogPost, BlogVote, Comment, CommentVote, Profile
+from judge.models.tests.util import create_blogpost, create_user
+
+
+class ConcurrentVoteTestCase(TransactionTestCase):
+    voters = 8
+
+    def setUp(self):
+        self.authors = [create_user(username='vote_author_%d' % i).profile for i in range(2)]
+        self.users = [create_user(username='voter_%d' % i, is_staff=True) for i in range(self.voters)]
+        self.comment = Comment.objects.create(author=self.authors[0], page='b:1', body='comment')
+        self.blog = create_blogpost(title='votes', visible=True, authors=[profile.user.username
+                                                                          for profile in self.authors])
+
+    def vote(self, url, id):
+        barrier = threading.Barrier(2 * self.voters)
+        responses = []
+
+        def vote(user, delta):
+            client = Client()
+            client.force_login(user)
+            barrier.wait()
+            try:
+                response = client.post(reverse(url % ('upvote' if delta > 0 else 'downvote')), {'id': id})
+                responses.append((user.username, response.status_code))
+            finally:
+                connection.close()
+
+        # Every voter votes twice at once, and only one of the two may count.
+        threads = [threading.Thread(target=vote, args=(user, 1 if i % 3 else -1))
+                   for i, user in enumerate(self.users) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(responses), sorted([(user.username, 200) for user in self.users] +
+                                                   [(user.username, 400) for user in self.users]))
+        return sum(1 if i % 3 else -1 for i in range(self.voters))
+
+    def contribution_points(self, profile):
+        return Profile.objects.get(id=profile.id).contribution_points // settings.VNOJ_CP_COMMENT
+
+    def test_comment_votes(self):
+        score = self.vote('comment_%s', self.comment.id)
+        self.assertEqual(CommentVote.objects.filter(comment=self.comment).count(), self.voters)
+        self.assertEqual(Comment.objects.get(id=self.comment.id).score, score)
+        self.assertEqual(self.contribution_points(self.authors[0]), score)
+        self.assertEqual(self.contribution_points(self.authors[1]), 0)
+
+    def test_blog_votes(self):
+        score = self.vote('blog_%s', self.blog.id)
+        self.assertEqual(BlogVote.objects.filter(blog=self.blog).count(), self.voters)
+        self.assertEqual(BlogPost.objects.get(id=self.blog.id).score, score)
+        self.assertEqual([self.contribution_points(profile) for profile in self.authors], [score, score])
@@ -5,6 +5,7 @@ import zipfile
 
 import yaml
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.core.files.storage import FileSystemStorage
 from django.urls import reverse
@@ -62,30 +63,49 @@ def get_testcase_data(archive, case):
     }
 
 
+def testcases_data_key(problem):
+    return 'problem_testcases_data:%s' % problem.code
+
+
+def get_file_version(storage, name):
+    try:
+        stat = os.stat(storage.path(name))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 def get_problem_testcases_data(problem):
     """ Read test data of a problem and store
     result in a dictionary.
 
+    The result is cached along with the modification time and size of
+    `init.yml` and of the archive, and is used for as long as neither file changes.
+
     If an error occurs, this method will return an empty dict.
     """
     from judge.models import problem_data_storage
 
     init_path = '%s/init.yml' % problem.code
-    if not problem_data_storage.exists(init_path):
+    init_version = get_file_version(problem_data_storage, init_path)
+    if init_version is None:
         return {}
 
-    init_content = yaml.safe_load(problem_data_storage.open(init_path).read())
+    key = testcases_data_key(problem)
+    cached = cache.get(key)
+    if cached is not None and cached['init_version'] == init_version and \
+            cached['archive_version'] == get_file_version(problem_data_storage, cached['archive_path']):
+        return cached['data']
+
+    with problem_data_storage.open(init_path) as f:
+        init_content = yaml.safe_load(f.read())
     archive_path = init_content.get('archive', None)
     if not archive_path:
         return {}
 
     archive_path = '%s/%s' % (problem.code, archive_path)
-    if not problem_data_storage.exists(archive_path):
-        return {}
-
-    try:
-        archive = zipfile.ZipFile(problem_data_storage.open(archive_path))
-    except zipfile.BadZipfile:
+    archive_version = get_file_version(problem_data_storage, archive_path)
+    if archive_version is None:
         return {}
 
     testcases_data = {}
@@ -93,16 +113,28 @@ def get_problem_testcases_data(problem):
     # TODO:
     # - Support manually managed problems
     # - Support pretest
-    order = 0
-    for case in problem.cases.all().order_by('order'):
+    with problem_data_storage.open(archive_path) as f:
         try:
-            if not case.input_file:
-                continue
-            order += 1
-            testcases_data[order] = get_testcase_data(archive, case)
-        except Exception:
+            archive = zipfile.ZipFile(f)
+        except zipfile.BadZipfile:
             return {}
 
+        order = 0
+        for case in problem.cases.all().order_by('order'):
+            try:
+                if not case.input_file:
+                    continue
+                order += 1
+                testcases_data[order] = get_testcase_data(archive, case)
+            except Exception:
+                return {}
+
+    cache.set(key, {
+        'init_version': init_version,
+        'archive_path': archive_path,
+        'archive_version': archive_version,
+        'data': testcases_data,
+    }, 86400)
     return testcases_data
 
 
@@ -347,6 +379,7 @@ class ProblemDataCompiler(object):
         from judge.models import problem_data_storage
 
         yml_file = '%s/init.yml' % self.problem.code
+        cache.delete(testcases_data_key(self.problem))
         try:
             init = self.make_init()
             if init:
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+__all__ = ['RenderCache']
+
+
+class RenderCache(object):
+    """Caches rendered content by a hash of everything it is rendered from.
+
+    Results are kept in an in-process LRU of up to `max_size` entries in front of the Django cache, where they are
+    kept for `timeout` seconds. Either tier is disabled by setting its limit to 0.
+    """
+
+    def __init__(self, prefix, max_size=1000, timeout=86400):
+        self.prefix = prefix
+        self.max_size = max_size
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.local_hits = 0
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            # Each part is prefixed by its length, so that different parts cannot run into each other.
+            data = str(part).encode('utf-8')
+            digest.update(b'%d:' % len(data))
+            digest.update(data)
+        return '%s:%s' % (self.prefix, digest.hexdigest())
+
+    def get_or_render(self, parts, render):
+        """Returns the cached result for `parts`, calling `render()` to produce it when it is not cached."""
+        key = self.make_key(parts)
+        if self.max_size:
+            with self._lock:
+                result = self._local.get(key)
+                if result is not None:
+                    self._local.move_to_end(key)
+                    self.local_hits += 1
+                    return result
+
+        result = cache.get(key) if self.timeout else None
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+        else:
+            result = render()
+            if self.timeout:
+                cache.set(key, result, self.timeout)
+            with self._lock:
+                self.misses += 1
+
+        if self.max_size:
+            with self._lock:
+                self._local[key] = result
+                while len(self._local) > self.max_size:
+                    self._local.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Empties the in-process tier."""
+        with self._lock:
+            self._local.clear()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'size': len(self._local),
+                'local_hits': self.local_hits,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,246 @@
+import time
+from bisect import insort
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models.query import Prefetch
+from django.utils.functional import cached_property
+from django.utils.safestring import mark_safe
+
+from judge.models import ContestParticipation, Organization
+
+__all__ = ['ContestRankingProfile', 'ContestScoreboard', 'make_contest_ranking_profile']
+
+ContestRankingProfile = namedtuple(
+    'ContestRankingProfile',
+    'id user css_class username points cumtime tiebreaker organization participation '
+    'participation_rating problem_cells result_cell virtual display_name',
+)
+
+ScoreboardEntry = namedtuple('ScoreboardEntry', 'key virtual solves')
+
+
+def make_contest_ranking_profile(contest, participation, contest_problems, first_solves, frozen=False):
+    def display_user_problem(contest_problem):
+        # When the contest format is changed, `format_data` might be invalid.
+        # This will cause `display_user_problem` to error, so we display '???' instead.
+        try:
+            return contest.format.display_user_problem(participation, contest_problem, first_solves, frozen)
+        except (KeyError, TypeError, ValueError):
+            return mark_safe('<td>???</td>')
+
+    user = participation.user
+    return ContestRankingProfile(
+        id=user.id,
+        user=user.user,
+        css_class=user.css_class,
+        username=user.username,
+        points=participation.score if not frozen else participation.frozen_score,
+        cumtime=participation.cumtime if not frozen else participation.frozen_cumtime,
+        tiebreaker=participation.tiebreaker if not frozen else participation.frozen_tiebreaker,
+        organization=user.organization,
+        participation_rating=participation.rating.rating if hasattr(participation, 'rating') else None,
+        problem_cells=[display_user_problem(contest_problem) for contest_problem in contest_problems],
+        result_cell=contest.format.display_participation_result(participation, frozen),
+        participation=participation,
+        virtual=participation.virtual,
+        display_name=user.display_name,
+    )
+
+
+class ContestScoreboard(object):
+    """The scoreboard of a contest, kept up to date one participation at a time.
+
+    The cache holds a summary of the contest, with the participations in ranking order, the first solve and total AC
+    counters of each problem, and the problems solved by each participation. Each participation's row is rendered
+    once and cached separately. `update` applies a recomputed participation to the summary and re-renders only the
+    rows that changed, so reading the scoreboard only has to assemble cached rows.
+    """
+
+    timeout = 86400
+    lock_timeout = 10
+
+    def __init__(self, contest, frozen=False):
+        self.contest = contest
+        self.frozen = frozen
+        self.key = 'contest_scoreboard:%d:%d' % (contest.id, frozen)
+
+    @classmethod
+    def update_participation(cls, contest, participation_id):
+        for frozen in (False, True):
+            cls(contest, frozen).update(participation_id)
+
+    @classmethod
+    def invalidate(cls, contest):
+        cache.delete_many([cls(contest, frozen).key for frozen in (False, True)])
+
+    @cached_property
+    def problems(self):
+        return list(self.contest.contest_problems.select_related('problem').defer('problem__description')
+                    .order_by('order'))
+
+    @cached_property
+    def signature(self):
+        # Editing the contest problems changes what every row looks like, so the summary is rebuilt.
+        return tuple((problem.id, problem.problem.code, problem.points, problem.is_pretested)
+                     for problem in self.problems)
+
+    def get_queryset(self):
+        return self.contest.users.filter(virtual__gt=ContestParticipation.SPECTATE) \
+            .select_related('user__user', 'rating').defer('user__about', 'user__organizations__about') \
+            .prefetch_related(Prefetch('user__organizations',
+                                       queryset=Organization.objects.filter(is_unlisted=False)))
+
+    def sort_key(self, participation):
+        if self.frozen:
+            score, cumtime, tiebreaker = (participation.frozen_score, participation.frozen_cumtime,
+                                          participation.frozen_tiebreaker)
+        else:
+            score, cumtime, tiebreaker = participation.score, participation.cumtime, participation.tiebreaker
+        return (participation.is_disqualified, -score, cumtime, tiebreaker, -participation.submission_count,
+                participation.id)
+
+    def row_key(self, participation_id):
+        return '%s:row:%d' % (self.key, participation_id)
+
+    def render_row(self, summary, participation):
+        first_solves = {}
+        if self.contest.format.show_first_solves:
+            first_solves = {problem_id: solver for problem_id, (_, solver) in summary['first_solves'].items()}
+        return make_contest_ranking_profile(self.contest, participation, self.problems, first_solves, self.frozen)
+
+    def _lock(self):
+        deadline = time.monotonic() + self.lock_timeout
+        while not cache.add(self.key + ':lock', 1, self.lock_timeout):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _unlock(self):
+        cache.delete(self.key + ':lock')
+
+    def _find_first_solve(self, summary, problem_id):
+        candidates = [(entry.solves[problem_id], entry.key) for entry in summary['entries'].values()
+                      if entry.virtual == ContestParticipation.LIVE and problem_id in entry.solves]
+        if not candidates:
+            summary['first_solves'].pop(problem_id, None)
+        else:
+            solve_time, key = min(candidates)
+            summary['first_solves'][problem_id] = (solve_time, key[-1])
+
+    def _apply(self, summary, participation_id, entry):
+        """Replaces the entry of a participation in the summary, or removes it when `entry` is None.
+
+        Returns the IDs of the other participations that gained or lost a first solve.
+        """
+        old = summary['entries'].pop(participation_id, None)
+        old_solves = old.solves if old is not None else {}
+        if old is not None:
+            summary['order'].remove((old.key, participation_id))
+            for problem_id in old.solves:
+                summary['total_ac'][problem_id] -= 1
+                if old.virtual == ContestParticipation.LIVE:
+                    summary['total_ac_live'][problem_id] -= 1
+
+        new_solves = entry.solves if entry is not None else {}
+        if entry is not None:
+            summary['entries'][participation_id] = entry
+            insort(summary['order'], (entry.key, participation_id))
+            for problem_id in entry.solves:
+                summary['total_ac'][problem_id] = summary['total_ac'].get(problem_id, 0) + 1
+                if entry.virtual == ContestParticipation.LIVE:
+                    summary['total_ac_live'][problem_id] = summary['total_ac_live'].get(problem_id, 0) + 1
+
+        changed = set()
+        for problem_id in old_solves.keys() | new_solves.keys():
+            previous = summary['first_solves'].get(problem_id)
+            if previous is not None and previous[1] == participation_id:
+                # This participation held the first solve, and might have lost it.
+                self._find_first_solve(summary, problem_id)
+            elif entry is not None and entry.virtual == ContestParticipation.LIVE and problem_id in new_solves:
+                candidate = (new_solves[problem_id], entry.key)
+                if previous is None or candidate < (previous[0], summary['entries'][previous[1]].key):
+                    summary['first_solves'][problem_id] = (new_solves[problem_id], participation_id)
+            current = summary['first_solves'].get(problem_id)
+            for solver in {previous and previous[1], current and current[1]} - {None, participation_id}:
+                changed.add(solver)
+        return changed
+
+    def make_entry(self, participation):
+        return ScoreboardEntry(
+            key=self.sort_key(participation),
+            virtual=participation.virtual,
+            solves=self.contest.format.get_participation_solves(self.problems, participation, self.frozen),
+        )
+
+    def build(self):
+        summary = {
+            'signature': self.signature, 'entries': {}, 'order': [], 'first_solves': {},
+            'total_ac': {}, 'total_ac_live': {},
+        }
+        participations = list(self.get_queryset())
+        for participation in participations:
+            self._apply(summary, participation.id, self.make_entry(participation))
+
+        cache.set_many({self.row_key(participation.id): self.render_row(summary, participation)
+                        for participation in participations}, self.timeout)
+        return summary
+
+    def get_summary(self):
+        summary = cache.get(self.key)
+        if summary is not None and summary['signature'] == self.signature:
+            return summary
+
+        # Only one request rebuilds the summary, while the others wait for it.
+        if not self._lock():
+            return self.build()
+        try:
+            summary = cache.get(self.key)
+            if summary is None or summary['signature'] != self.signature:
+                summary = self.build()
+                cache.set(self.key, summary, self.timeout)
+        finally:
+            self._unlock()
+        return summary
+
+    def update(self, participation_id):
+        if cache.get(self.key) is None:
+            return
+
+        if not self._lock():
+            # The summary can no longer be trusted to reflect this participation.
+            cache.delete(self.key)
+            return
+        try:
+            summary = cache.get(self.key)
+            if summary is None or summary['signature'] != self.signature:
+                return
+
+            participation = self.get_queryset().filter(id=participation_id).first()
+            entry = self.make_entry(participation) if participation is not None else None
+            changed = self._apply(summary, participation_id, entry)
+            cache.set(self.key, summary, self.timeout)
+
+            cache.delete_many([self.row_key(id) for id in changed])
+            if participation is not None:
+                cache.set(self.row_key(participation_id), self.render_row(summary, participation), self.timeout)
+        finally:
+            self._unlock()
+
+    def get_ranking(self, show_virtual=False):
+        """Returns the rows of the scoreboard in ranking order, and the total AC count of each problem."""
+        summary = self.get_summary()
+        ids = [id for _, id in summary['order']
+               if show_virtual or summary['entries'][id].virtual == ContestParticipation.LIVE]
+        rows = cache.get_many([self.row_key(id) for id in ids])
+
+        missing = [id for id in ids if self.row_key(id) not in rows]
+        if missing:
+            rendered = {self.row_key(participation.id): self.render_row(summary, participation)
+                        for participation in self.get_queryset().filter(id__in=missing)}
+            cache.set_many(rendered, self.timeout)
+            rows.update(rendered)
+
+        users = [rows[self.row_key(id)] for id in ids if self.row_key(id) in rows]
+        return users, summary['total_ac'] if show_virtual else summary['total_ac_live']
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from judge.utils.problem_data import ProblemDataStorage, get_problem_testcases_data
+
+
+class FakeCases(object):
+    def __init__(self, cases):
+        self.cases = cases
+
+    def all(self):
+        return self
+
+    def order_by(self, *fields):
+        return self.cases
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   VNOJ_TESTCASE_VISIBLE_LENGTH=4)
+class ProblemTestcasesDataTestCase(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with override_settings(DMOJ_PROBLEM_DATA_ROOT=self.root):
+            self.storage = ProblemDataStorage()
+        patcher = mock.patch('judge.models.problem_data_storage', self.storage, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        os.mkdir(os.path.join(self.root, 'test'))
+        with open(os.path.join(self.root, 'test', 'init.yml'), 'w') as f:
+            f.write('archive: tests.zip\n')
+        self.write_archive({'1.in': '1 2', '1.out': '3', '2.in': '123456', '2.out': '7'})
+
+        self.problem = SimpleNamespace(code='test', cases=FakeCases([
+            SimpleNamespace(input_file='1.in', output_file='1.out'),
+            SimpleNamespace(input_file='', output_file=''),
+            SimpleNamespace(input_file='2.in', output_file='2.out'),
+        ]))
+
+    def write_archive(self, files):
+        with zipfile.ZipFile(os.path.join(self.root, 'test', 'tests.zip'), 'w') as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+
+    def test_previews(self):
+        self.assertEqual(get_problem_testcases_data(self.problem), {
+            1: {'input': '1 2', 'answer': '3'},
+            2: {'input': '1234...', 'answer': '7'},
+        })
+
+    def test_cached(self):
+        expected = get_problem_testcases_data(self.problem)
+        with mock.patch('judge.utils.problem_data.zipfile.ZipFile') as open_archive:
+            self.assertEqual(get_problem_testcases_data(self.problem), expected)
+        open_archive.assert_not_called()
+
+    def test_archive_changed(self):
+        get_problem_testcases_data(self.problem)
+        self.write_archive({'1.in': '4 5 6', '1.out': '15', '2.in': '0', '2.out': '0'})
+        self.assertEqual(get_problem_testcases_data(self.problem), {
+            1: {'input': '4 5 ...', 'answer': '15'},
+            2: {'input': '0', 'answer': '0'},
+        })
+
+    def test_missing_init(self):
+        os.unlink(os.path.join(self.root, 'test', 'init.yml'))
+        self.assertEqual(get_problem_testcases_data(self.problem), {})
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from judge.utils.render_cache import RenderCache
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RenderCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = []
+
+    def render(self, value):
+        def render():
+            self.renders.append(value)
+            return value.upper()
+        return render
+
+    def test_tiers(self):
+        render_cache = RenderCache('test', max_size=2)
+        self.assertEqual(render_cache.get_or_render(('a',), self.render('a')), 'A')
+        self.assertEqual(render_cache.get_or_render(('a',), self.render('a')), 'A')
+        self.assertEqual(self.renders, ['a'])
+
+        # Another process only shares the Django cache.
+        other = RenderCache('test', max_size=2)
+        self.assertEqual(other.get_or_render(('a',), self.render('a')), 'A')
+        self.assertEqual(self.renders, ['a'])
+
+        self.assertEqual(render_cache.metrics(), {'size': 1, 'local_hits': 1, 'hits': 0, 'misses': 1})
+        self.assertEqual(other.metrics(), {'size': 1, 'local_hits': 0, 'hits': 1, 'misses': 0})
+
+    def test_lru(self):
+        render_cache = RenderCache('test', max_size=2, timeout=0)
+        for value in ('a', 'b', 'a', 'c', 'a', 'b'):
+            render_cache.get_or_render((value,), self.render(value))
+        # 'b' was the least recently used entry when 'c' was added.
+        self.assertEqual(self.renders, ['a', 'b', 'c', 'b'])
+        self.assertEqual(render_cache.metrics()['size'], 2)
+
+    def test_keys(self):
+        render_cache = RenderCache('test')
+        self.assertNotEqual(render_cache.make_key(('ab', 'c')), render_cache.make_key(('a', 'bc')))
+        self.assertNotEqual(render_cache.make_key(('a', False)), render_cache.make_key(('a', True)))
+        self.assertEqual(render_cache.make_key(('a', 1)), RenderCache('test').make_key(('a', 1)))
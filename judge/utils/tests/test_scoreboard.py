@@ -0,0 +1,65 @@
+import random
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from judge.models import ContestParticipation
+from judge.utils.scoreboard import ContestScoreboard, ScoreboardEntry
+
+
+class ContestScoreboardTestCase(SimpleTestCase):
+    problems = ['1', '2', '3', '4']
+
+    def empty_summary(self):
+        return {'entries': {}, 'order': [], 'first_solves': {}, 'total_ac': {}, 'total_ac_live': {}}
+
+    def random_entry(self, rng, id):
+        solves = {problem: rng.randrange(20) for problem in self.problems if rng.random() < 0.4}
+        key = (rng.random() < 0.1, -len(solves), rng.randrange(50), 0, -rng.randrange(5), id)
+        virtual = ContestParticipation.LIVE if rng.random() < 0.7 else 1
+        return ScoreboardEntry(key=key, virtual=virtual, solves=solves)
+
+    def expected_summary(self, entries):
+        first_solves = {}
+        total_ac = {}
+        total_ac_live = {}
+        for problem in self.problems:
+            solvers = [(entry.solves[problem], entry.key) for entry in entries.values() if problem in entry.solves]
+            live = [(entry.solves[problem], entry.key) for entry in entries.values()
+                    if problem in entry.solves and entry.virtual == ContestParticipation.LIVE]
+            total_ac[problem] = len(solvers)
+            total_ac_live[problem] = len(live)
+            if live:
+                solve_time, key = min(live)
+                first_solves[problem] = (solve_time, key[-1])
+        return sorted((entry.key, id) for id, entry in entries.items()), first_solves, total_ac, total_ac_live
+
+    def test_incremental_updates(self):
+        scoreboard = ContestScoreboard(SimpleNamespace(id=1))
+        for seed in range(50):
+            rng = random.Random(seed)
+            summary = self.empty_summary()
+            entries = {}
+            for _ in range(200):
+                id = rng.randrange(1, 30)
+                old_first = dict(summary['first_solves'])
+                if id in entries and rng.random() < 0.2:
+                    entries.pop(id)
+                    changed = scoreboard._apply(summary, id, None)
+                else:
+                    entries[id] = self.random_entry(rng, id)
+                    changed = scoreboard._apply(summary, id, entries[id])
+
+                order, first_solves, total_ac, total_ac_live = self.expected_summary(entries)
+                self.assertEqual(summary['order'], order)
+                self.assertEqual(summary['first_solves'], first_solves)
+                self.assertEqual({problem: count for problem, count in summary['total_ac'].items() if count},
+                                 {problem: count for problem, count in total_ac.items() if count})
+                self.assertEqual({problem: count for problem, count in summary['total_ac_live'].items() if count},
+                                 {problem: count for problem, count in total_ac_live.items() if count})
+
+                # Every other participation whose first solves changed must have its row re-rendered.
+                moved = {solver for problem in self.problems
+                         for solver in (old_first.get(problem, (0, None))[1], first_solves.get(problem, (0, None))[1])
+                         if old_first.get(problem) != first_solves.get(problem)} - {None, id}
+                self.assertLessEqual(moved, changed)
@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Count, FilteredRelation, Max, Q
 from django.db.models.expressions import F, Value
 from django.db.models.functions import Coalesce
@@ -14,8 +15,8 @@ from django.utils.translation import gettext as _
 from django.views.generic import CreateView, ListView, UpdateView
 from reversion import revisions
 
+from judge.caching import get_fragment_versions
 from judge.comments import CommentedDetailView
-from judge.dblock import LockModel
 from judge.forms import BlogPostForm
 from judge.models import (BlogPost, BlogVote, Comment, Contest, Language,
                           Problem, Profile, Submission, Ticket)
@@ -60,25 +61,13 @@ def vote_blog(request, delta):
     if blog.authors.filter(id=request.profile.id).exists():
         return HttpResponseBadRequest(_('You cannot vote your own blog'), content_type='text/plain')
 
-    vote = BlogVote()
-    vote.blog_id = blog_id
-    vote.voter = request.profile
-    vote.score = delta
-
-    while True:
-        try:
-            vote.save()
-        except IntegrityError:
-            with LockModel(write=(BlogVote,)):
-                try:
-                    vote = BlogVote.objects.get(blog_id=blog_id, voter=request.profile)
-                except BlogVote.DoesNotExist:
-                    # We must continue racing in case this is exploited to manipulate votes.
-                    continue
-                return HttpResponseBadRequest(_('You cannot vote twice.'), content_type='text/plain')
-        else:
-            BlogPost.objects.get(id=blog_id).vote(delta)
-        break
+    try:
+        # The unique vote row decides which of several concurrent votes counts, and the score is only changed by it.
+        with transaction.atomic():
+            BlogVote.objects.create(blog_id=blog_id, voter=request.profile, score=delta)
+            blog.vote(delta)
+    except IntegrityError:
+        return HttpResponseBadRequest(_('You cannot vote twice.'), content_type='text/plain')
     return HttpResponse('success', content_type='text/plain')
 
 
@@ -169,23 +158,33 @@ class PostList(PostListBase):
         context['show_all_blogs'] = self.show_all_blogs
 
         context['page_prefix'] = reverse('blog_post_list')
-        context['comments'] = Comment.most_recent(self.request.user, 10)
+        # The sidebar blocks are cached as rendered fragments, so their data is only computed when they are rendered.
+        context['sidebar_versions'] = get_fragment_versions('home_comments', 'home_problems', 'home_contests',
+                                                            'home_top_users')
+        context['comments'] = lambda: Comment.most_recent(self.request.user, 10)
+        context['comments_viewer'] = self.request.profile.id if self.request.user.is_authenticated else 0
         context['new_problems'] = Problem.get_public_problems() \
                                          .order_by('-date', 'code')[:settings.DMOJ_BLOG_NEW_PROBLEM_COUNT]
         context['page_titles'] = CacheDict(lambda page: Comment.get_page_title(page))
 
-        context['user_count'] = Profile.objects.count
-        context['problem_count'] = Problem.get_public_problems().count
-        context['submission_count'] = lambda: Submission.objects.aggregate(max_id=Max('id'))['max_id'] or 0
-        context['language_count'] = Language.objects.count
+        context['user_count'] = self.cached_stat('user_count', Profile.objects.count)
+        context['problem_count'] = self.cached_stat('problem_count', Problem.get_public_problems().count)
+        context['submission_count'] = self.cached_stat(
+            'submission_count', lambda: Submission.objects.aggregate(max_id=Max('id'))['max_id'] or 0,
+        )
+        context['language_count'] = self.cached_stat('language_count', Language.objects.count)
 
         now = timezone.now()
+        contests = self.get_public_contests(context['sidebar_versions']['home_contests'], now)
+        if self.request.user.is_authenticated:
+            # Only the contests that are not public depend on the user, and of those only the unfinished ones matter.
+            contests += Contest.get_visible_contests(self.request.user) \
+                               .filter(Q(is_organization_private=True) | Q(is_private=True),
+                                       is_visible=True, end_time__gt=now)
+            contests.sort(key=lambda contest: contest.start_time)
 
-        visible_contests = Contest.get_visible_contests(self.request.user).filter(is_visible=True) \
-                                  .order_by('start_time')
-
-        context['current_contests'] = visible_contests.filter(start_time__lte=now, end_time__gt=now)
-        context['future_contests'] = visible_contests.filter(start_time__gt=now)
+        context['current_contests'] = [contest for contest in contests if contest.start_time <= now < contest.end_time]
+        context['future_contests'] = [contest for contest in contests if contest.start_time > now]
 
         context['top_pp_users'] = self.get_top_pp_users()
         context['top_contrib'] = self.get_top_contributors()
@@ -211,6 +210,17 @@ class PostList(PostListBase):
 
         return context
 
+    def cached_stat(self, name, compute):
+        return lambda: cache.get_or_set('home_stat:%s' % name, compute, 300)
+
+    def get_public_contests(self, version, now):
+        key = 'home_public_contests:%s' % version
+        contests = cache.get(key)
+        if contests is None:
+            contests = list(Contest.get_public_contests().filter(end_time__gt=now).order_by('start_time'))
+            cache.set(key, contests, 3600)
+        return [contest for contest in contests if contest.end_time > now]
+
     def get_top_pp_users(self):
         return (Profile.objects.order_by('-performance_points')
                 .filter(performance_points__gt=0, is_unlisted=False)
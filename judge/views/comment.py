@@ -2,7 +2,7 @@ from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import F
 from django.forms.models import ModelForm
 from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotFound, \
@@ -14,7 +14,7 @@ from django.views.generic import DetailView, UpdateView
 from reversion import revisions
 from reversion.models import Version
 
-from judge.dblock import LockModel
+from judge.caching import bump_fragment_versions
 from judge.models import Comment, CommentVote
 from judge.utils.views import TitleMixin
 from judge.widgets import MathJaxPagedownWidget
@@ -56,25 +56,13 @@ def vote_comment(request, delta):
     if comment.author == request.profile:
         return HttpResponseBadRequest(_('You cannot vote on your own comments.'), content_type='text/plain')
 
-    vote = CommentVote()
-    vote.comment_id = comment_id
-    vote.voter = request.profile
-    vote.score = delta
-
-    while True:
-        try:
-            vote.save()
-        except IntegrityError:
-            with LockModel(write=(CommentVote,)):
-                try:
-                    vote = CommentVote.objects.get(comment_id=comment_id, voter=request.profile)
-                except CommentVote.DoesNotExist:
-                    # We must continue racing in case this is exploited to manipulate votes.
-                    continue
-                return HttpResponseBadRequest(_('You cannot vote twice.'), content_type='text/plain')
-        else:
-            Comment.objects.get(id=comment_id).vote(delta)
-        break
+    try:
+        # The unique vote row decides which of several concurrent votes counts, and the score is only changed by it.
+        with transaction.atomic():
+            CommentVote.objects.create(comment_id=comment_id, voter=request.profile, score=delta)
+            comment.vote(delta)
+    except IntegrityError:
+        return HttpResponseBadRequest(_('You cannot vote twice.'), content_type='text/plain')
     return HttpResponse('success', content_type='text/plain')
 
 
@@ -187,4 +175,5 @@ def comment_hide(request):
     comment = get_object_or_404(Comment, id=comment_id)
     comment.get_descendants(include_self=True).update(hidden=True)
     comment.author.calculate_contribution_points()
+    bump_fragment_versions('home_comments')
     return HttpResponse('ok')
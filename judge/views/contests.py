@@ -46,6 +46,7 @@ from judge.utils.cms import parse_csv_ranking
 from judge.utils.opengraph import generate_opengraph
 from judge.utils.problems import _get_result_data, user_attempted_ids, user_completed_ids
 from judge.utils.ranker import ranker
+from judge.utils.scoreboard import ContestScoreboard, make_contest_ranking_profile
 from judge.utils.stats import get_bar_chart, get_pie_chart, get_stacked_bar_chart
 from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, SingleObjectFormView, TitleMixin, \
     add_file_response, generic_message
@@ -816,43 +817,9 @@ class ContestStats(TitleMixin, ContestMixin, DetailView):
         return context
 
 
-ContestRankingProfile = namedtuple(
-    'ContestRankingProfile',
-    'id user css_class username points cumtime tiebreaker organization participation '
-    'participation_rating problem_cells result_cell virtual display_name',
-)
-
 BestSolutionData = namedtuple('BestSolutionData', 'code points time state is_pretested')
 
 
-def make_contest_ranking_profile(contest, participation, contest_problems, first_solves, frozen=False):
-    def display_user_problem(contest_problem):
-        # When the contest format is changed, `format_data` might be invalid.
-        # This will cause `display_user_problem` to error, so we display '???' instead.
-        try:
-            return contest.format.display_user_problem(participation, contest_problem, first_solves, frozen)
-        except (KeyError, TypeError, ValueError):
-            return mark_safe('<td>???</td>')
-
-    user = participation.user
-    return ContestRankingProfile(
-        id=user.id,
-        user=user.user,
-        css_class=user.css_class,
-        username=user.username,
-        points=participation.score if not frozen else participation.frozen_score,
-        cumtime=participation.cumtime if not frozen else participation.frozen_cumtime,
-        tiebreaker=participation.tiebreaker if not frozen else participation.frozen_tiebreaker,
-        organization=user.organization,
-        participation_rating=participation.rating.rating if hasattr(participation, 'rating') else None,
-        problem_cells=[display_user_problem(contest_problem) for contest_problem in contest_problems],
-        result_cell=contest.format.display_participation_result(participation, frozen),
-        participation=participation,
-        virtual=participation.virtual,
-        display_name=user.display_name,
-    )
-
-
 def base_contest_ranking_list(contest, problems, queryset, frozen=False):
     queryset = queryset.select_related('user__user', 'rating').defer('user__about', 'user__organizations__about')
     first_solves, total_ac = contest.format.get_first_solves_and_total_ac(problems, queryset, frozen)
@@ -865,18 +832,9 @@ def base_contest_ranking_queryset(contest):
     return contest.users.filter(virtual__gt=ContestParticipation.SPECTATE) \
         .prefetch_related(Prefetch('user__organizations',
                                    queryset=Organization.objects.filter(is_unlisted=False))) \
-        .annotate(submission_count=Count('submission')) \
         .order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker', '-submission_count')
 
 
-def base_contest_frozen_ranking_queryset(contest):
-    return contest.users.filter(virtual__gt=ContestParticipation.SPECTATE) \
-        .prefetch_related(Prefetch('user__organizations',
-                                   queryset=Organization.objects.filter(is_unlisted=False))) \
-        .annotate(submission_count=Count('submission')) \
-        .order_by('is_disqualified', '-frozen_score', 'frozen_cumtime', 'frozen_tiebreaker', '-submission_count')
-
-
 def contest_ranking_list(contest, problems, frozen=False):
     return base_contest_ranking_list(contest, problems, base_contest_ranking_queryset(contest), frozen=frozen)
 
@@ -968,15 +926,6 @@ class ContestRanking(ContestRankingBase):
         return self.object.scoreboard_cache_timeout == 0 or self.can_edit or \
             (self.request.user.is_authenticated and not self.object.can_see_full_scoreboard(self.request.user))
 
-    def get_ranking_queryset(self):
-        if self.is_frozen:
-            queryset = base_contest_frozen_ranking_queryset(self.object)
-        else:
-            queryset = base_contest_ranking_queryset(self.object)
-        if not self.show_virtual:
-            queryset = queryset.filter(virtual=ContestParticipation.LIVE)
-        return queryset
-
     def get_full_ranking_list(self):
         if 'show_virtual' in self.request.GET:
             self.show_virtual = self.request.session['show_virtual'] \
@@ -984,11 +933,10 @@ class ContestRanking(ContestRankingBase):
         else:
             self.show_virtual = self.request.session.get('show_virtual', False)
 
-        queryset = self.get_ranking_queryset()
-        return get_contest_ranking_list(
-            self.request, self.object,
-            ranking_list=partial(base_contest_ranking_list, queryset=queryset, frozen=self.is_frozen),
-        )
+        scoreboard = ContestScoreboard(self.object, frozen=self.is_frozen)
+        users, total_ac = scoreboard.get_ranking(show_virtual=self.show_virtual)
+        users = ranker(users, key=attrgetter('points', 'cumtime', 'tiebreaker'))
+        return users, scoreboard.problems, total_ac
 
     def get_ranking_list(self):
         if not self.object.can_see_full_scoreboard(self.request.user):
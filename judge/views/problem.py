@@ -759,6 +759,8 @@ class ProblemClone(ProblemMixin, PermissionRequiredMixin, TitleMixin, SingleObje
         problem.is_public = False
         problem.ac_rate = 0
         problem.user_count = 0
+        problem.submission_count = 0
+        problem.ac_submission_count = 0
         problem.code = form.cleaned_data['code']
         problem.date = timezone.now()
         with revisions.create_revision(atomic=True):